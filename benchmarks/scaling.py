@@ -0,0 +1,233 @@
+"""
+Scaling benchmark of the parsing and data-extraction.
+
+Runs offline against the XML-data of simulated installations from 10 to
+1000 appliances and reports per stage the wall time, the memory allocated
+and retained by the stage and the peak memory, for the Plugwise and the
+Legacy_Anna objects. The results are saved as JSON, a previous result can
+be compared with --compare:
+
+    python benchmarks/scaling.py --output results.json
+    python benchmarks/scaling.py --compare results.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lxml import etree  # noqa: E402
+
+from plugwise.legacy_anna import Legacy_Anna  # noqa: E402
+from plugwise.plugwise import (  # noqa: E402
+    APPLIANCES,
+    DIRECT_OBJECTS,
+    DOMAIN_OBJECTS,
+    LOCATIONS,
+    Plugwise,
+)
+from plugwise.simulator import SimulatedGateway  # noqa: E402
+
+SIZES = (10, 30, 100, 300, 1000)
+TRVS = 3
+REPEAT = 5
+
+
+def plugwise_gateway(appliances):
+    """Provides a simulated Adam with about the given number of appliances,
+       three quarter thermostats and radiator valves, the rest plugs."""
+    thermostatic = (appliances - 2) * 3 // 4
+    zones = max(1, thermostatic // (1 + TRVS))
+    plugs = max(0, appliances - 2 - zones * (1 + TRVS))
+    return SimulatedGateway(zones=zones, trvs=TRVS, plugs=plugs, update_interval=0)
+
+
+def legacy_gateway(appliances):
+    """Provides a simulated legacy Anna with the given number of appliances."""
+    return SimulatedGateway(legacy=True, plugs=max(0, appliances - 2), update_interval=0)
+
+
+def plugwise_stages(appliances):
+    """Provides the (name, function) of the stages of the Plugwise object,
+       every stage uses the result of the previous stages."""
+    gateway = plugwise_gateway(appliances)
+    docs = {path: gateway.render(path)
+            for path in (APPLIANCES, DOMAIN_OBJECTS, DIRECT_OBJECTS, LOCATIONS)}
+    api = Plugwise('smile', 'x', '127.0.0.1', 80)
+    state = {}
+
+    def escape():
+        state['escaped'] = Plugwise.escape_illegal_xml_characters(docs[DOMAIN_OBJECTS])
+
+    def parse():
+        state['root'] = etree.XML(state['escaped'].encode())
+
+    def update():
+        api._update_appliances(docs[APPLIANCES])
+        api._update_domain_objects(docs[DOMAIN_OBJECTS])
+        api._update_direct_objects(docs[DIRECT_OBJECTS])
+        api._update_locations(docs[LOCATIONS])
+
+    def get_devices():
+        state['devices'] = api.get_devices()
+
+    def get_location_list():
+        api.get_location_list(api.get_appliance_list())
+
+    def get_device_data():
+        devices = state['devices']
+        ctrl_id = [device['id'] for device in devices if device['type'] == 'heater_central'][0]
+        for device in devices:
+            if device['type'] == 'thermostat':
+                api.get_device_data(device['id'], ctrl_id, None)
+            elif device['type'] == 'plug':
+                api.get_device_data(None, ctrl_id, device['id'])
+            else:
+                api.get_device_data(None, device['id'], None)
+
+    def get_all_device_data():
+        api.get_all_device_data()
+
+    return len(docs[DOMAIN_OBJECTS]), [
+        ('escape_illegal_xml_characters', escape),
+        ('etree.XML', parse),
+        ('full_update', update),
+        ('get_devices', get_devices),
+        ('get_location_list', get_location_list),
+        ('get_device_data', get_device_data),
+        ('get_all_device_data', get_all_device_data),
+    ]
+
+
+def legacy_stages(appliances):
+    """Provides the (name, function) of the stages of the Legacy_Anna object."""
+    gateway = legacy_gateway(appliances)
+    xml = gateway.render(DOMAIN_OBJECTS)
+    api = Legacy_Anna('smile', 'x', '127.0.0.1', 80)
+    state = {}
+
+    def escape():
+        state['escaped'] = Legacy_Anna.escape_illegal_xml_characters(xml)
+
+    def parse():
+        state['root'] = api._parse_xml(xml)
+
+    def get_device_data():
+        root = state['root']
+        api.get_presets(root)
+        api.get_schema_names(root)
+        api.get_active_schema_name(root)
+        api.get_schema_state(root)
+        api.get_boiler_status(root)
+        api.get_heating_status(root)
+        api.get_cooling_status(root)
+        api.get_current_preset(root)
+        api.get_schedule_temperature(root)
+        api.get_current_temperature(root)
+        api.get_target_temperature(root)
+        api.get_thermostat_temperature(root)
+        api.get_outdoor_temperature(root)
+        api.get_illuminance(root)
+        api.get_boiler_temperature(root)
+        api.get_water_pressure(root)
+
+    def get_thermostat_state():
+        api.get_thermostat_state(state['root'])
+
+    return len(xml), [
+        ('escape_illegal_xml_characters', escape),
+        ('parse', parse),
+        ('get_device_data', get_device_data),
+        ('get_thermostat_state', get_thermostat_state),
+    ]
+
+
+def measure(function, repeat):
+    """Measures the best wall time of a function over repeat runs, then the
+       memory allocated, retained and at peak during one traced run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    function()
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = after.compare_to(before, 'filename')
+    return {
+        'wall_time': min(times),
+        'wall_time_median': sorted(times)[len(times) // 2],
+        'retained_blocks': sum(stat.count_diff for stat in retained),
+        'retained_bytes': sum(stat.size_diff for stat in retained),
+        'peak_bytes': peak,
+    }
+
+
+def run(sizes, repeat):
+    """Runs all stages for every size, provides the results."""
+    results = []
+    for name, stages in (('Plugwise', plugwise_stages), ('Legacy_Anna', legacy_stages)):
+        for appliances in sizes:
+            xml_bytes, functions = stages(appliances)
+            for stage, function in functions:
+                result = measure(function, repeat)
+                result.update({'object': name, 'appliances': appliances,
+                               'xml_bytes': xml_bytes, 'stage': stage})
+                results.append(result)
+                print('{:<12} {:>5} {:<30} {:>10.2f} ms {:>10} B peak'.format(
+                    name, appliances, stage, result['wall_time'] * 1000,
+                    result['peak_bytes']), file=sys.stderr)
+    return {
+        'python': platform.python_version(),
+        'lxml': '.'.join(str(part) for part in etree.LXML_VERSION),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(previous, current):
+    """Prints the wall time and peak memory relative to a previous run."""
+    index = {(result['object'], result['appliances'], result['stage']): result
+             for result in previous['results']}
+    for result in current['results']:
+        old = index.get((result['object'], result['appliances'], result['stage']))
+        if old is None or not old['wall_time'] or not old['peak_bytes']:
+            continue
+        print('{:<12} {:>5} {:<30} time x{:.2f} peak x{:.2f}'.format(
+            result['object'], result['appliances'], result['stage'],
+            result['wall_time'] / old['wall_time'],
+            result['peak_bytes'] / old['peak_bytes']))
+
+
+def main():
+    """Runs the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='compare with previously saved results')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=1)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(json.load(previous), results)
+
+
+if __name__ == '__main__':
+    main()
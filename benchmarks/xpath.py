@@ -0,0 +1,106 @@
+"""
+Benchmark of the precompiled XPath expressions of plugwise/xpath.py.
+
+Runs offline against the XML-data of a simulated legacy Anna and Adam and
+reports per query the microseconds of the equivalent locator evaluated by
+find(), of the expression with the values concatenated evaluated by xpath()
+(compiled for every call) and of the precompiled expression with variables:
+
+    python benchmarks/xpath.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lxml import etree  # noqa: E402
+
+from plugwise import xpath  # noqa: E402
+from plugwise.plugwise import DOMAIN_OBJECTS, Plugwise  # noqa: E402
+from plugwise.simulator import SimulatedGateway  # noqa: E402
+
+REPEAT = 2000
+
+
+def documents():
+    """Provides the domain_objects of a legacy Anna and of an Adam with 10
+       zones of a thermostat and 2 radiator valves and 10 plugs."""
+    return {
+        'legacy Anna': SimulatedGateway(legacy=True).render(DOMAIN_OBJECTS),
+        'Adam': SimulatedGateway(zones=10, trvs=2, plugs=10).render(DOMAIN_OBJECTS),
+    }
+
+
+def cases(root):
+    """Provides per query the concatenated locator, the precompiled expression
+       and the variables of every object it is evaluated for."""
+    point_logs = root.xpath('module/services/*/@log_type')
+    return [
+        ('rule', "rule[@id='{id}']", xpath.RULE,
+         [{'id': rule_id} for rule_id in root.xpath('rule/@id')]),
+        ('service_point_log',
+         "module/services/*[@log_type='{log_type}']/functionalities/point_log",
+         xpath.SERVICE_POINT_LOG, [{'log_type': log_type} for log_type in point_logs]),
+        ('point_log_measurement', "*/logs/point_log[@id='{id}']/period/measurement",
+         xpath.POINT_LOG_MEASUREMENT,
+         [{'id': log_id} for log_id in root.xpath(
+             'module/services/*/functionalities/point_log/@id')]),
+        ('appliance_measurement',
+         "appliance[type='{appliance_type}']/logs/point_log[type='{log_type}']"
+         "/period/measurement", xpath.APPLIANCE_MEASUREMENT,
+         [{'appliance_type': 'heater_central', 'log_type': log_type}
+          for log_type in ('boiler_state', 'central_heating_state', 'cooling_state')]),
+        ('preset_rule', "rule/directives/when/then[@icon='{preset}']/../../..",
+         xpath.PRESET_RULE,
+         [{'preset': preset} for preset in ('home', 'away', 'asleep')]),
+    ]
+
+
+def measure(function, variables, repeat):
+    """Measures the mean microseconds of one evaluation."""
+    start = time.perf_counter()
+    for _ in range(repeat // len(variables) or 1):
+        for values in variables:
+            function(values)
+    count = (repeat // len(variables) or 1) * len(variables)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def _concatenated(path, values):
+    """Provides an expression with the values instead of the variables."""
+    for name, value in values.items():
+        path = path.replace('$' + name, "'" + value + "'")
+    return path
+
+
+def run(repeat):
+    """Measures all queries on all documents."""
+    for document, xml in documents().items():
+        root = etree.XML(Plugwise.escape_illegal_xml_characters(xml).encode())
+        print('{} ({} objects, {} bytes)'.format(document, len(root), len(xml)))
+        for name, locator, query, variables in cases(root):
+            if not variables or query(root, **variables[0]) == []:
+                continue
+            find = measure(lambda values: root.find(locator.format(**values)),
+                           variables, repeat)
+            compiled = measure(lambda values: root.xpath(_concatenated(query.path, values)),
+                               variables, repeat)
+            precompiled = measure(lambda values: xpath.first(query, root, **values),
+                                  variables, repeat)
+            print('  {:<24} find {:7.1f} us  xpath {:7.1f} us  precompiled {:7.1f} us'
+                  '  ({:+.0%} vs find)'.format(name, find, compiled, precompiled,
+                                               precompiled / find - 1))
+
+
+def main():
+    """Runs the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args()
+    run(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
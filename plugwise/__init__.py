@@ -1 +1,6 @@
 from .plugwise import Plugwise
+from .aio import AsyncPlugwise, AsyncLegacy_Anna
+from .scheduler import PollingScheduler, AsyncPollingScheduler
+from .fleet import Fleet
+from .instrumentation import instrument, MetricsSink
+from .history import MeasurementHistory
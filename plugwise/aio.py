@@ -0,0 +1,325 @@
+"""
+Asyncio versions of the Plugwise and Legacy_Anna objects.
+
+The XML-parsing and data-extraction is shared with the synchronous classes,
+only the communication with the gateway is awaitable.
+"""
+import asyncio
+
+import aiohttp
+from lxml import etree
+
+from .legacy_anna import (
+    Legacy_Anna,
+    CouldNotSetPresetException as CouldNotSetAnnaPresetException,
+    CouldNotSetTemperatureException as CouldNotSetAnnaTemperatureException,
+)
+from .plugwise import (
+    Plugwise,
+    CouldNotSetPresetException,
+    CouldNotSetRelayException,
+    CouldNotSetTemperatureException,
+    APPLIANCES,
+    DIRECT_OBJECTS,
+    DOMAIN_OBJECTS,
+    ENDPOINTS,
+    LOCATIONS,
+    PING,
+)
+from .energy import EnergyLogs, energy_range
+from .feed import FeedParser
+from .session import AsyncGatewaySession, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+
+
+class AsyncPlugwise(Plugwise):
+    """Define the asyncio Plugwise object."""
+
+    def __init__(self, username, password, host, port, websession=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 streaming=False, track_changes=False, chunked=False,
+                 snapshot=None, history_size=0, double_buffered=False):
+        """Constructor for this class, an aiohttp websession can be shared."""
+        session = AsyncGatewaySession(
+            'http://' + host + ':' + str(port), username, password,
+            websession, pool_size, timeout,
+        )
+        super().__init__(username, password, host, port, pool_size=pool_size,
+                         streaming=streaming, track_changes=track_changes,
+                         chunked=chunked, session=session, snapshot=snapshot,
+                         history_size=history_size, double_buffered=double_buffered)
+
+    async def close(self):
+        """Closes the websession, when it was created by this object."""
+        await self._session.close()
+
+    async def ping_gateway(self):
+        """Ping the gateway (Adam/Smile) to see if it's online"""
+        status, _ = await self._session.request(PING)
+        if status != 404:
+            raise ConnectionError("Could not connect to the gateway.")
+        return True
+
+    async def get_appliances(self):
+        """Collects the appliances XML-data."""
+        status, xml = await self._fetch(APPLIANCES)
+        if status != 200:
+            raise ConnectionError("Could not get the appliances.")
+        self._update_appliances(xml)
+
+    async def get_locations(self):
+        """Collects the locations XML-data."""
+        status, xml = await self._fetch(LOCATIONS)
+        if status != 200:
+            raise ConnectionError("Could not get the locations.")
+        self._update_locations(xml)
+
+    async def get_direct_objects(self):
+        """Collects the direct_objects XML-data."""
+        status, xml = await self._fetch(DIRECT_OBJECTS)
+        if status != 200:
+            raise ConnectionError("Could not get the direct objects.")
+        self._update_direct_objects(xml)
+
+    async def get_domain_objects(self, incremental=False):
+        """Collects the domain_objects XML-data."""
+        status, xml = await self._fetch(DOMAIN_OBJECTS, raw=self._streaming)
+        if status != 200:
+            raise ConnectionError("Could not get the domain objects.")
+        self._update_domain_objects(xml, incremental)
+
+    async def _fetch(self, command, raw=False):
+        """Requests the XML-data of an endpoint, returns the status and the
+           text (the bytes with raw=True). With chunked=True the XML-data is
+           parsed while it is downloaded, the root element is returned."""
+        if self._chunked:
+            parser = self._feed_parser(command)
+            status = await self._session.stream(command, parser.feed)
+            return status, self._feed_result(command, status, parser)
+        return await self._session.request(command, decode=not raw)
+
+    async def full_update_device(self, incremental=False):
+        """Update device, the XML-data is collected concurrently."""
+        await asyncio.gather(
+            self.get_appliances(),
+            self.get_domain_objects(incremental),
+            self.get_direct_objects(),
+            self.get_locations(),
+        )
+        self._finish_update()
+
+    async def update_endpoints(self, endpoints, incremental=True):
+        """Collects the XML-data of some endpoints concurrently, see
+           Plugwise.update_endpoints()."""
+        await asyncio.gather(*(self._collect(endpoint, incremental) for endpoint in endpoints))
+        return self._endpoints_updated(endpoints)
+
+    async def refresh(self, fields=None, kinds=None, filtered=True):
+        """Updates only the collected data of the given device-data fields
+           and/or device kinds, the URIs are requested concurrently."""
+        plan = self._refresh_plan(fields, kinds, filtered)
+        if plan is None:
+            await self.full_update_device()
+            return [APPLIANCES, DOMAIN_OBJECTS, DIRECT_OBJECTS, LOCATIONS]
+
+        async def collect(uri):
+            if uri == APPLIANCES:
+                await self.get_appliances()
+            elif uri == DOMAIN_OBJECTS:
+                await self.get_domain_objects(incremental=True)
+            elif uri == DIRECT_OBJECTS:
+                await self.get_direct_objects()
+            else:
+                status, xml = await self._session.request(uri)
+                if status != 200:
+                    raise ConnectionError("Could not get the appliances.")
+                return xml
+            return None
+
+        results = await asyncio.gather(*(collect(uri) for uri in plan))
+        objects = None
+        for xml in results:
+            if xml is not None:
+                objects = (objects or set()) | self._merge_appliances(xml)
+        self._finish_update(self._planned_endpoints(plan), objects)
+        return plan
+
+    def start_refresher(self, interval, incremental=True):
+        """Runs full_update_device() every interval seconds in a task of
+           the running event loop and enables the double-buffering, see
+           Plugwise.start_refresher()."""
+        if self._refresher is not None:
+            return
+        self._double_buffered = True
+        if self._collected.issuperset(ENDPOINTS):
+            self._publish()
+        self._refresher = asyncio.ensure_future(self._run_refresher(interval, incremental))
+
+    async def _run_refresher(self, interval, incremental):
+        """Updates the collected data until the task is cancelled."""
+        while True:
+            try:
+                await self.full_update_device(incremental)
+                self._refresh_error = None
+            except (ConnectionError, asyncio.TimeoutError, aiohttp.ClientError,
+                    etree.XMLSyntaxError) as error:
+                self._refresh_error = error
+            await asyncio.sleep(interval)
+
+    async def stop_refresher(self, timeout=None):
+        """Stops the background refresher."""
+        if self._refresher is None:
+            return
+        self._refresher.cancel()
+        try:
+            await asyncio.wait_for(self._refresher, timeout)
+        except asyncio.CancelledError:
+            pass
+        self._refresher = None
+
+    async def get_energy_logs(self, start, end, appl_ids=None):
+        """Collects the logged energy of all appliances, or those in
+           appl_ids, between the start and end datetimes with one request."""
+        logs = EnergyLogs(appl_ids)
+        parser = FeedParser(logs.add_appliance)
+        status = await self._session.stream(APPLIANCES + energy_range(start, end), parser.feed)
+        if status != 200:
+            raise ConnectionError("Could not get the energy logs.")
+        parser.close()
+        return logs
+
+    async def set_schedule_state(self, loc_id, name, state):
+        """Sets the schedule, helper-function."""
+        request = self._schedule_state_request(loc_id, name, state)
+        if request is not None:
+            uri, data = request
+            status, xml = await self._session.request(uri, 'put', data)
+            if status != 200:
+                raise CouldNotSetTemperatureException("Could not set the schema to {}.".format(state) + xml)
+            self._write_through(('schedule', loc_id, name, state))
+            return '{} {}'.format(xml, data)
+
+    async def set_preset(self, location_id, loc_type, preset):
+        """Sets the preset, helper function."""
+        uri, data = self._preset_request(location_id, preset)
+        status, xml = await self._session.request(uri, 'put', data)
+        if status != 200:
+            raise CouldNotSetPresetException("Could not set the given preset: " + xml)
+        self._write_through(('preset', location_id, preset))
+        return xml
+
+    async def set_temperature(self, loc_id, loc_type, temperature):
+        """Sends a temperature-set request, helper function."""
+        uri, data = self._temperature_request(loc_id, loc_type, temperature)
+        if uri is None:
+            raise CouldNotSetTemperatureException("Could not obtain the temperature_uri.")
+        status, xml = await self._session.request(uri, 'put', data)
+        if status != 200:
+            raise CouldNotSetTemperatureException("Could not set the temperature." + xml)
+        self._write_through(('temperature', loc_id, temperature))
+        return xml
+
+    async def set_relay_state(self, appl_id, type, state):
+        """Switch the Plug to off/on."""
+        uri, data = self._relay_request(appl_id, type, state)
+        if uri is None:
+            raise CouldNotSetRelayException("Could not obtain the relay_uri.")
+        status, xml = await self._session.request(uri, 'put', data)
+        if status != 200:
+            raise CouldNotSetRelayException("Could not set the relay state." + xml)
+        self._write_through(('relay', appl_id, state))
+        return xml
+
+    async def set_scene(self, commands, limit=None):
+        """Sends a batch of writes, at most limit (default: the pool size)
+           concurrently, see _scene_requests() for the commands.
+
+           Returns a result dict per command, in the order of the commands."""
+        results, groups = self._scene_requests(commands)
+        semaphore = asyncio.Semaphore(limit or self._write_limit)
+
+        async def send_group(group):
+            for index, uri, data in group:
+                async with semaphore:
+                    status, xml = await self._session.request(uri, 'put', data)
+                results[index].update(self._scene_result(status, xml))
+
+        await asyncio.gather(*(send_group(group) for group in groups))
+        self._write_through_scene(results)
+        return results
+
+    async def verify_pending(self):
+        """Confirms the pending writes with one small request per written
+           object, concurrently. Returns the fields that are still pending."""
+        async def verify(uri):
+            status, xml = await self._session.request(uri)
+            if status == 200:
+                self._confirm_pending(uri, xml)
+
+        await asyncio.gather(*(verify(uri) for uri in self._verification_requests()))
+        return self.get_pending()
+
+
+class AsyncLegacy_Anna(Legacy_Anna):
+    """Define the asyncio Legacy_Anna object."""
+
+    def __init__(self, username, password, host, port, websession=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        """Set the constructor for this class, an aiohttp websession can be shared."""
+        session = AsyncGatewaySession(
+            "http://" + host + ":" + str(port), username, password,
+            websession, pool_size, timeout,
+        )
+        super().__init__(username, password, host, port, session=session)
+
+    async def close(self):
+        """Close the websession, when it was created by this object."""
+        await self._session.close()
+
+    async def ping_anna_thermostat(self):
+        """Ping the thermostat to see if it's online."""
+        status, _ = await self._session.request(PING)
+        if status != 404:
+            raise ConnectionError("Could not connect to the gateway.")
+        return True
+
+    async def get_direct_objects(self):
+        """Collect the direct_objects XML-data."""
+        status, xml = await self._session.request(DIRECT_OBJECTS)
+        if status != 200:
+            raise ConnectionError("Could not get the direct objects.")
+        return self._parse_xml(xml)
+
+    async def get_domain_objects(self):
+        """Collect the domain_objects XML-data."""
+        status, xml = await self._session.request(DOMAIN_OBJECTS)
+        if status != 200:
+            raise ConnectionError("Could not get the domain objects.")
+        return self._parse_xml(xml)
+
+    async def set_preset(self, root, preset):
+        """Set the given preset on the thermostat for V1."""
+        uri, data = self._preset_request(root, preset)
+        status, xml = await self._session.request(uri, 'put', data)
+        if status != 200:
+            raise CouldNotSetAnnaPresetException(
+                "Could not set the given " "preset: " + xml
+            )
+        return xml
+
+    async def set_schema_state(self, root, schema, state):
+        """Send a set request to the schema with the given name."""
+        uri, data = self._schema_state_request(root, schema, state)
+        status, xml = await self._session.request(uri, 'put', data)
+        if status != 200:
+            raise CouldNotSetAnnaTemperatureException(
+                "Could not set the schema to {}.".format(state) + xml
+            )
+        return "{} {}".format(xml, data)
+
+    async def set_temperature(self, root, temperature):
+        """Send a set request to the temperature with the given temperature."""
+        uri, data = self._temperature_request(root, temperature)
+        status, xml = await self._session.request(uri, 'put', data)
+        if status != 200:
+            raise CouldNotSetAnnaTemperatureException("Could not set the temperature." + xml)
+        return xml
@@ -0,0 +1,160 @@
+"""
+Bulk retrieval of the logged energy of the appliances.
+
+The interval_logs of the electricity consumed and produced by all appliances
+over a date range are collected with one request. They are decoded into
+typed arrays while the XML-data is downloaded, every appliance is removed
+from the parsed tree as soon as it has been decoded. The rollups per hour,
+day or month sum slices of these arrays, the slice of every period is found
+by bisection, so the work per sample is done by the builtins.
+"""
+import bisect
+import datetime
+from array import array
+
+import pytz
+from dateutil.parser import parse
+
+ENERGY_TYPES = ('electricity_consumed', 'electricity_produced')
+ROLLUP_PERIODS = ('hour', 'day', 'month')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+def energy_range(start, end):
+    """Provides the @from/@to selection of the logs between two datetimes,
+       naive datetimes are taken as UTC."""
+    return ';@from={};@to={}'.format(_utc_date(start), _utc_date(end))
+
+
+def _utc_date(date):
+    """Formats a datetime as UTC date for the selection of the logs."""
+    if date.tzinfo is None:
+        date = pytz.utc.localize(date)
+    return date.astimezone(pytz.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _seconds(date):
+    """Converts a log_date to seconds since the epoch."""
+    try:
+        date_time = datetime.datetime.fromisoformat(date)
+    except ValueError:
+        date_time = parse(date)
+    if date_time.tzinfo is None:
+        date_time = pytz.utc.localize(date_time)
+    return (date_time - EPOCH).total_seconds()
+
+
+class EnergyLogs:
+    """Define the logged energy per appliance and log type, as arrays of the
+       log_dates (seconds since the epoch) and the logged values."""
+
+    def __init__(self, appl_ids=None, log_types=ENERGY_TYPES):
+        """Constructor for this class
+
+           Only the appliances in appl_ids are kept, all when None."""
+        self._appl_ids = set(appl_ids) if appl_ids is not None else None
+        self._log_types = log_types
+        self._logs = {}
+
+    def add_appliance(self, item):
+        """Decodes the interval_logs of an appliance element, then removes its
+           content. Used as prune-callback of the FeedParser."""
+        if item.tag == 'appliance' and (
+                self._appl_ids is None or item.get('id') in self._appl_ids):
+            for log in item.iterfind('logs/interval_log'):
+                log_type = log.findtext('type')
+                if log_type not in self._log_types:
+                    continue
+                samples = sorted(
+                    (_seconds(measurement.get('log_date')), float(measurement.text))
+                    for measurement in log.iterfind('period/measurement')
+                    if measurement.text is not None
+                )
+                self._add(item.get('id'), log_type, samples)
+        del item[:]
+
+    def _add(self, appl_id, log_type, samples):
+        """Adds the sorted (seconds, value) samples of a log."""
+        key = (appl_id, log_type)
+        if key in self._logs:
+            times, values = self._logs[key]
+            samples = sorted(list(zip(times, values)) + samples)
+        self._logs[key] = (
+            array('d', [sample[0] for sample in samples]),
+            array('d', [sample[1] for sample in samples]),
+        )
+
+    def appliances(self):
+        """Provides the log types with samples, per appliance-id."""
+        appliances = {}
+        for appl_id, log_type in self._logs:
+            appliances.setdefault(appl_id, []).append(log_type)
+        return appliances
+
+    def get_samples(self, appl_id, log_type):
+        """Provides the log_dates and values arrays of a log, in time order."""
+        return self._logs.get((appl_id, log_type), (array('d'), array('d')))
+
+    def rollup(self, appl_id, log_type, period='day', tz=pytz.utc):
+        """Provides the (start, total) of every hour, day or month (in the
+           timezone tz) from the first to the last sample of a log. The start
+           is given in seconds since the epoch."""
+        times, values = self.get_samples(appl_id, log_type)
+        if not times:
+            return []
+        boundaries = _boundaries(times[0], times[-1], period, tz)
+        boundaries.append(times[-1] + 1)
+        totals = []
+        low = bisect.bisect_left(times, boundaries[0])
+        for start, end in zip(boundaries, boundaries[1:]):
+            high = bisect.bisect_left(times, end, low)
+            totals.append((start, sum(values[low:high])))
+            low = high
+        return totals
+
+    def rollups(self, period='day', tz=pytz.utc):
+        """Provides the rollups of all logs, as {appl_id: {log_type: totals}}."""
+        result = {}
+        for appl_id, log_type in self._logs:
+            result.setdefault(appl_id, {})[log_type] = self.rollup(
+                appl_id, log_type, period, tz)
+        return result
+
+
+def _boundaries(first, last, period, tz):
+    """Determines the starts (seconds since the epoch) of the hours, days or
+       months in the timezone tz, from the one holding first up to last."""
+    if period not in ROLLUP_PERIODS:
+        raise ValueError("Unknown rollup period: " + str(period))
+    if isinstance(tz, str):
+        tz = pytz.timezone(tz)
+    local = datetime.datetime.fromtimestamp(first, tz).replace(tzinfo=None)
+    if period == 'hour':
+        start = _local_seconds(local.replace(minute=0, second=0, microsecond=0), tz)
+        return [start + hour * 3600 for hour in range(int((last - start) // 3600) + 1)]
+
+    local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == 'month':
+        local = local.replace(day=1)
+    boundaries = []
+    start = _local_seconds(local, tz)
+    while start <= last:
+        boundaries.append(start)
+        if period == 'day':
+            local += datetime.timedelta(days=1)
+        elif local.month == 12:
+            local = local.replace(year=local.year + 1, month=1)
+        else:
+            local = local.replace(month=local.month + 1)
+        start = _local_seconds(local, tz)
+    return boundaries
+
+
+def _local_seconds(local, tz):
+    """Converts a local (naive) datetime in the timezone tz to seconds since
+       the epoch."""
+    if hasattr(tz, 'localize'):
+        date_time = tz.localize(local)
+    else:
+        date_time = local.replace(tzinfo=tz)
+    return (date_time - EPOCH).total_seconds()
@@ -0,0 +1,124 @@
+"""
+Incremental parsing of the XML-data while it is downloaded.
+
+The chunks of the (decompressed) response body are fed to an lxml parser as
+they arrive, the illegal &-characters are replaced at byte-level. No text-
+or bytes-copy of the whole body is made.
+"""
+import re
+import zlib
+
+from lxml import etree
+
+ILLEGAL_AMPERSAND = re.compile(rb'&([^a-zA-Z#])')
+CHUNK_SIZE = 16384
+
+
+class AmpersandEscaper:
+    """Define the replacing of illegal &-characters in chunks of bytes.
+
+       Whether an & is illegal depends on the next byte, a chunk ending in
+       &-characters is therefore escaped up to these, they are prepended to
+       the next chunk."""
+
+    def __init__(self):
+        """Constructor for this class"""
+        self._carry = b''
+
+    def escape(self, chunk):
+        """Provides the escaped chunk, without the trailing &-characters."""
+        data = self._carry + chunk if self._carry else chunk
+        end = len(data.rstrip(b'&'))
+        self._carry = data[end:]
+        return ILLEGAL_AMPERSAND.sub(rb'&amp;\1', data[:end])
+
+    def flush(self):
+        """Provides the escaped &-characters kept at the end of the data."""
+        data, self._carry = self._carry, b''
+        return ILLEGAL_AMPERSAND.sub(rb'&amp;\1', data)
+
+
+class FeedParser:
+    """Define the parsing of XML-data fed chunk by chunk.
+
+       With prune, prune(element) is called for every child of the root as
+       soon as it has been parsed (like the streaming domain_objects). The
+       crc32 checksum of the fed data is kept in checksum."""
+
+    def __init__(self, prune=None):
+        """Constructor for this class"""
+        self._escaper = AmpersandEscaper()
+        self._prune = prune
+        self._depth = 0
+        self.checksum = 0
+        if prune is None:
+            self._parser = etree.XMLParser()
+        else:
+            self._parser = etree.XMLPullParser(
+                events=('start', 'end'), remove_comments=True, remove_pis=True,
+            )
+
+    def feed(self, chunk):
+        """Parses a chunk of the XML-data."""
+        self.checksum = zlib.crc32(chunk, self.checksum)
+        data = self._escaper.escape(chunk)
+        if data:
+            self._parser.feed(data)
+            self._prune_parsed()
+
+    def close(self):
+        """Ends the parsing, returns the root element."""
+        data = self._escaper.flush()
+        if data:
+            self._parser.feed(data)
+        root = self._parser.close()
+        self._prune_parsed()
+        return root
+
+    def _prune_parsed(self):
+        """Prunes the children of the root parsed so far."""
+        if self._prune is None:
+            return
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth == 1:
+                self._prune(elem)
+
+
+class StreamDecompressor:
+    """Define the decompressing of a gzip- or deflate-encoded body chunk by
+       chunk, like decompress() does for a whole body."""
+
+    def __init__(self, content_encoding):
+        """Constructor for this class"""
+        self._raw_fallback = content_encoding == 'deflate'
+        self._started = False
+        self._decompressor = None
+        if content_encoding == 'gzip':
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif content_encoding == 'deflate':
+            self._decompressor = zlib.decompressobj()
+
+    def decompress(self, chunk):
+        """Provides the decompressed data of a chunk."""
+        if self._decompressor is None:
+            return chunk
+        try:
+            data = self._decompressor.decompress(chunk)
+        except zlib.error:
+            if not self._raw_fallback or self._started:
+                raise
+            # Some servers send a raw deflate-stream without zlib-header
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self._decompressor.decompress(chunk)
+        self._started = True
+        return data
+
+    def flush(self):
+        """Provides the remaining decompressed data."""
+        if self._decompressor is None:
+            return b''
+        return self._decompressor.flush()
@@ -0,0 +1,215 @@
+"""
+Concurrent polling of many gateways from one process.
+
+A Fleet holds one AsyncPlugwise object per gateway and refreshes the due
+gateways concurrently, with a bounded number of refreshes in flight. While
+running every gateway is polled in its own task, so a slow or unreachable
+gateway does not delay the others. A failing gateway is retried with an
+exponential backoff.
+"""
+import asyncio
+import collections
+import time
+
+from .instrumentation import percentile
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_INTERVAL = 60
+MAX_BACKOFF = 3600
+LATENCY_SAMPLES = 1000
+
+
+class _Gateway:
+    """Define the polling state of one gateway."""
+
+    __slots__ = ('api', 'interval', 'due', 'failures', 'devices', 'error',
+                 'updated')
+
+    def __init__(self, api, interval):
+        self.api = api
+        self.interval = interval
+        self.due = 0
+        self.failures = 0
+        self.devices = None
+        self.error = None
+        self.updated = None
+
+
+class Fleet:
+    """Define the concurrent polling of AsyncPlugwise objects."""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY,
+                 interval=DEFAULT_INTERVAL, max_backoff=MAX_BACKOFF,
+                 clock=time.monotonic):
+        """Constructor for this class
+
+           At most concurrency gateways are refreshed at the same time."""
+        self._concurrency = concurrency
+        self._semaphore = None
+        self._interval = interval
+        self._max_backoff = max_backoff
+        self._clock = clock
+        self._gateways = {}
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._refreshes = 0
+        self._failures = 0
+        self._busy = 0.0
+        self._in_flight = 0
+        self._busy_since = None
+        self._stop = None
+        self._tasks = {}
+
+    def add(self, gateway_id, api, interval=None):
+        """Adds an AsyncPlugwise object, refreshed every interval seconds."""
+        self._gateways[gateway_id] = _Gateway(api, interval or self._interval)
+        if self._stop is not None and not self._stop.is_set():
+            self._start(gateway_id)
+
+    async def remove(self, gateway_id):
+        """Removes a gateway and closes its websession."""
+        gateway = self._gateways.pop(gateway_id)
+        task = self._tasks.pop(gateway_id, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await gateway.api.close()
+
+    def get_api(self, gateway_id):
+        """Provides the AsyncPlugwise object of a gateway."""
+        return self._gateways[gateway_id].api
+
+    async def _refresh(self, gateway_id, gateway):
+        """Refreshes one gateway, a failure postpones the next refresh
+           with an exponential backoff."""
+        async with self._semaphore:
+            start = self._clock()
+            self._started(start)
+            try:
+                await gateway.api.full_update_device()
+                devices = gateway.api.get_all_device_data()
+            except Exception as error:  # pylint: disable=broad-except
+                now = self._clock()
+                gateway.failures += 1
+                gateway.error = error
+                self._failures += 1
+                backoff = min(self._max_backoff,
+                              gateway.interval * 2 ** gateway.failures)
+                gateway.due = now + backoff
+                return False
+            finally:
+                self._ended(self._clock())
+            now = self._clock()
+        self._latencies.append(now - start)
+        self._refreshes += 1
+        gateway.devices = devices
+        gateway.error = None
+        gateway.failures = 0
+        gateway.updated = now
+        gateway.due = now + gateway.interval
+        return True
+
+    def _started(self, now):
+        """Counts a refresh in flight, for the busy time."""
+        if self._in_flight == 0:
+            self._busy_since = now
+        self._in_flight += 1
+
+    def _ended(self, now):
+        """Counts a finished refresh, the busy time is the time with at
+           least one refresh in flight."""
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._busy += now - self._busy_since
+
+    async def poll(self):
+        """Refreshes the gateways that are due once, returns their ids when
+           all of them are done. run() polls every gateway on its own."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        start = self._clock()
+        due = [
+            (gateway_id, gateway) for gateway_id, gateway in self._gateways.items()
+            if gateway.due <= start
+        ]
+        await asyncio.gather(
+            *(self._refresh(gateway_id, gateway) for gateway_id, gateway in due)
+        )
+        return [gateway_id for gateway_id, _ in due]
+
+    def next_poll(self):
+        """Provides the seconds until the next gateway is due."""
+        if not self._gateways:
+            return self._interval
+        due = min(gateway.due for gateway in self._gateways.values())
+        return max(0, due - self._clock())
+
+    async def run(self):
+        """Polls until stop() is called, every gateway in its own task: a
+           gateway is rescheduled as soon as its own refresh is done."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        self._stop = asyncio.Event()
+        for gateway_id in self._gateways:
+            self._start(gateway_id)
+        await self._stop.wait()
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, gateway_id):
+        """Starts the polling task of a gateway."""
+        self._tasks[gateway_id] = asyncio.ensure_future(
+            self._run_gateway(gateway_id, self._gateways[gateway_id]))
+
+    async def _run_gateway(self, gateway_id, gateway):
+        """Refreshes one gateway whenever it is due, until stop() is called."""
+        while not self._stop.is_set():
+            delay = gateway.due - self._clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._refresh(gateway_id, gateway)
+
+    def stop(self):
+        """Ends run()."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def close(self):
+        """Closes the websessions of all gateways."""
+        await asyncio.gather(
+            *(gateway.api.close() for gateway in self._gateways.values())
+        )
+
+    def results(self):
+        """Provides per gateway the device-data of the last successful
+           refresh, the error of a failed refresh and the number of
+           consecutive failures."""
+        return {
+            gateway_id: {
+                'devices': gateway.devices,
+                'error': gateway.error,
+                'failures': gateway.failures,
+                'updated': gateway.updated,
+            }
+            for gateway_id, gateway in self._gateways.items()
+        }
+
+    def metrics(self):
+        """Provides the throughput and the refresh-latency percentiles
+           (over the last LATENCY_SAMPLES refreshes)."""
+        latencies = sorted(self._latencies)
+        return {
+            'gateways': len(self._gateways),
+            'refreshes': self._refreshes,
+            'failures': self._failures,
+            'gateways_per_second': self._refreshes / self._busy if self._busy else 0.0,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p99': percentile(latencies, 99),
+        }
+
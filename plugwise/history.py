@@ -0,0 +1,157 @@
+"""
+Fixed-size history of the measurements of the devices.
+
+Every (device, metric) has a ring buffer of timestamped samples, held in two
+typed arrays of doubles, so the memory per device is bounded by the capacity.
+The statistics over a window are computed by the builtins over (a slice of)
+these arrays, without converting the samples to Python objects first.
+"""
+import bisect
+import time
+from array import array
+
+DEFAULT_CAPACITY = 1440
+HISTORY_METRICS = ('current_temp', 'setpoint_temp', 'boiler_temp',
+                   'water_pressure', 'electricity_consumed', 'outdoor_temp')
+# The statistics of no samples
+NO_STATISTICS = {'count': 0, 'min': None, 'max': None, 'mean': None,
+                 'last': None, 'rate': None}
+
+
+class RingBuffer:
+    """Define a fixed-size buffer of timestamped samples, the oldest sample
+       is overwritten when it is full."""
+
+    __slots__ = ('_times', '_values', '_next', '_count')
+
+    def __init__(self, capacity):
+        """Constructor for this class"""
+        self._times = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        """Provides the maximum number of samples."""
+        return len(self._times)
+
+    def append(self, timestamp, value):
+        """Adds a sample, the samples must be added in time order."""
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+
+    def samples(self, since=None, last=None):
+        """Provides the times and values arrays of the samples in time order,
+           of the samples at or after since and/or of the last samples."""
+        if self._count < len(self._times):
+            times = self._times[:self._count]
+            values = self._values[:self._count]
+        else:
+            times = self._times[self._next:] + self._times[:self._next]
+            values = self._values[self._next:] + self._values[:self._next]
+        start = 0
+        if since is not None:
+            start = bisect.bisect_left(times, since)
+        if last is not None:
+            start = max(start, len(times) - last)
+        if start:
+            return times[start:], values[start:]
+        return times, values
+
+
+class MeasurementHistory:
+    """Define the history of the measurements per (device, metric)."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, metrics=HISTORY_METRICS,
+                 clock=time.time):
+        """Constructor for this class
+
+           At most capacity samples are kept per (device, metric)."""
+        self._capacity = capacity
+        self._metrics = metrics
+        self._clock = clock
+        self._buffers = {}
+
+    def record(self, dev_id, metric, value, timestamp=None):
+        """Adds one sample, a value of None is skipped."""
+        if value is None:
+            return
+        key = (dev_id, metric)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = RingBuffer(self._capacity)
+        buffer.append(self._clock() if timestamp is None else timestamp, float(value))
+
+    def record_devices(self, records, timestamp=None):
+        """Adds a sample of every metric of the typed device-records, as
+           provided by get_all_device_data(typed=True)."""
+        if timestamp is None:
+            timestamp = self._clock()
+        for dev_id, record in records.items():
+            if record is None:
+                continue
+            for metric in self._metrics:
+                self.record(dev_id, metric, getattr(record, metric, None), timestamp)
+
+    def devices(self):
+        """Provides the metrics with samples, per device-id."""
+        devices = {}
+        for dev_id, metric in self._buffers:
+            devices.setdefault(dev_id, []).append(metric)
+        return devices
+
+    def remove(self, dev_id):
+        """Removes the samples of a device."""
+        for key in [key for key in self._buffers if key[0] == dev_id]:
+            del self._buffers[key]
+
+    def _window(self, dev_id, metric, window, last):
+        """Provides the times and values arrays of the samples of the last
+           window seconds and/or the last samples."""
+        buffer = self._buffers.get((dev_id, metric))
+        if buffer is None:
+            return array('d'), array('d')
+        since = None
+        if window is not None:
+            since = self._clock() - window
+        return buffer.samples(since, last)
+
+    def get_samples(self, dev_id, metric, window=None, last=None):
+        """Provides the (timestamp, value) samples of the last window seconds
+           and/or the last samples, in time order."""
+        times, values = self._window(dev_id, metric, window, last)
+        return list(zip(times, values))
+
+    def get_statistics(self, dev_id, metric, window=None, last=None):
+        """Provides the count, min, max, mean and last value of the samples
+           of the last window seconds and/or the last samples, and the rate
+           of change per second between the first and the last of them.
+
+           The values are None when there are no samples."""
+        times, values = self._window(dev_id, metric, window, last)
+        count = len(values)
+        if not count:
+            return dict(NO_STATISTICS)
+        rate = None
+        if count > 1 and times[-1] > times[0]:
+            rate = (values[-1] - values[0]) / (times[-1] - times[0])
+        return {
+            'count': count,
+            'min': min(values),
+            'max': max(values),
+            'mean': sum(values) / count,
+            'last': values[-1],
+            'rate': rate,
+        }
+
+    def memory(self):
+        """Provides the bytes held by the sample arrays."""
+        return sum(
+            buffer.capacity * 2 * array('d').itemsize for buffer in self._buffers.values()
+        )
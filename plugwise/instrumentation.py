@@ -0,0 +1,258 @@
+"""
+Per-stage timings and sizes of the communication, parsing and extraction.
+
+instrument() wraps the methods of one Plugwise, Legacy_Anna (or asyncio)
+object and its session, every call is recorded in the metrics sinks as
+(stage, name, seconds, size). An object that is not instrumented runs
+without any overhead, remove() restores it.
+
+The stages are:
+    http      a request to the gateway, per method and endpoint (size: bytes)
+    fetch     the collecting of an endpoint, including http, parse and index
+    sanitize  the replacing of illegal characters (size: characters)
+    parse     the parsing of the XML-data, including sanitize
+    index     the indexing of the parsed XML-data, including parse
+    refresh   full_update_device()
+    extract   a get_* method
+    write     a set_* method, including http
+"""
+import collections
+import inspect
+import re
+import time
+
+DEFAULT_SAMPLES = 1000
+
+FETCH_METHODS = ('ping_gateway', 'ping_anna_thermostat', 'get_appliances',
+                 'get_locations', 'get_direct_objects', 'get_domain_objects')
+SANITIZE_METHODS = ('escape_illegal_xml_characters', 'escape_illegal_xml_bytes')
+PARSE_METHODS = ('_parse_xml', '_iterparse_domain_objects')
+INDEX_METHODS = ('_update_appliances', '_update_locations',
+                 '_update_direct_objects', '_update_domain_objects')
+REFRESH_METHODS = ('full_update_device',)
+
+
+class MetricsSink:
+    """Define the interface of a metrics sink."""
+
+    def record(self, stage, name, seconds, size=None):
+        """Records one measured call."""
+        raise NotImplementedError
+
+
+class CallbackSink(MetricsSink):
+    """Define a metrics sink calling callback(stage, name, seconds, size)."""
+
+    def __init__(self, callback):
+        """Constructor for this class"""
+        self._callback = callback
+
+    def record(self, stage, name, seconds, size=None):
+        """Records one measured call."""
+        self._callback(stage, name, seconds, size)
+
+
+class MetricsSummary(MetricsSink):
+    """Define the in-memory summary of the last samples per stage and name."""
+
+    def __init__(self, samples=DEFAULT_SAMPLES):
+        """Constructor for this class"""
+        self._samples = samples
+        self._seconds = {}
+        self._sizes = {}
+        self._counts = collections.Counter()
+
+    def record(self, stage, name, seconds, size=None):
+        """Records one measured call."""
+        key = (stage, name)
+        if key not in self._seconds:
+            self._seconds[key] = collections.deque(maxlen=self._samples)
+            self._sizes[key] = collections.deque(maxlen=self._samples)
+        self._seconds[key].append(seconds)
+        if size is not None:
+            self._sizes[key].append(size)
+        self._counts[key] += 1
+
+    def summary(self):
+        """Provides per (stage, name) the number of calls and the mean,
+           p50, p90, p99 and max seconds (and mean size) of the samples."""
+        result = {}
+        for key, samples in self._seconds.items():
+            seconds = sorted(samples)
+            sizes = self._sizes[key]
+            result[key] = {
+                'count': self._counts[key],
+                'mean': sum(seconds) / len(seconds),
+                'p50': percentile(seconds, 50),
+                'p90': percentile(seconds, 90),
+                'p99': percentile(seconds, 99),
+                'max': seconds[-1],
+                'mean_size': sum(sizes) / len(sizes) if sizes else None,
+            }
+        return result
+
+    def reset(self):
+        """Removes all samples."""
+        self._seconds.clear()
+        self._sizes.clear()
+        self._counts.clear()
+
+
+class Instrumentation:
+    """Define the instrumentation of one object, see instrument()."""
+
+    def __init__(self, api, sinks=(), samples=DEFAULT_SAMPLES):
+        """Constructor for this class"""
+        self._api = api
+        self._session = api._session
+        self.metrics = MetricsSummary(samples)
+        self._sinks = [self.metrics]
+        for sink in sinks:
+            self.add_sink(sink)
+        self._wrapped = []
+
+    def add_sink(self, sink):
+        """Adds a MetricsSink or a callback(stage, name, seconds, size)."""
+        if not isinstance(sink, MetricsSink):
+            sink = CallbackSink(sink)
+        self._sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        """Removes a MetricsSink."""
+        self._sinks.remove(sink)
+
+    def summary(self):
+        """Provides the in-memory summary, see MetricsSummary.summary()."""
+        return self.metrics.summary()
+
+    def record(self, stage, name, seconds, size=None):
+        """Records one measured call in all sinks."""
+        for sink in self._sinks:
+            sink.record(stage, name, seconds, size)
+
+    def _install(self):
+        """Wraps the methods of the object and its session."""
+        for name in dir(type(self._api)):
+            stage = _stage(name)
+            if stage is not None:
+                self._wrap(self._api, name, stage)
+        self._wrap(self._session, 'request', 'http')
+        if hasattr(self._session, 'stream'):
+            self._wrap(self._session, 'stream', 'http')
+
+    def _wrap(self, target, name, stage):
+        """Replaces a method by a measuring one, as instance attribute."""
+        method = getattr(target, name)
+        if not callable(method):
+            return
+        record = self.record
+        clock = time.perf_counter
+        if stage == 'http' and name == 'stream':
+            size = _no_size
+            label = _stream_label
+        elif stage == 'http':
+            size = _response_size
+            label = _request_label
+        elif stage in ('sanitize', 'parse'):
+            size = _argument_size
+            label = _method_label(name)
+        else:
+            size = _no_size
+            label = _method_label(name)
+
+        if inspect.iscoroutinefunction(method):
+            async def measured(*args, **kwargs):
+                start = clock()
+                result = await method(*args, **kwargs)
+                record(stage, label(args, kwargs), clock() - start, size(args, result))
+                return result
+        else:
+            def measured(*args, **kwargs):
+                start = clock()
+                result = method(*args, **kwargs)
+                record(stage, label(args, kwargs), clock() - start, size(args, result))
+                return result
+
+        measured.__doc__ = method.__doc__
+        setattr(target, name, measured)
+        self._wrapped.append((target, name))
+
+    def remove(self):
+        """Restores the unmeasured methods."""
+        for target, name in self._wrapped:
+            delattr(target, name)
+        self._wrapped = []
+
+
+def instrument(api, sinks=(), samples=DEFAULT_SAMPLES):
+    """Instruments a Plugwise or Legacy_Anna (or asyncio) object, returns the
+       Instrumentation holding the in-memory summary of the last samples."""
+    instrumentation = Instrumentation(api, sinks, samples)
+    instrumentation._install()
+    return instrumentation
+
+
+def _stage(name):
+    """Determines the stage of a method, None for an unmeasured one."""
+    if name in FETCH_METHODS:
+        return 'fetch'
+    if name in SANITIZE_METHODS:
+        return 'sanitize'
+    if name in PARSE_METHODS:
+        return 'parse'
+    if name in INDEX_METHODS:
+        return 'index'
+    if name in REFRESH_METHODS:
+        return 'refresh'
+    if name.startswith('get_'):
+        return 'extract'
+    if name.startswith('set_'):
+        return 'write'
+    return None
+
+
+def _method_label(name):
+    """Provides the labelling of the calls of a method, by its name."""
+    def label(args, kwargs):
+        return name
+    return label
+
+
+def _request_label(args, kwargs):
+    """Labels a request by method and endpoint, without the object-ids."""
+    method = args[1] if len(args) > 1 else kwargs.get('method', 'get')
+    return '{} {}'.format(method.upper(), re.sub(r';id=\w+', '', args[0]))
+
+
+def _stream_label(args, kwargs):
+    """Labels a streamed request by its endpoint."""
+    return 'GET {}'.format(args[0])
+
+
+def _response_size(args, result):
+    """Provides the decompressed size of a (status, body) or a response."""
+    if isinstance(result, tuple):
+        return len(result[1])
+    return len(result.content)
+
+
+def _argument_size(args, result):
+    """Provides the size of the XML-data argument, None when it has been
+       parsed while downloading."""
+    if args and isinstance(args[0], (str, bytes)):
+        return len(args[0])
+    return None
+
+
+def _no_size(args, result):
+    """Provides no size."""
+    return None
+
+
+def percentile(values, percent):
+    """Determines the nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
@@ -1,7 +1,7 @@
 """Plugwise Anna Home Assistant component."""
 
 import requests
-import xml.etree.cElementTree as Etree
+from lxml import etree
 # Time related
 import datetime
 import pytz
@@ -9,6 +9,17 @@ from dateutil.parser import parse
 # For XML corrections
 import re
 
+from .session import GatewaySession, DEFAULT_POOL_SIZE
+from .xpath import (
+    APPLIANCE_MEASUREMENT,
+    POINT_LOG_MEASUREMENT,
+    PRESET_RULE,
+    RULE,
+    RULE_TEMPLATE,
+    SERVICE_POINT_LOG,
+    first,
+)
+
 PING = "/ping"
 DIRECT_OBJECTS = "/core/direct_objects"
 DOMAIN_OBJECTS = "/core/domain_objects"
@@ -21,19 +32,26 @@ class Legacy_Anna:
     """Define the Legacy_Anna object."""
 
     def __init__(
-        self, username, password, host, port);
+        self, username, password, host, port, pool_size=DEFAULT_POOL_SIZE, session=None):
         """Set the constructor for this class."""
         self._username = username
         self._password = password
         self._endpoint = "http://" + host + ":" + str(port)
+        if session is None:
+            session = GatewaySession(self._endpoint, username, password, pool_size)
+        self._session = session
+
+    def close(self):
+        """Close the pooled connections to the thermostat."""
+        self._session.close()
+
+    def get_transfer_statistics(self):
+        """Get the number of requests and the bytes on the wire and decompressed."""
+        return self._session.statistics()
 
     def ping_anna_thermostat(self):
         """Ping the thermostat to see if it's online."""
-        ping = requests.get(
-            self._endpoint + PING,
-            auth=(self._username, self._password),
-            timeout=10,
-        )
+        ping = self._session.request(PING)
 
         if ping.status_code != 404:
             raise ConnectionError("Could not connect to the gateway.")
@@ -42,35 +60,31 @@ class Legacy_Anna:
 
     def get_direct_objects(self):
         """Collect the direct_objects XML-data."""
-        xml = requests.get(
-              self._endpoint + DIRECT_OBJECTS,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
+        xml = self._session.request(DIRECT_OBJECTS)
 
         if xml.status_code != requests.codes.ok:  # pylint: disable=no-member
             raise ConnectionError("Could not get the direct objects.")
 
-        return Etree.fromstring(self.escape_illegal_xml_characters(xml.text))
+        return self._parse_xml(xml.text)
 
     def get_domain_objects(self):
         """Collect the domain_objects XML-data."""
-        xml = requests.get(
-              self._endpoint + DOMAIN_OBJECTS,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
+        xml = self._session.request(DOMAIN_OBJECTS)
 
         if xml.status_code != requests.codes.ok:  # pylint: disable=no-member
             raise ConnectionError("Could not get the domain objects.")
 
-        return Etree.fromstring(self.escape_illegal_xml_characters(xml.text))
+        return self._parse_xml(xml.text)
 
     @staticmethod
     def escape_illegal_xml_characters(root):
         """Replace illegal &-characters."""
         return re.sub(r"&([^a-zA-Z#])", r"&amp;\1", root)
 
+    def _parse_xml(self, xml):
+        """Parse the collected XML-data."""
+        return etree.XML(self.escape_illegal_xml_characters(xml).encode())
+
     @staticmethod
     def get_presets(root):
         """
@@ -118,53 +132,31 @@ class Legacy_Anna:
     @staticmethod
     def get_schema_state(root):
         """Get the mode the thermostat is in (active schedule is true or false)."""
-        log_type = "schedule_state"
-        locator = (
-            "appliance[type='thermostat']/logs/point_log[type='"
-            + log_type
-            + "']/period/measurement"
-        )
-        if root.find(locator) is not None:
-            return root.find(locator).text == "on"
-        return None
+        return Legacy_Anna._appliance_status(root, "thermostat", "schedule_state")
 
     @staticmethod
     def get_boiler_status(root):
         """Get the active boiler-heating status (On-Off control)."""
-        log_type = "boiler_state"
-        locator = (
-            "appliance[type='heater_central']/logs/point_log[type='"
-            + log_type
-            + "']/period/measurement"
-        )
-        if root.find(locator) is not None:
-            return root.find(locator).text == "on"
-        return None
+        return Legacy_Anna._appliance_status(root, "heater_central", "boiler_state")
 
     @staticmethod
     def get_heating_status(root):
         """Get the active heating status (OpenTherm control)."""
-        log_type = "central_heating_state"
-        locator = (
-            "appliance[type='heater_central']/logs/point_log[type='"
-            + log_type
-            + "']/period/measurement"
-        )
-        if root.find(locator) is not None:
-            return root.find(locator).text == "on"
-        return None
+        return Legacy_Anna._appliance_status(root, "heater_central", "central_heating_state")
 
     @staticmethod
     def get_cooling_status(root):
         """Get the active cooling status."""
-        log_type = "cooling_state"
-        locator = (
-            "appliance[type='heater_central']/logs/point_log[type='"
-            + log_type
-            + "']/period/measurement"
+        return Legacy_Anna._appliance_status(root, "heater_central", "cooling_state")
+
+    @staticmethod
+    def _appliance_status(root, appliance_type, log_type):
+        """Get an on/off-state of the thermostat or the heater_central."""
+        measurement = first(
+            APPLIANCE_MEASUREMENT, root, appliance_type=appliance_type, log_type=log_type
         )
-        if root.find(locator) is not None:
-            return root.find(locator).text == "on"
+        if measurement is not None:
+            return measurement.text == "on"
         return None
 
     def get_current_preset(self, root):
@@ -244,22 +236,129 @@ class Legacy_Anna:
             value = '{:.1f}'.format(round(value, 1))
             return value
 
+    @staticmethod
+    def get_thermostat_state(root):
+        """
+        Get the whole thermostat state in one walk over the domain_objects,
+        after collecting the point_log ids of the services of the modules.
+
+        The keys are named after the getters providing the same values, like
+        'current_temperature' for get_current_temperature(). A missing
+        measurement is None.
+        """
+        point_logs = {}
+        for service in root.iterfind("module/services/*"):
+            point_log = service.find("functionalities/point_log")
+            log_type = service.get("log_type")
+            if point_log is not None and log_type not in point_logs:
+                point_logs[log_type] = point_log.get("id")
+        remaining = set(point_logs.values())
+
+        measurements = {}
+        appliance_measurements = {}
+        rules = []
+        for item in root:
+            if item.tag == "rule":
+                rules.append(item)
+                continue
+            appliance_type = None
+            if item.tag == "appliance":
+                appliance_type = item.findtext("type")
+                if appliance_type not in ("thermostat", "heater_central"):
+                    appliance_type = None
+            if appliance_type is None and not remaining:
+                # All measurements of the services have been found
+                continue
+            for point_log in item.iterfind("logs/point_log"):
+                point_log_id = point_log.get("id")
+                if appliance_type is None and point_log_id not in remaining:
+                    continue
+                measurement = point_log.findtext("period/measurement")
+                if measurement is None:
+                    continue
+                if point_log_id in remaining:
+                    remaining.discard(point_log_id)
+                    measurements[point_log_id] = measurement
+                if appliance_type is not None:
+                    appliance_measurements.setdefault(
+                        (appliance_type, point_log.findtext("type")), measurement
+                    )
+
+        def measurement(log_type):
+            point_log_id = point_logs.get(log_type)
+            if point_log_id:
+                return measurements.get(point_log_id)
+            return None
+
+        def temperature(log_type):
+            value = measurement(log_type)
+            if value is not None:
+                return float(value)
+            return None
+
+        def formatted(log_type):
+            value = measurement(log_type)
+            if value is not None:
+                return "{:.1f}".format(round(float(value), 1))
+            return None
+
+        def status(appliance_type, log_type):
+            value = appliance_measurements.get((appliance_type, log_type))
+            if value is not None:
+                return value == "on"
+            return None
+
+        presets = {}
+        schema_names = []
+        current_preset = None
+        active_found = False
+        for rule in rules:
+            directives = rule.findall("directives/when/then")
+            for directive in directives:
+                if "icon" in directive.keys():
+                    presets[directive.attrib["icon"]] = float(
+                        directive.attrib["temperature"]
+                    )
+            rule_name = rule.findtext("name")
+            if rule_name and "preset" not in rule_name:
+                schema_names.append(rule_name)
+            if not active_found and rule.findtext("active") == "true" and directives:
+                active_found = True
+                current_preset = directives[0].get("icon")
+
+        return {
+            "presets": presets,
+            "schema_names": schema_names or None,
+            "active_schema_name": "".join(schema_names),
+            "schema_state": status("thermostat", "schedule_state"),
+            "boiler_status": status("heater_central", "boiler_state"),
+            "heating_status": status("heater_central", "central_heating_state"),
+            "cooling_status": status("heater_central", "cooling_state"),
+            "current_preset": current_preset,
+            "schedule_temperature": temperature("schedule_temperature"),
+            "current_temperature": temperature("temperature"),
+            "target_temperature": temperature("target_temperature"),
+            "thermostat_temperature": temperature("thermostat"),
+            "outdoor_temperature": formatted("outdoor_temperature"),
+            "illuminance": formatted("illuminance"),
+            "boiler_temperature": formatted("boiler_temperature"),
+            "water_pressure": formatted("central_heater_water_pressure"),
+        }
+
     @staticmethod
     def get_point_log_id(root, log_type):
         """Get the point log ID based on log type."""
-        locator = (
-            "module/services/*[@log_type='" + log_type + "']/functionalities/point_log"
-        )
-        if root.find(locator) is not None:
-            return root.find(locator).attrib["id"]
+        point_log = first(SERVICE_POINT_LOG, root, log_type=log_type)
+        if point_log is not None:
+            return point_log.attrib["id"]
         return None
 
     @staticmethod
     def get_measurement_from_point_log(root, point_log_id):
         """Get the measurement from a point log based on point log ID."""
-        locator = "*/logs/point_log[@id='" + point_log_id + "']/period/measurement"
-        if root.find(locator) is not None:
-            return root.find(locator).text
+        measurement = first(POINT_LOG_MEASUREMENT, root, id=point_log_id)
+        if measurement is not None:
+            return measurement.text
         return None
 
     @staticmethod
@@ -274,7 +373,7 @@ class Legacy_Anna:
     def get_preset_dictionary(root, rule_id):
         """Get the presets from a rule based on rule ID and returns a dictionary with all the key-value pairs."""
         preset_dictionary = {}
-        directives = root.find("rule[@id='" + rule_id + "']/directives")
+        directives = first(RULE, root, id=rule_id).find("directives")
         for directive in directives:
             preset_dictionary[directive.attrib["preset"]] = float(
                 directive.find("then").attrib["setpoint"]
@@ -286,7 +385,7 @@ class Legacy_Anna:
         """Get the mode from a (list of) rule id(s)."""
         active = False
         for schema_id in schema_ids:
-            if root.find("rule[@id='" + schema_id + "']/active").text == "true":
+            if first(RULE, root, id=schema_id).find("active").text == "true":
                 active = True
                 break
         return active
@@ -296,43 +395,58 @@ class Legacy_Anna:
         """Get the active schema from a (list of) rule id(s)."""
         active = None
         for schema_id in schema_ids:
-            locator = root.find("rule[@id='" + schema_id + "']/active")
+            rule = first(RULE, root, id=schema_id)
             # Only one can be active
-            if locator.text == "true":
-                active = root.find("rule[@id='" + schema_id + "']/name").text
+            if rule.find("active").text == "true":
+                active = rule.find("name").text
                 return active
 
     def set_preset(self, root, preset):
         """Set the given preset on the thermostat for V1."""
-        locator = "rule/directives/when/then[@icon='" + preset + "'].../.../..."
-        rule = root.find(locator)
-        if rule is None:
-            raise CouldNotSetPresetException("Could not find preset '" + preset + "'")
-
-        rule_id = rule.attrib["id"]
-        xml = requests.put(
-              self._endpoint + ANNA_RULES,
-              auth=(self._username, self._password),
-              data="<rules>"
-              + '<rule id="'
-              + rule_id
-              + '">'
-              + "<active>true</active>"
-              + "</rule>"
-              + "</rules>",
-              headers={"Content-Type": "text/xml"},
-              timeout=10,
-        )
+        uri, data = self._preset_request(root, preset)
+        xml = self._session.request(uri, 'put', data)
         if xml.status_code != requests.codes.ok:  # pylint: disable=no-member
             raise CouldNotSetPresetException(
                 "Could not set the given " "preset: " + xml.text
             )
         return xml.text
-        
+
+    @staticmethod
+    def _preset_request(root, preset):
+        """Determine the uri and data to set the given preset."""
+        rule = first(PRESET_RULE, root, preset=preset)
+        if rule is None:
+            raise CouldNotSetPresetException("Could not find preset '" + preset + "'")
+
+        rule_id = rule.attrib["id"]
+        data = (
+            "<rules>"
+            + '<rule id="'
+            + rule_id
+            + '">'
+            + "<active>true</active>"
+            + "</rule>"
+            + "</rules>"
+        )
+        return RULES, data
+
     def set_schema_state(self, root, schema, state):
         """Send a set request to the schema with the given name."""
+        uri, data = self._schema_state_request(root, schema, state)
+
+        xml = self._session.request(uri, 'put', data)
+
+        if xml.status_code != requests.codes.ok:  # pylint: disable=no-member
+            raise CouldNotSetTemperatureException(
+                "Could not set the schema to {}.".format(state) + xml.text
+            )
+
+        return "{} {}".format(xml.text, data)
+
+    def _schema_state_request(self, root, schema, state):
+        """Determine the uri and data to set the schema with the given name."""
         schema_rule_id = self.get_rule_id_by_name(root, str(schema))
-        templates = root.findall(".//*[@id='{}']/template".format(schema_rule_id))
+        templates = RULE_TEMPLATE(root, id=schema_rule_id)
         template_id = None
         for rule in templates:
             template_id = rule.attrib["id"]
@@ -345,21 +459,7 @@ class Legacy_Anna:
             '<template id="{}" /><active>{}</active></rule>'
             "</rules>".format(schema_rule_id, schema, template_id, state)
         )
-
-        xml = requests.put(
-              self._endpoint + uri,
-              auth=(self._username, self._password),
-              data=data,
-              headers={"Content-Type": "text/xml"},
-              timeout=10,
-        )
-
-        if xml.status_code != requests.codes.ok:  # pylint: disable=no-member
-            CouldNotSetTemperatureException(
-                "Could not set the schema to {}.".format(state) + xml.text
-            )
-
-        return "{} {}".format(xml.text, data)
+        return uri, data
 
     def __get_temperature_uri(self, root):
         """Determine the set_temperature uri for different versions of Anna."""
@@ -369,25 +469,27 @@ class Legacy_Anna:
 
     def set_temperature(self, root, temperature):
         """Send a set request to the temperature with the given temperature."""
-        uri = self.__get_temperature_uri(root)
+        uri, data = self._temperature_request(root, temperature)
 
-        temperature = str(temperature)
-
-        xml = requests.put(
-              self._endpoint + uri,
-              auth=(self._username, self._password),
-              data="<thermostat_functionality><setpoint>"
-              + temperature
-              + "</setpoint></thermostat_functionality>",
-              headers={"Content-Type": "text/xml"},
-              timeout=10,
-        )
+        xml = self._session.request(uri, 'put', data)
 
         if xml.status_code != requests.codes.ok:  # pylint: disable=no-member
-            CouldNotSetTemperatureException("Could not set the temperature." + xml.text)
+            raise CouldNotSetTemperatureException("Could not set the temperature." + xml.text)
 
         return xml.text
 
+    def _temperature_request(self, root, temperature):
+        """Determine the uri and data to set the given temperature."""
+        uri = self.__get_temperature_uri(root)
+
+        temperature = str(temperature)
+        data = (
+            "<thermostat_functionality><setpoint>"
+            + temperature
+            + "</setpoint></thermostat_functionality>"
+        )
+        return uri, data
+
 
 class AnnaException(Exception):
     """Define Exceptions."""
@@ -11,6 +11,29 @@ from dateutil.parser import parse
 
 # For XML corrections
 import re
+import zlib
+
+# For the warm-start snapshot
+import os
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from .energy import EnergyLogs, energy_range
+from .feed import FeedParser
+from .history import NO_STATISTICS, MeasurementHistory
+from .published import PublishedData
+from .records import (
+    HeaterCentralRecord,
+    PlugRecord,
+    ThermostaticRecord,
+    ZoneRecord,
+)
+from .session import GatewaySession, DEFAULT_POOL_SIZE
+from .views import DeviceDataView
 
 PING = "/ping"
 DIRECT_OBJECTS = "/core/direct_objects"
@@ -18,86 +41,801 @@ DOMAIN_OBJECTS = "/core/domain_objects"
 LOCATIONS = "/core/locations"
 APPLIANCES = "/core/appliances"
 RULES = "/core/rules"
+# The endpoints collected by an update
+ENDPOINTS = (APPLIANCES, DOMAIN_OBJECTS, DIRECT_OBJECTS, LOCATIONS)
+# The endpoint holding the written state, per kind of pending write
+PENDING_ENDPOINTS = {
+    'temperature': APPLIANCES,
+    'preset': DOMAIN_OBJECTS,
+    'schedule': DOMAIN_OBJECTS,
+    'relay': APPLIANCES,
+}
+
+PRESET_TEMPLATE = 'zone_setpoint_and_state_based_on_preset'
+PRESET_NAME = 'Thermostat presets'
+SCHEDULE_TEMPLATE = 'zone_preset_based_on_time_and_presence_with_override'
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+# The children of the domain_objects that are kept in streaming mode,
+# all other elements are removed while parsing.
+STREAMING_KEEP = {
+    'appliance': ('name', 'type', 'modified_date', 'logs', 'actuator_functionalities'),
+    'location': ('name', 'type', 'preset', 'modified_date', 'logs', 'actuator_functionalities'),
+    'rule': ('name', 'template', 'active', 'modified_date', 'directives', 'contexts'),
+}
+STREAMING_KEEP_OTHER = ('name', 'type', 'modified_date')
+STREAMING_LOGS = ('point_log', 'interval_log')
+
+# The fields of the heater_central added to the device-data
+CONTROLLER_STATES = ('boiler_state', 'central_heating_state', 'cooling_state', 'dhw_state')
+CONTROLLER_FIELDS = ('type', 'boiler_temp', 'water_pressure', 'outdoor_temp') + CONTROLLER_STATES
+
+# The collected data of the device-data fields, as (endpoint, kind of the
+# appliances), see refresh(). The type and name are part of the topology.
+THERMOSTATIC_TYPES = ('zone_thermostat', 'thermostatic_radiator_valve', 'thermostat')
+FIELD_SOURCES = {
+    'battery': (APPLIANCES, 'thermostat'),
+    'setpoint_temp': (APPLIANCES, 'thermostat'),
+    'current_temp': (APPLIANCES, 'thermostat'),
+    'boiler_temp': (APPLIANCES, 'heater_central'),
+    'water_pressure': (APPLIANCES, 'heater_central'),
+    'electricity_consumed': (APPLIANCES, 'plug'),
+    'electricity_consumed_interval': (APPLIANCES, 'plug'),
+    'electricity_produced': (APPLIANCES, 'plug'),
+    'electricity_produced_interval': (APPLIANCES, 'plug'),
+    'relay': (APPLIANCES, 'plug'),
+    'boiler_state': (DIRECT_OBJECTS, None),
+    'central_heating_state': (DIRECT_OBJECTS, None),
+    'cooling_state': (DIRECT_OBJECTS, None),
+    'dhw_state': (DIRECT_OBJECTS, None),
+    'outdoor_temp': (DOMAIN_OBJECTS, None),
+    'illuminance': (DOMAIN_OBJECTS, None),
+    'active_preset': (DOMAIN_OBJECTS, None),
+    'presets': (DOMAIN_OBJECTS, None),
+    'available_schedules': (DOMAIN_OBJECTS, None),
+    'selected_schedule': (DOMAIN_OBJECTS, None),
+    'last_used': (DOMAIN_OBJECTS, None),
+}
+KIND_FIELDS = {
+    'thermostat': ('battery', 'setpoint_temp', 'current_temp', 'active_preset',
+                   'presets', 'available_schedules', 'selected_schedule',
+                   'last_used') + CONTROLLER_STATES,
+    'plug': ('electricity_consumed', 'electricity_consumed_interval',
+             'electricity_produced', 'electricity_produced_interval', 'relay'),
+    'heater_central': CONTROLLER_FIELDS[1:],
+}
+
+# The format of the warm-start snapshot, a snapshot of another version
+# is ignored.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_STATE = ('_rules', '_actuator_index', '_location_index', '_digests',
+                  '_appliance_measurements', '_direct_measurements',
+                  '_domain_measurements', '_domain_versions',
+                  '_domain_item_measurements')
 
 
 class Plugwise:
     """Define the Plugwise object."""
 
-    def __init__(self, username, password, host, port):
-        """Constructor for this class"""
+    def __init__(self, username, password, host, port,
+                 pool_size=DEFAULT_POOL_SIZE, streaming=False,
+                 track_changes=False, chunked=False, session=None,
+                 snapshot=None, history_size=0, double_buffered=False):
+        """Constructor for this class
+
+           With streaming=True the domain_objects are parsed while streaming
+           and only the elements used by this library are kept.
+           With chunked=True the XML-data is parsed while it is downloaded.
+           With track_changes=True the changed device-data is determined
+           after every full_update_device(), see get_changes().
+           With snapshot=path a snapshot saved by save_snapshot() is loaded,
+           the device-data is stale until the first full_update_device().
+           With history_size=n the last n samples of the measurements of
+           every device are kept, see get_history().
+           With double_buffered=True the device-data is provided from the
+           data published after every update, see get_published(); until
+           the first update no devices are provided."""
         self._username = username
         self._password = password
         self._endpoint = 'http://' + host + ':' + str(port)
+        if session is None:
+            session = GatewaySession(self._endpoint, username, password, pool_size)
+        self._session = session
+        self._write_limit = pool_size
+        self._streaming = streaming
+        self._chunked = chunked
+        self._actuator_index = None
+        self._location_index = None
+        self._domain_versions = {}
+        self._domain_item_measurements = {}
+        self._domain_changes = set()
+        self._digests = {}
+        self._endpoint_changes = {}
+        self._collected = set()
+        self._rules = {'rules': {}, 'tags': {}, 'names': {}, 'locations': {}}
+        self._track_changes = track_changes
+        self._snapshot = {}
+        self._changes = {}
+        self._subscribers = {}
+        self._pending = {}
+        # Changed with every update of the collected data, see DeviceDataView
+        self._generation = 0
+        self._snapshot_path = snapshot
+        self._warm = None
+        if history_size < 0:
+            raise ValueError("The history_size can not be negative.")
+        self._history = MeasurementHistory(history_size) if history_size else None
+        self._double_buffered = double_buffered
+        self._published = None
+        # Serializes the updates of the collected data with the writes
+        self._update_lock = threading.RLock()
+        self._refresher = None
+        self._refresher_stop = None
+        self._refresh_error = None
+        if snapshot is not None:
+            self._load_snapshot(snapshot)
+
+    def close(self):
+        """Closes the pooled connections to the gateway."""
+        self._session.close()
+
+    def get_transfer_statistics(self):
+        """Provides the number of requests and the bytes on the wire and
+           decompressed."""
+        return self._session.statistics()
 
     def ping_gateway(self):
         """Ping the gateway (Adam/Smile) to see if it's online"""
-        xml = requests.get(
-              self._endpoint + PING,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
+        xml = self._session.request(PING)
         if xml.status_code != 404:
             raise ConnectionError("Could not connect to the gateway.")
         return True
 
     def get_appliances(self):
         """Collects the appliances XML-data."""
-        xml = requests.get(
-              self._endpoint + APPLIANCES,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
-        if xml.status_code != requests.codes.ok:
+        status, xml = self._fetch(APPLIANCES)
+        if status != requests.codes.ok:
             raise ConnectionError("Could not get the appliances.")
-        self._appliances = etree.XML(self.escape_illegal_xml_characters(xml.text).encode())
+        self._update_appliances(xml)
 
     def get_locations(self):
         """Collects the locations XML-data."""
-        xml = requests.get(
-              self._endpoint + LOCATIONS,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
-        if xml.status_code != requests.codes.ok:
-            raise ConnectionError("Could not get the appliances.")
-        self._locations = etree.XML(self.escape_illegal_xml_characters(xml.text).encode())
+        status, xml = self._fetch(LOCATIONS)
+        if status != requests.codes.ok:
+            raise ConnectionError("Could not get the locations.")
+        self._update_locations(xml)
 
     def get_direct_objects(self):
         """Collects the direct_objects XML-data."""
-        xml = requests.get(
-              self._endpoint + DIRECT_OBJECTS,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
-        if xml.status_code != requests.codes.ok:
-            raise ConnectionEror("Could not get the direct objects.")
-        self._direct_objects = etree.XML(self.escape_illegal_xml_characters(xml.text).encode())
+        status, xml = self._fetch(DIRECT_OBJECTS)
+        if status != requests.codes.ok:
+            raise ConnectionError("Could not get the direct objects.")
+        self._update_direct_objects(xml)
     
-    def get_domain_objects(self):
+    def get_domain_objects(self, incremental=False):
         """Collects the domain_objects XML-data."""
-        xml = requests.get(
-              self._endpoint + DOMAIN_OBJECTS,
-              auth=(self._username, self._password),
-              timeout=10,
-        )
-        if xml.status_code != requests.codes.ok:
+        status, xml = self._fetch(DOMAIN_OBJECTS, raw=self._streaming)
+        if status != requests.codes.ok:
             raise ConnectionError("Could not get the domain objects.")
-        self._domain_objects = etree.XML(self.escape_illegal_xml_characters(xml.text).encode())
+        self._update_domain_objects(xml, incremental)
+
+    def _fetch(self, command, raw=False):
+        """Requests the XML-data of an endpoint, returns the status and the
+           text (the bytes with raw=True). With chunked=True the XML-data is
+           parsed while it is downloaded, the root element is returned."""
+        if self._chunked:
+            parser = self._feed_parser(command)
+            status = self._session.stream(command, parser.feed)
+            return status, self._feed_result(command, status, parser)
+        xml = self._session.request(command)
+        if raw:
+            return xml.status_code, xml.content
+        return xml.status_code, xml.text
+
+    def _feed_parser(self, command):
+        """Provides the parser fed with the chunks of an endpoint, in
+           streaming mode pruning the domain_objects while parsing."""
+        if self._streaming and command == DOMAIN_OBJECTS:
+            return FeedParser(self._prune_domain_object)
+        return FeedParser()
+
+    def _feed_result(self, command, status, parser):
+        """Ends the parsing of a successful request, returns the root element."""
+        if status != requests.codes.ok:
+            return None
+        root = parser.close()
+        self._set_digest(command, parser.checksum)
+        return root
+
+    def _update_digest(self, endpoint, xml):
+        """Keeps in _endpoint_changes whether the XML-data of the endpoint
+           differs from the previous update, compared by checksum."""
+        if etree.iselement(xml):
+            # Parsed while downloading, the digest has been set by _fetch()
+            return
+        if isinstance(xml, str):
+            xml = xml.encode()
+        self._set_digest(endpoint, zlib.crc32(xml))
+
+    def _set_digest(self, endpoint, digest):
+        """Keeps the checksum of the XML-data of an endpoint."""
+        previous = self._digests.get(endpoint)
+        self._endpoint_changes[endpoint] = previous is not None and previous != digest
+        self._collected.add(endpoint)
+        self._digests[endpoint] = digest
+
+    def _update_appliances(self, xml):
+        """Parses and indexes the collected appliances XML-data."""
+        self._update_digest(APPLIANCES, xml)
+        self._generation += 1
+        self._appliances = self._parse_xml(xml)
+        self._appliance_measurements = self._index_measurements(self._appliances)
+
+    def _update_locations(self, xml):
+        """Parses the collected locations XML-data."""
+        self._update_digest(LOCATIONS, xml)
+        self._generation += 1
+        self._locations = self._parse_xml(xml)
+        self._location_index = None
+
+    def _update_direct_objects(self, xml):
+        """Parses and indexes the collected direct_objects XML-data."""
+        self._update_digest(DIRECT_OBJECTS, xml)
+        self._generation += 1
+        self._direct_objects = self._parse_xml(xml)
+        self._direct_measurements = self._index_measurements(self._direct_objects)
+
+    def _update_domain_objects(self, xml, incremental=False):
+        """Parses and indexes the collected domain_objects XML-data.
+
+           In incremental mode only the objects with a new modified_date are
+           indexed again, the measurements of the unchanged objects are taken
+           from the previous update. The (tag, id) of the changed, new and
+           removed objects are kept in _domain_changes."""
+        self._update_digest(DOMAIN_OBJECTS, xml)
+        self._generation += 1
+        if self._streaming and not etree.iselement(xml):
+            domain_objects = self._iterparse_domain_objects(xml)
+        else:
+            domain_objects = self._parse_xml(xml)
+        versions = {}
+        item_measurements = {}
+        changes = set()
+        for item in domain_objects:
+            key = (item.tag, item.get('id'))
+            version = item.findtext('modified_date')
+            versions[key] = version
+            if (incremental and version is not None
+                    and self._domain_versions.get(key) == version):
+                item_measurements[key] = self._domain_item_measurements[key]
+            else:
+                item_measurements[key] = self._index_item_measurements(item)
+                changes.add(key)
+        changes.update(set(self._domain_versions) - set(versions))
+
+        self._domain_objects = domain_objects
+        self._actuator_index = None
+        self._domain_versions = versions
+        self._domain_item_measurements = item_measurements
+        self._domain_changes = changes
+        # The rule model is only rebuilt when a rule has changed
+        if any(key[0] == 'rule' for key in changes):
+            self._rules = self._build_rule_model(domain_objects)
+        self._domain_measurements = self._merge_measurements(
+            (key[1], entries) for key, entries in item_measurements.items()
+        )
         
+    def _parse_xml(self, xml):
+        """Parses the collected XML-data after replacing the illegal characters,
+           XML-data parsed while downloading is returned as it is."""
+        if etree.iselement(xml):
+            return xml
+        return etree.XML(self.escape_illegal_xml_characters(xml).encode())
+
     @staticmethod
     def escape_illegal_xml_characters(root):
         """Replaces illegal &-characters."""
         return re.sub(r'&([^a-zA-Z#])',r'&amp;\1',root)
 
-    def full_update_device(self):
-        """Update device."""
-        self.get_appliances()
-        self.get_domain_objects()
-        self.get_direct_objects()
-        self.get_locations()
+    @staticmethod
+    def escape_illegal_xml_bytes(root):
+        """Replaces illegal &-characters, without decoding the XML-data."""
+        return re.sub(rb'&([^a-zA-Z#])', rb'&amp;\1', root)
+
+    def _iterparse_domain_objects(self, xml):
+        """Parses the domain_objects XML-data (bytes) while streaming, every
+           object is pruned to the elements used by this library as soon as
+           it has been parsed."""
+        root = None
+        depth = 0
+        for event, elem in etree.iterparse(
+                BytesIO(self.escape_illegal_xml_bytes(xml)),
+                events=('start', 'end'),
+                remove_comments=True,
+                remove_pis=True,
+        ):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                self._prune_domain_object(elem)
+        return root
+
+    @staticmethod
+    def _prune_domain_object(item):
+        """Removes the elements of a domain object that are not used."""
+        keep = STREAMING_KEEP.get(item.tag, STREAMING_KEEP_OTHER)
+        for child in list(item):
+            if child.tag not in keep:
+                item.remove(child)
+            elif child.tag == 'logs':
+                for log in list(child):
+                    if log.tag not in STREAMING_LOGS:
+                        child.remove(log)
+                        continue
+                    for part in list(log):
+                        if part.tag not in ('type', 'period'):
+                            log.remove(part)
+            elif child.tag == 'actuator_functionalities':
+                # Only the functionality-ids are used
+                for functionality in child:
+                    del functionality[:]
+
+    @classmethod
+    def _index_measurements(cls, root):
+        """Indexes the latest measurements in one walk over the XML-data.
+
+           The keys are (object_id, log_kind, log_type), for instance
+           (appliance_id, 'point_log', 'temperature'). Numeric measurements
+           are stored as float, others (like 'on'/'off') as text. The first
+           measurement in document order is also stored with object_id None,
+           matching a search over the whole document."""
+        return cls._merge_measurements(
+            (item.get('id'), cls._index_item_measurements(item)) for item in root
+        )
+
+    @staticmethod
+    def _index_item_measurements(item):
+        """Obtains the (log_kind, log_type, value) of the latest measurements
+           of one object, in document order."""
+        entries = []
+        for log in item.iterfind('.//logs/*'):
+            log_type = log.find('type')
+            measurement = log.find('period/measurement')
+            if log_type is None or measurement is None:
+                continue
+            value = measurement.text
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                pass
+            entries.append((log.tag, log_type.text, value))
+        return entries
+
+    @staticmethod
+    def _merge_measurements(item_measurements):
+        """Merges the measurements per object_id into one index."""
+        index = {}
+        for item_id, entries in item_measurements:
+            for log_kind, log_type, value in entries:
+                index.setdefault((item_id, log_kind, log_type), value)
+                index.setdefault((None, log_kind, log_type), value)
+        return index
+
+    def full_update_device(self, incremental=False):
+        """Update device.
+
+           With incremental=True only the changed domain_objects are
+           indexed again."""
+        with self._update_lock:
+            self.get_appliances()
+            self.get_domain_objects(incremental)
+            self.get_direct_objects()
+            self.get_locations()
+            self._finish_update()
+
+    def refresh(self, fields=None, kinds=None, filtered=True):
+        """Updates only the collected data of the given device-data fields
+           and/or device kinds ('thermostat', 'plug', 'heater_central'),
+           see FIELD_SOURCES. Without fields and kinds, or before the first
+           update, this is a full_update_device().
+
+           With filtered=True only the appliances of the needed kinds are
+           requested, with the type-filter of /core/appliances. Returns the
+           requested URIs."""
+        plan = self._refresh_plan(fields, kinds, filtered)
+        if plan is None:
+            self.full_update_device()
+            return [APPLIANCES, DOMAIN_OBJECTS, DIRECT_OBJECTS, LOCATIONS]
+        with self._update_lock:
+            objects = None
+            for uri in plan:
+                if uri == APPLIANCES:
+                    self.get_appliances()
+                elif uri == DOMAIN_OBJECTS:
+                    self.get_domain_objects(incremental=True)
+                elif uri == DIRECT_OBJECTS:
+                    self.get_direct_objects()
+                else:
+                    xml = self._session.request(uri)
+                    if xml.status_code != requests.codes.ok: # pylint: disable=no-member
+                        raise ConnectionError("Could not get the appliances.")
+                    objects = (objects or set()) | self._merge_appliances(xml.text)
+            self._finish_update(self._planned_endpoints(plan), objects)
+        return plan
+
+    @staticmethod
+    def _planned_endpoints(plan):
+        """Provides the endpoints (partly) collected by a refresh plan."""
+        return [endpoint for endpoint in ENDPOINTS
+                if any(uri.startswith(endpoint) for uri in plan)]
+
+    def update_endpoints(self, endpoints, incremental=True):
+        """Collects the XML-data of some endpoints (of ENDPOINTS), like a
+           PollingScheduler does. The update is finished (published, added
+           to the history and compared) once every endpoint has been
+           collected at least once.
+
+           Returns per endpoint whether its XML-data changed since its
+           previous update."""
+        with self._update_lock:
+            for endpoint in endpoints:
+                self._collect(endpoint, incremental)
+            return self._endpoints_updated(endpoints)
+
+    def _collect(self, endpoint, incremental=True):
+        """Collects the XML-data of one endpoint."""
+        if endpoint == APPLIANCES:
+            return self.get_appliances()
+        if endpoint == DOMAIN_OBJECTS:
+            return self.get_domain_objects(incremental)
+        if endpoint == DIRECT_OBJECTS:
+            return self.get_direct_objects()
+        if endpoint == LOCATIONS:
+            return self.get_locations()
+        raise ValueError("Unknown endpoint: " + str(endpoint))
+
+    def _endpoints_updated(self, endpoints):
+        """Finishes the update when every endpoint has been collected,
+           provides the changes per updated endpoint."""
+        if endpoints and self._collected.issuperset(ENDPOINTS):
+            self._finish_update(endpoints)
+        return {endpoint: bool(self._endpoint_changes.get(endpoint)) for endpoint in endpoints}
+
+    def get_write_count(self):
+        """Provides the number of writes sent to the gateway."""
+        return self._session.writes
+
+    def _finish_update(self, endpoints=ENDPOINTS, objects=None):
+        """Ends an update of the collected data: the warm-start snapshot and
+           the pending writes of the collected endpoints are dropped, the
+           device-data is published, added to the history and compared with
+           the previous update.
+
+           With objects (the ids of the collected appliances and their
+           locations) only some appliances were collected."""
+        self._warm = None
+        self._drop_pending(endpoints, objects)
+        self._publish()
+        self._record_history()
+        self._detect_changes()
+
+    def _refresh_plan(self, fields, kinds, filtered):
+        """Determines the smallest set of URIs providing the data of the
+           fields and kinds, None when a full update is needed."""
+        if not fields and not kinds:
+            return None
+        if self._warm is not None or getattr(self, '_appliances', None) is None:
+            return None
+        wanted = set(fields or ())
+        for kind in kinds or ():
+            if kind not in KIND_FIELDS:
+                raise ValueError("Unknown device kind: " + str(kind))
+            wanted.update(KIND_FIELDS[kind])
+        unknown = wanted - set(FIELD_SOURCES) - {'type', 'name'}
+        if unknown:
+            raise ValueError("Unknown fields: " + ', '.join(sorted(unknown)))
+
+        sources = {}
+        for field in wanted:
+            if field in FIELD_SOURCES:
+                endpoint, kind = FIELD_SOURCES[field]
+                sources.setdefault(endpoint, set()).add(kind)
+        plan = []
+        if APPLIANCES in sources:
+            types = {}
+            for appliance in self._appliances:
+                kind = self._appliance_kind(appliance)
+                if kind is not None:
+                    types.setdefault(appliance.findtext('type'), set()).add(kind)
+            needed = sorted(
+                appliance_type for appliance_type, appliance_kinds in types.items()
+                if appliance_kinds & sources[APPLIANCES]
+            )
+            # All device kinds: one request of all appliances instead
+            if not filtered or len(needed) == len(types):
+                plan.append(APPLIANCES)
+            else:
+                plan += [APPLIANCES + ';type=' + appliance_type for appliance_type in needed]
+        for endpoint in (DOMAIN_OBJECTS, DIRECT_OBJECTS):
+            if endpoint in sources:
+                plan.append(endpoint)
+        return plan
+
+    @staticmethod
+    def _appliance_kind(appliance):
+        """Determines the device kind of an appliance, None for the others."""
+        if appliance.find('actuator_functionalities/relay_functionality') is not None:
+            return 'plug'
+        appliance_type = appliance.findtext('type')
+        if appliance_type in THERMOSTATIC_TYPES:
+            return 'thermostat'
+        if appliance_type == 'heater_central':
+            return 'heater_central'
+        return None
+
+    def _drop_pending(self, endpoints, objects=None):
+        """Drops the pending writes whose written state has been collected
+           again, these are now given by the collected data."""
+        for key in list(self._pending):
+            endpoint = PENDING_ENDPOINTS[key[0]]
+            if endpoint not in endpoints:
+                continue
+            if endpoint == APPLIANCES and objects is not None and key[1] not in objects:
+                continue
+            del self._pending[key]
+
+    def _merge_appliances(self, xml):
+        """Replaces the appliances found in the (filtered) appliances XML-data
+           and indexes the measurements again. Provides the ids of the
+           appliances and of their locations."""
+        objects = set()
+        appliances = {appliance.get('id'): appliance for appliance in self._appliances}
+        for appliance in list(self._parse_xml(xml)):
+            objects.add(appliance.get('id'))
+            location = appliance.find('location')
+            if location is not None:
+                objects.add(location.get('id'))
+            previous = appliances.get(appliance.get('id'))
+            if previous is None:
+                self._appliances.append(appliance)
+            else:
+                self._appliances.replace(previous, appliance)
+        self._generation += 1
+        self._appliance_measurements = self._index_measurements(self._appliances)
+        return objects
+
+    def get_changes(self):
+        """Provides the device-data changed by the last full_update_device(),
+           as {dev_id: {field: (old_value, new_value)}}.
+
+           Requires track_changes=True or a subscriber. After the first
+           update all fields are reported, with None as old value."""
+        return self._changes
+
+    def subscribe(self, callback, dev_id=None, field=None):
+        """Registers callback(dev_id, field, old_value, new_value) for the
+           changes of one device and/or field, None matches all.
+
+           Subscribing enables the change tracking. Returns a function to
+           unsubscribe."""
+        self._track_changes = True
+        key = (dev_id, field)
+        self._subscribers.setdefault(key, []).append(callback)
+
+        def unsubscribe():
+            """Removes the callback."""
+            self._subscribers[key].remove(callback)
+
+        return unsubscribe
+
+    def _detect_changes(self):
+        """Compares the device-data with the previous update and notifies
+           the subscribers of the changed fields."""
+        if not self._track_changes:
+            return
+        snapshot = self.get_all_device_data()
+        changes = {}
+        for dev_id in list(self._snapshot) + [d for d in snapshot if d not in self._snapshot]:
+            old_data = self._snapshot.get(dev_id) or {}
+            new_data = snapshot.get(dev_id) or {}
+            fields = {}
+            for field in list(old_data) + [f for f in new_data if f not in old_data]:
+                old_value = old_data.get(field)
+                new_value = new_data.get(field)
+                if old_value != new_value or field not in old_data:
+                    fields[field] = (old_value, new_value)
+            if fields:
+                changes[dev_id] = fields
+        self._snapshot = snapshot
+        self._changes = changes
+
+        for dev_id, fields in changes.items():
+            for field, (old_value, new_value) in fields.items():
+                for key in ((dev_id, field), (dev_id, None), (None, field), (None, None)):
+                    for callback in list(self._subscribers.get(key, ())):
+                        callback(dev_id, field, old_value, new_value)
     
+    def _record_history(self):
+        """Adds the measurements of the devices to the history."""
+        if self._history is not None:
+            if self._published is not None:
+                self._history.record_devices(self._published.records)
+            else:
+                self._history.record_devices(self._device_records())
+
+    def _publish(self):
+        """Extracts the device-data of the collected data into a new
+           PublishedData, replacing the previous one at once."""
+        if not self._double_buffered or self._warm is not None:
+            return
+        self._published = PublishedData(
+            self._generation,
+            self._device_list(),
+            self._device_records(),
+            self.get_outdoor_temperature(),
+        )
+
+    def get_published(self):
+        """Provides the PublishedData of the last update, None before the
+           first update or without double-buffering. It does not change."""
+        return self._published
+
+    def get_published_age(self):
+        """Provides the seconds since the device-data was published, None
+           before the first update or without double-buffering."""
+        published = self._published
+        if published is None:
+            return None
+        return published.age()
+
+    def start_refresher(self, interval, incremental=True):
+        """Runs full_update_device() every interval seconds in a background
+           thread and enables the double-buffering: the device-data is
+           provided from the last published update, so reading it never
+           waits for the gateway. A failed update keeps the published data,
+           see get_refresh_error()."""
+        if self._refresher is not None:
+            return
+        with self._update_lock:
+            self._double_buffered = True
+            # Already collected data is published before the thread starts
+            if self._collected.issuperset(ENDPOINTS):
+                self._publish()
+        self._refresher_stop = threading.Event()
+        self._refresher = threading.Thread(
+            target=self._run_refresher,
+            args=(interval, incremental, self._refresher_stop),
+            name='plugwise-refresher',
+            daemon=True,
+        )
+        self._refresher.start()
+
+    def _run_refresher(self, interval, incremental, stop):
+        """Updates the collected data until stop is set."""
+        while not stop.is_set():
+            try:
+                self.full_update_device(incremental)
+                self._refresh_error = None
+            except (ConnectionError, requests.RequestException, etree.XMLSyntaxError) as error:
+                self._refresh_error = error
+            stop.wait(interval)
+
+    def stop_refresher(self, timeout=None):
+        """Stops the background refresher, after the running update."""
+        if self._refresher is None:
+            return
+        self._refresher_stop.set()
+        self._refresher.join(timeout)
+        self._refresher = None
+
+    def get_refresh_error(self):
+        """Provides the error of the last background update, None when it
+           succeeded."""
+        return self._refresh_error
+
+    def get_history(self, dev_id, metric, window=None, last=None):
+        """Provides the (timestamp, value) samples of a measurement (like
+           'current_temp') of a device, of the last window seconds and/or the
+           last samples. Without history_size there are no samples."""
+        if self._history is None:
+            return []
+        return self._history.get_samples(dev_id, metric, window, last)
+
+    def get_history_statistics(self, dev_id, metric, window=None, last=None):
+        """Provides the count, min, max, mean, last value and rate of change
+           (per second) of a measurement of a device, see get_history()."""
+        if self._history is None:
+            return dict(NO_STATISTICS)
+        return self._history.get_statistics(dev_id, metric, window, last)
+
+    def save_snapshot(self, path=None):
+        """Saves the extracted state (topology, rule model, measurements
+           and actuator-ids) to a compressed snapshot, by default to the
+           snapshot-path given to the constructor.
+
+           The file is replaced atomically. It is a pickle, so only load
+           snapshots from a trusted location."""
+        path = path or self._snapshot_path
+        if path is None:
+            raise ValueError("No snapshot-path given, to the call or the constructor.")
+        if self._warm is None and not self._collected.issuperset(ENDPOINTS):
+            raise PlugwiseException("Nothing to save before the first update.")
+        if self._warm is not None:
+            state = self._warm['state']
+            devices = self._warm['devices']
+            records = self._warm['records']
+        else:
+            with self._update_lock:
+                self._actuators()
+                self._locations_by_id()
+                state = {name: getattr(self, name) for name in SNAPSHOT_STATE}
+                devices = self._device_list()
+                records = self._device_records()
+        data = zlib.compress(pickle.dumps({
+            'version': SNAPSHOT_VERSION,
+            'endpoint': self._endpoint,
+            'saved': time.time(),
+            'state': state,
+            'devices': devices,
+            'records': records,
+        }, pickle.HIGHEST_PROTOCOL))
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _load_snapshot(self, path):
+        """Loads a snapshot saved by save_snapshot(), a missing, damaged or
+           foreign snapshot is ignored (the data is then collected as usual)."""
+        try:
+            with open(path, 'rb') as snapshot_file:
+                warm = pickle.loads(zlib.decompress(snapshot_file.read()))
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            return False
+        if (not isinstance(warm, dict) or warm.get('version') != SNAPSHOT_VERSION
+                or warm.get('endpoint') != self._endpoint):
+            return False
+        for name, value in warm['state'].items():
+            setattr(self, name, value)
+        self._warm = warm
+        return True
+
+    def is_stale(self):
+        """Whether the device-data is provided from a loaded snapshot, until
+           the first full_update_device() has finished."""
+        return self._warm is not None
+
+    def get_snapshot_age(self):
+        """Provides the seconds since the loaded snapshot was saved, None
+           when the device-data is not stale."""
+        if self._warm is None:
+            return None
+        return max(0.0, time.time() - self._warm['saved'])
+
     def get_devices(self):
         """Provides the devices-names and application- or location-ids."""
+        if self._warm is not None:
+            return [dict(device) for device in self._warm['devices']]
+        published = self._published
+        if published is not None:
+            return published.get_devices()
+        if self._double_buffered:
+            # Nothing published yet, the collected data may be incomplete
+            return []
+        return self._device_list()
+
+    def _device_list(self):
+        """Builds the devices-names and ids from the collected data."""
         appl_list = self.get_appliance_list()
         loc_list = self.get_location_list(appl_list)
                         
@@ -123,8 +861,33 @@ class Plugwise:
         data = [{k:v for k,v in zip(keys, n)} for n in thermostats]
         return data
                     
-    def get_device_data(self, dev_id, ctrl_id, plug_id):
-        """Provides the device-data, based on location_id, from APPLIANCES."""
+    def get_device_data(self, dev_id, ctrl_id, plug_id, lazy=False):
+        """Provides the device-data, based on location_id, from APPLIANCES.
+
+           With lazy=True a DeviceDataView is provided, its fields are only
+           computed when they are read. Read from a warm-start snapshot or
+           the published data the view is formatted from the records at the
+           first read."""
+        records = None
+        if self._warm is not None:
+            records = self._warm['records']
+            outdoor_temp = self.get_outdoor_temperature()
+        elif self._published is not None:
+            published = self._published
+            records = published.records
+            outdoor_temp = published.outdoor_temp
+        if records is not None:
+            if not lazy:
+                return self._records_device_data(
+                    records, outdoor_temp, dev_id, ctrl_id, plug_id)
+            if dev_id and records.get(dev_id) is None:
+                return None
+            return DeviceDataView(self, [(None, lambda: self._records_device_data(
+                records, outdoor_temp, dev_id, ctrl_id, plug_id))])
+        if self._double_buffered:
+            return None
+        if lazy:
+            return self._device_data_view(dev_id, ctrl_id, plug_id)
         outdoor_temp = self.get_outdoor_temperature()
  
         controller_data = {}
@@ -137,45 +900,256 @@ class Plugwise:
             device_data = plug_data
         if dev_id:
             device_data = self.get_appliance_from_loc_id(dev_id)
-            
-            preset = self.get_preset_from_id(dev_id)
-            presets = self.get_presets_from_id(dev_id)
-            schemas = self.get_schema_names_from_id(dev_id)
-            last_used = self.get_last_active_schema_name_from_id(dev_id)
-            a_sch = []
-            l_sch = None
-            s_sch = None
-            if schemas:
-                for a,b in schemas.items():
-                   a_sch.append(a)
-                   if b == True:
-                      s_sch = a
-            if last_used:
-                l_sch = last_used
-            if device_data is not None and device_data['type'] != 'plug':
-                device_data.update( {'active_preset': preset} )
-                device_data.update( {'presets':  presets} )
-                device_data.update( {'available_schedules': a_sch} )
-                device_data.update( {'selected_schedule': s_sch} )
-                device_data.update( {'last_used': l_sch} )
-                if controller_data is not None:
-                    device_data.update( {'boiler_state': controller_data['boiler_state']} )
-                    device_data.update( {'central_heating_state': controller_data['central_heating_state']} )
-                    device_data.update( {'cooling_state': controller_data['cooling_state']} )
-                    device_data.update( {'dhw_state': controller_data['dhw_state']} )
+            return self._update_thermostat_data(
+                device_data,
+                controller_data,
+                self.get_preset_from_id(dev_id),
+                self.get_presets_from_id(dev_id),
+                self.get_schema_names_from_id(dev_id),
+                self.get_last_active_schema_name_from_id(dev_id),
+            )
+
+        return self._update_controller_data(device_data, controller_data, outdoor_temp)
+
+    def _device_data_view(self, dev_id, ctrl_id, plug_id):
+        """Provides the lazy view of the device-data, with the same fields
+           as get_device_data() provides."""
+        if dev_id:
+            appliance = self.get_appliance_from_loc_id(dev_id)
+            if appliance is None:
+                return None
+            groups = [
+                (None, lambda: self.get_appliance_from_loc_id(dev_id) or {}),
+                (('active_preset',), lambda: {'active_preset': self.get_preset_from_id(dev_id)}),
+                (('presets',), lambda: {'presets': self.get_presets_from_id(dev_id)}),
+                (('available_schedules', 'selected_schedule'),
+                 lambda: self._schedule_fields(self.get_schema_names_from_id(dev_id))),
+                (('last_used',),
+                 lambda: {'last_used': self.get_last_active_schema_name_from_id(dev_id) or None}),
+                (CONTROLLER_STATES, lambda: self._controller_states(ctrl_id)),
+            ]
+            return DeviceDataView(self, groups, {0: appliance})
+
+        def controller_fields():
+            controller_data = {}
+            if ctrl_id:
+                controller_data = self.get_appliance_from_appl_id(ctrl_id) or {}
+            return self._update_controller_data(
+                {}, controller_data, self.get_outdoor_temperature())
+
+        groups = [
+            (None, lambda: (plug_id and self.get_appliance_from_appl_id(plug_id)) or {}),
+            (CONTROLLER_FIELDS, controller_fields),
+        ]
+        return DeviceDataView(self, groups)
+
+    @staticmethod
+    def _schedule_fields(schemas):
+        """Provides the available_schedules and the selected_schedule."""
+        available = []
+        selected = None
+        if schemas:
+            for name, active in schemas.items():
+                available.append(name)
+                if active == True:
+                    selected = name
+        return {'available_schedules': available, 'selected_schedule': selected}
+
+    def _controller_states(self, ctrl_id, records=None):
+        """Provides the boiler states of the Controlled Device, from the
+           records when given."""
+        controller_data = None
+        if ctrl_id and records is not None:
+            controller_data = records[ctrl_id].as_dict()
+        elif ctrl_id:
+            controller_data = self.get_appliance_from_appl_id(ctrl_id)
+        if not controller_data:
+            return {}
+        return {state: controller_data[state] for state in CONTROLLER_STATES}
+
+    def get_all_device_data(self, typed=False):
+        """Provides the device-data of all devices, keyed by device-id.
+
+           The appliances and locations are walked once, the result is
+           the same as get_device_data() provides for (loc_id, ctrl_id, None)
+           for a thermostat, (None, None, plug_id) for a plug and
+           (None, ctrl_id, None) for the Controlled Device.
+
+           With typed=True the compact records holding floats and bools are
+           provided, these can still be used as (read-only) dicts."""
+        if self._warm is not None:
+            records = dict(self._warm['records'])
+        elif self._published is not None:
+            return self._published.get_all_device_data(typed)
+        elif self._double_buffered:
+            return {}
         else:
-            if 'type' in controller_data:
-                if controller_data['type'] == 'heater_central':
-                    device_data['type'] = controller_data['type']
-                    device_data.update( {'boiler_temp': controller_data['boiler_temp']} )
-                    if 'water_pressure' in controller_data:
-                        device_data.update( {'water_pressure': controller_data['water_pressure']} )
-                    device_data.update( {'outdoor_temp': outdoor_temp} )
-                    device_data.update( {'boiler_state': controller_data['boiler_state']} )
-                    device_data.update( {'central_heating_state': controller_data['central_heating_state']} )
-                    device_data.update( {'cooling_state': controller_data['cooling_state']} )
-                    device_data.update( {'dhw_state': controller_data['dhw_state']} )
+            records = self._device_records()
+        if typed:
+            return records
+        all_data = {}
+        for dev_id, record in records.items():
+            if record is not None:
+                record = record.as_dict()
+            all_data[dev_id] = record
+        return all_data
+
+    def _records_device_data(self, records, outdoor_temp, dev_id, ctrl_id, plug_id):
+        """Provides the device-data from the records of the loaded snapshot
+           or of the published data, like get_device_data() does from the
+           XML-data."""
+        if dev_id:
+            record = records.get(dev_id)
+            if record is None:
+                return None
+            device_data = record.as_dict()
+            # The boiler states are those of the given Controlled Device
+            for state in CONTROLLER_STATES:
+                device_data.pop(state, None)
+            if ctrl_id and records.get(ctrl_id) is not None:
+                device_data.update(self._controller_states(ctrl_id, records))
+            return device_data
+        device_data = {}
+        controller_data = {}
+        if plug_id and records.get(plug_id) is not None:
+            device_data = records[plug_id].as_dict()
+        if ctrl_id and records.get(ctrl_id) is not None:
+            controller_data = records[ctrl_id].as_dict()
+        return self._update_controller_data(device_data, controller_data, outdoor_temp)
 
+    def _device_records(self):
+        """Builds the typed records of all devices, keyed by device-id."""
+        devices = self._device_list()
+        outdoor_temp = self._domain_measurements.get((None, 'point_log', 'outdoor_temperature'))
+        appliances = {}
+        for appliance in self._appliances:
+            if "Gateway" not in appliance.find('name').text:
+                appliances[appliance.attrib['id']] = self._appliance_record(
+                    appliance, outdoor_temp)
+        thermostatic_appliances = self._thermostatic_appliances()
+        location_presets = self._presets_by_location()
+
+        heater_central = None
+        for device in devices:
+            if device['type'] == 'heater_central':
+                heater_central = appliances.get(device['id'])
+                break
+
+        records = {}
+        for device in devices:
+            dev_id = device['id']
+            if device['type'] in ('heater_central', 'plug'):
+                records[dev_id] = appliances.get(dev_id)
+            else:
+                records[dev_id] = self._zone_record(
+                    thermostatic_appliances.get(dev_id, []),
+                    heater_central,
+                    location_presets.get(dev_id),
+                    self.get_presets_from_id(dev_id),
+                    self.get_schema_names_from_id(dev_id),
+                    self.get_last_active_schema_name_from_id(dev_id),
+                )
+        return records
+
+    @staticmethod
+    def _zone_record(appl_records, heater_central, preset, presets, schemas,
+                     last_used):
+        """Builds the typed record of a thermostat-location."""
+        rev_list = sorted(appl_records, key=lambda k: k.type, reverse=True)
+        if rev_list == []:
+            return None
+        trvs = ()
+        if rev_list[0].type == 'zone_thermostat':
+            trvs = tuple(item for item in rev_list
+                         if item.type == 'thermostatic_radiator_valve')
+        a_sch = []
+        s_sch = None
+        if schemas:
+            for name, active in schemas.items():
+                a_sch.append(name)
+                if active:
+                    s_sch = name
+        if not isinstance(heater_central, HeaterCentralRecord):
+            heater_central = None
+        return ZoneRecord(rev_list[0], tuple(trvs), preset, presets, tuple(a_sch),
+                          s_sch, last_used or None, heater_central)
+
+    def _appliance_record(self, appliance, outdoor_temp):
+        """Builds the typed record of a heater_central or a plug."""
+        measurements = self._appliance_measurements
+        appliance_id = appliance.attrib['id']
+        appliance_type = appliance.find('type').text
+        if appliance_type == 'heater_central':
+            states = []
+            for log_type in ('boiler_state', 'central_heating_state',
+                             'cooling_state', 'domestic_hot_water_state'):
+                state = self._direct_measurements.get((None, 'point_log', log_type))
+                if state is not None:
+                    state = (state == "on")
+                states.append(state)
+            return HeaterCentralRecord(
+                appliance_type,
+                measurements.get((appliance_id, 'point_log', 'boiler_temperature')),
+                measurements.get((appliance_id, 'point_log', 'central_heater_water_pressure')),
+                outdoor_temp,
+                *states
+            )
+
+        relay = measurements.get((appliance_id, 'point_log', 'relay'))
+        if relay is not None:
+            relay = (relay == "on")
+        return PlugRecord(
+            appliance_type,
+            appliance.find('name').text,
+            measurements.get((appliance_id, 'point_log', 'electricity_consumed')),
+            measurements.get((appliance_id, 'interval_log', 'electricity_consumed')),
+            measurements.get((appliance_id, 'point_log', 'electricity_produced')),
+            measurements.get((appliance_id, 'interval_log', 'electricity_produced')),
+            relay,
+        )
+
+    @staticmethod
+    def _update_thermostat_data(device_data, controller_data, preset, presets,
+                                schemas, last_used):
+        """Adds the presets, schedules and boiler states to the data of a
+           thermostat-location."""
+        a_sch = []
+        l_sch = None
+        s_sch = None
+        if schemas:
+            for a,b in schemas.items():
+               a_sch.append(a)
+               if b == True:
+                  s_sch = a
+        if last_used:
+            l_sch = last_used
+        if device_data is not None and device_data['type'] != 'plug':
+            device_data.update( {'active_preset': preset} )
+            device_data.update( {'presets':  presets} )
+            device_data.update( {'available_schedules': a_sch} )
+            device_data.update( {'selected_schedule': s_sch} )
+            device_data.update( {'last_used': l_sch} )
+            if controller_data:
+                device_data.update( {'boiler_state': controller_data['boiler_state']} )
+                device_data.update( {'central_heating_state': controller_data['central_heating_state']} )
+                device_data.update( {'cooling_state': controller_data['cooling_state']} )
+                device_data.update( {'dhw_state': controller_data['dhw_state']} )
+        return device_data
+
+    @staticmethod
+    def _update_controller_data(device_data, controller_data, outdoor_temp):
+        """Adds the heater_central data to the data of the Controlled Device."""
+        if 'type' in controller_data:
+            if controller_data['type'] == 'heater_central':
+                device_data['type'] = controller_data['type']
+                device_data.update( {'boiler_temp': controller_data['boiler_temp']} )
+                if 'water_pressure' in controller_data:
+                    device_data.update( {'water_pressure': controller_data['water_pressure']} )
+                device_data.update( {'outdoor_temp': outdoor_temp} )
+                device_data.update( {'boiler_state': controller_data['boiler_state']} )
+                device_data.update( {'central_heating_state': controller_data['central_heating_state']} )
+                device_data.update( {'cooling_state': controller_data['cooling_state']} )
+                device_data.update( {'dhw_state': controller_data['dhw_state']} )
         return device_data
 
     def get_appliance_list(self):
@@ -200,6 +1174,7 @@ class Plugwise:
     def get_location_list(self, list):
         """Obtains the existing locations and connected applicance_id's - from LOCATIONS."""
         location_list = []
+        appliances_by_id = {item['id']: item for item in list}
                 
         for location in self._locations:
             global last_dict
@@ -213,13 +1188,13 @@ class Plugwise:
                 location_dict = {}
                 if appliance is not None:
                     appliance_id = appliance.attrib['id']
-                    for item in list:
-                        if item['id'] == appliance_id:
-                            appliance_name = item['name'].lower().replace(" ", "_")
-                            if item['loc_type'] == 'thermostat':
-                                location_type = 'thermostat'
-                            if item['loc_type'] == 'plug':
-                                location_type = 'plug'              
+                    item = appliances_by_id.get(appliance_id)
+                    if item is not None:
+                        appliance_name = item['name'].lower().replace(" ", "_")
+                        if item['loc_type'] == 'thermostat':
+                            location_type = 'thermostat'
+                        if item['loc_type'] == 'plug':
+                            location_type = 'plug'
 
                 if location_name != "Home":
                     if location_type == 'plug':
@@ -245,49 +1220,53 @@ class Plugwise:
 
     def get_appliance_from_loc_id(self, dev_id):
         """Obtains the appliance-data connected to a location - from APPLIANCES."""
+        appl_list = self._thermostatic_appliances(dev_id).get(dev_id, [])
+        return self._merge_thermostatic_appliances(
+            [appl_record.as_dict() for appl_record in appl_list])
+
+    def _thermostatic_appliances(self, dev_id=None):
+        """Obtains the typed records of the thermostatic appliances per
+           location_id, optionally for one location only - from APPLIANCES."""
         appliances = self._appliances.findall('.//appliance')
-        appl_list = []
-        locator_string = ".//logs/point_log[type='{}']/period/measurement"
+        measurements = self._appliance_measurements
+        appl_lists = {}
         thermostatic_types = ['zone_thermostat',
                               'thermostatic_radiator_valve',
                               'thermostat']
         for appliance in appliances:
-            if appliance.find('type') is not None:
-                appliance_type = appliance.find('type').text
-            if appliance.find('description') is not None:
-                if 'smart plug' in str(appliance.find('description').text):
+            type_elem = appliance.find('type')
+            if type_elem is not None:
+                appliance_type = type_elem.text
+            description = appliance.find('description')
+            if description is not None:
+                if 'smart plug' in str(description.text):
                     appliance_type = 'plug'
                     appliance_name = appliance.find('name').text
                 if "gateway" not in appliance_type:
-                    if appliance.find('location') is not None:
-                        appl_location = appliance.find('location').attrib['id']
-                        if appl_location == dev_id:
-                            appl_dict = {}
+                    location = appliance.find('location')
+                    if location is not None:
+                        appl_location = location.attrib['id']
+                        if dev_id is None or appl_location == dev_id:
+                            appl_id = appliance.attrib['id']
 
                             if appliance_type in thermostatic_types:
-                                appl_dict['type'] = appliance_type
-                                locator = locator_string.format('battery')
-                                appl_dict['battery'] = None
-                                if appliance.find(locator) is not None:
-                                    battery = appliance.find(locator).text
-                                    value = float(battery)
-                                    battery = '{:.2f}'.format(round(value, 2))
-                                    appl_dict['battery'] = battery
-                                locator = locator_string.format('thermostat')
-                                appl_dict['setpoint_temp'] = None
-                                if appliance.find(locator) is not None:
-                                    thermostat = appliance.find(locator).text
-                                    thermostat = float(thermostat)
-                                    appl_dict['setpoint_temp'] = thermostat
-                                locator = locator_string.format('temperature')
-                                appl_dict['current_temp'] = None
-                                if appliance.find(locator) is not None:
-                                    temperature = appliance.find(locator).text
-                                    temperature = float(temperature)
-                                    appl_dict['current_temp'] = temperature
-                                appl_list.append(appl_dict.copy())
+                                appl_record = ThermostaticRecord(
+                                    appliance_type,
+                                    measurements.get((appl_id, 'point_log', 'battery')),
+                                    measurements.get((appl_id, 'point_log', 'thermostat')),
+                                    measurements.get((appl_id, 'point_log', 'temperature')),
+                                )
+                                appl_lists.setdefault(appl_location, []).append(appl_record)
 
+        return appl_lists
+
+    @staticmethod
+    def _merge_thermostatic_appliances(appl_list):
+        """Merges the TRV-data into the data of the zone_thermostat."""
         rev_list = sorted(appl_list, key=lambda k: k['type'], reverse=True)
+        if rev_list == []:
+            return None
+
         trv = 1
         if rev_list[0]['type'] == 'zone_thermostat':
             for item in rev_list:
@@ -296,219 +1275,234 @@ class Plugwise:
                     rev_list[0].update( {'trv_{}_current_temp'.format(trv): item['current_temp']} )
                     trv +=1
 
-        if rev_list != []:
-            return rev_list[0]
+        return rev_list[0]
 
     def get_appliance_from_appl_id(self, dev_id):
         """Obtains the appliance-data from appliances without a location -
            from APPLIANCES."""
-        appl_data = {}
-        loc_string = ".//logs/point_log[type='{}']/period/measurement"
         for appliance in self._appliances:
             appliance_name = appliance.find('name').text
             if "Gateway" not in appliance_name:
-                appliance_id = appliance.attrib['id']
-                if appliance_id == dev_id:
-                    appliance_type = appliance.find('type').text
-                    appl_data['type'] = appliance_type
-                    boiler_temperature = None
-                    loc = loc_string.format('boiler_temperature')
-                    if appliance.find(loc) is not None:
-                        measurement = appliance.find(loc).text
-                        value = float(measurement)
-                        boiler_temperature = '{:.1f}'.format(round(value, 1))
-                        if boiler_temperature:
-                            appl_data['boiler_temp'] = boiler_temperature
-                    water_pressure = None
-                    loc = loc_string.format('central_heater_water_pressure')
-                    if appliance.find(loc) is not None:
-                        measurement = appliance.find(loc).text
-                        value = float(measurement)
-                        water_pressure = '{:.1f}'.format(round(value, 1))
-                        if water_pressure:
-                            appl_data['water_pressure'] = water_pressure
-                    if appliance_type == 'heater_central':
-                        direct_objects = self._direct_objects
-                        appl_data['boiler_state'] = None
-                        loc = loc_string.format('boiler_state')
-                        if direct_objects.find(loc) is not None:
-                            boiler_state = (direct_objects.find(loc).text == "on")
-                            appl_data['boiler_state'] = boiler_state
-                        appl_data['central_heating_state'] = None
-                        loc = loc_string.format('central_heating_state')
-                        if direct_objects.find(loc) is not None:
-                            chs = (direct_objects.find(loc).text == "on")
-                            appl_data['central_heating_state'] = chs
-                        appl_data['cooling_state'] = None
-                        loc = loc_string.format('cooling_state')
-                        if direct_objects.find(loc) is not None:
-                            cooling_state = (direct_objects.find(loc).text == "on")
-                            appl_data['cooling_state'] = cooling_state
-                        appl_data['dhw_state'] = None
-                        loc = loc_string.format('domestic_hot_water_state')
-                        if direct_objects.find(loc) is not None:
-                            dhw_state = (direct_objects.find(loc).text == "on")
-                            appl_data['dhw_state'] = dhw_state
-                    else:
-                        appl_data['type'] = appliance_type
-                        appl_data['name'] = appliance_name
-                        locator = (".//logs/point_log[type='electricity_consumed']/period/measurement")
-                        appl_data['electricity_consumed'] = None
-                        if appliance.find(locator) is not None:
-                            electricity_consumed = appliance.find(locator).text
-                            electricity_consumed = '{:.1f}'.format(round(float(electricity_consumed), 1))
-                            appl_data['electricity_consumed'] = electricity_consumed
-                        locator = (".//logs/interval_log[type='electricity_consumed']/period/measurement")
-                        appl_data['electricity_consumed_interval'] = None
-                        if appliance.find(locator) is not None:
-                            electricity_consumed_interval = appliance.find(locator).text
-                            electricity_consumed_interval = '{:.1f}'.format(round(float(electricity_consumed_interval), 1))
-                            appl_data['electricity_consumed_interval'] = electricity_consumed_interval
-                        locator = (".//logs/point_log[type='electricity_produced']/period/measurement")
-                        appl_data['electricity_produced'] = None
-                        if appliance.find(locator) is not None:
-                            electricity_produced = appliance.find(locator).text
-                            electricity_produced = '{:.1f}'.format(round(float(electricity_produced), 1))
-                            appl_data['electricity_produced'] = electricity_produced
-                        locator = (".//logs/interval_log[type='electricity_produced']/period/measurement")
-                        appl_data['electricity_produced_interval'] = None
-                        if appliance.find(locator) is not None:
-                            electricity_produced_interval = appliance.find(locator).text
-                            electricity_produced_interval = '{:.1f}'.format(round(float(electricity_produced_interval), 1))
-                            appl_data['electricity_produced_interval'] = electricity_produced_interval
-                        locator = (".//logs/point_log[type='relay']/period/measurement")
-                        appl_data['relay'] = None
-                        if appliance.find(locator) is not None:
-                            state = appliance.find(locator).text
-                            appl_data['relay'] = state
-
-        if appl_data != {}:
-            return appl_data
+                if appliance.attrib['id'] == dev_id:
+                    return self._appliance_data(appliance)
+
+    def _appliance_data(self, appliance):
+        """Obtains the data of one appliance - from APPLIANCES."""
+        appl_data = {}
+        measurements = self._appliance_measurements
+        appliance_name = appliance.find('name').text
+        appliance_id = appliance.attrib['id']
+        appliance_type = appliance.find('type').text
+        appl_data['type'] = appliance_type
+        boiler_temperature = measurements.get(
+            (appliance_id, 'point_log', 'boiler_temperature'))
+        if boiler_temperature is not None:
+            boiler_temperature = '{:.1f}'.format(round(boiler_temperature, 1))
+            appl_data['boiler_temp'] = boiler_temperature
+        water_pressure = measurements.get(
+            (appliance_id, 'point_log', 'central_heater_water_pressure'))
+        if water_pressure is not None:
+            water_pressure = '{:.1f}'.format(round(water_pressure, 1))
+            appl_data['water_pressure'] = water_pressure
+        if appliance_type == 'heater_central':
+            direct_measurements = self._direct_measurements
+            states = {'boiler_state': 'boiler_state',
+                      'central_heating_state': 'central_heating_state',
+                      'cooling_state': 'cooling_state',
+                      'dhw_state': 'domestic_hot_water_state'}
+            for key, log_type in states.items():
+                state = direct_measurements.get((None, 'point_log', log_type))
+                appl_data[key] = None
+                if state is not None:
+                    appl_data[key] = (state == "on")
+        else:
+            appl_data['type'] = appliance_type
+            appl_data['name'] = appliance_name
+            for key, log_kind, log_type in [
+                ('electricity_consumed', 'point_log', 'electricity_consumed'),
+                ('electricity_consumed_interval', 'interval_log', 'electricity_consumed'),
+                ('electricity_produced', 'point_log', 'electricity_produced'),
+                ('electricity_produced_interval', 'interval_log', 'electricity_produced'),
+            ]:
+                value = measurements.get((appliance_id, log_kind, log_type))
+                appl_data[key] = None
+                if value is not None:
+                    appl_data[key] = '{:.1f}'.format(round(value, 1))
+            appl_data['relay'] = measurements.get(
+                (appliance_id, 'point_log', 'relay'))
+
+        return appl_data
 
     def get_preset_from_id(self,dev_id):
         """Obtains the active preset based on the location_id - from DOMAIN_OBJECTS."""
+        return self._presets_by_location().get(dev_id)
+
+    def _presets_by_location(self):
+        """Obtains the active presets, keyed by location_id - from DOMAIN_OBJECTS."""
+        presets = {}
         for location in self._domain_objects:
             location_id = location.attrib['id']
-            if location.find('preset') is not None:
-                preset = location.find('preset').text
-                if location_id ==dev_id:
-                    return preset
+            preset = location.find('preset')
+            if preset is not None:
+                presets.setdefault(location_id, preset.text)
+        return presets
     
     def get_presets_from_id(self, dev_id):
         """Gets the presets from the thermostat based on location_id."""
         rule_ids = {}
-        locator = 'zone_setpoint_and_state_based_on_preset'
+        locator = PRESET_TEMPLATE
         # _LOGGER.debug("Plugwise locator and id: %s -> %s",locator,dev_id)
         rule_ids = self.get_rule_id_and_zone_location_by_template_tag_with_id(locator, dev_id)
         if rule_ids is None:
-            rule_ids = self.get_rule_id_and_zone_location_by_name_with_id('Thermostat presets', dev_id)
+            rule_ids = self.get_rule_id_and_zone_location_by_name_with_id(PRESET_NAME, dev_id)
             if rule_ids is None:
                 return None
 
         presets = {}
         for key,val in rule_ids.items():
             if val == dev_id:
-                presets = self.get_preset_dictionary(key)
+                presets = self._rules['rules'][key]['presets']
+                if presets is not None:
+                    # The rule model is shared, provide a copy
+                    presets = {name: list(setpoints) for name, setpoints in presets.items()}
         return presets
 
     def get_schema_names_from_id(self, dev_id):
         """Obtains the available schemas or schedules based on the location_id."""
         rule_ids = {}
-        locator = 'zone_preset_based_on_time_and_presence_with_override'
+        locator = SCHEDULE_TEMPLATE
         rule_ids = self.get_rule_id_and_zone_location_by_template_tag_with_id(locator, dev_id)
         schemas = {}
-        l_schemas = {}
         if rule_ids:
             for key,val in rule_ids.items():
                 if val == dev_id:
-                    name = self._domain_objects.find("rule[@id='" + key + "']/name").text
-                    active = False
-                    if self._domain_objects.find("rule[@id='" + key + "']/active").text == 'true':
-                        active = True
-                    schemas[name] = active
+                    rule = self._rules['rules'][key]
+                    schemas[rule['name']] = rule['active']
         if schemas != {}:
             return schemas
             
     def get_last_active_schema_name_from_id(self, dev_id):
         """Determine the last active schema."""
-        epoch = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
-        date_format = "%Y-%m-%dT%H:%M:%S.%f%z"
         rule_ids = {}
-        locator = 'zone_preset_based_on_time_and_presence_with_override'
+        locator = SCHEDULE_TEMPLATE
         rule_ids = self.get_rule_id_and_zone_location_by_template_tag_with_id(locator, dev_id)
         schemas = {}
         if rule_ids:
             for key,val in rule_ids.items():
                 if val == dev_id:
-                    schema_name = self._domain_objects.find("rule[@id='" + key + "']/name").text
-                    schema_date = self._domain_objects.find("rule[@id='" + key + "']/modified_date").text
-                    schema_time = parse(schema_date)
-                    schemas[schema_name] = (schema_time - epoch).total_seconds()
+                    rule = self._rules['rules'][key]
+                    schemas[rule['name']] = rule['modified']
                 last_modified = sorted(schemas.items(), key=lambda kv: kv[1])[-1][0]
                 return last_modified
 
     def get_rule_id_and_zone_location_by_template_tag_with_id(self, rule_name, dev_id):
         """Obtains the rule_id based on the given template_tag and location_id."""
-        schema_ids = {}
-        rules = self._domain_objects.findall('.//rule')
-        for rule in rules:
-            try:
-                name = rule.find('template').attrib['tag']
-            except KeyError:
-                name = None
-            if (name == rule_name):
-                rule_id = rule.attrib['id']
-                for elem in rule.iter('location'):
-                    if elem.attrib is not None:
-                        location_id = elem.attrib['id']
-                        if location_id == dev_id:
-                            schema_ids[rule_id] = location_id
-        if schema_ids != {}:
-            return schema_ids
+        return self._rules['tags'].get((rule_name, dev_id))
 
     def get_rule_id_and_zone_location_by_name_with_id(self, rule_name, dev_id):
         """Obtains the rule_id and location_id based on the given name and location_id."""
-        schema_ids = {}
-        rules = self._domain_objects.findall('.//rule')
-        for rule in rules:
-            try:
-                name = rule.find('name').text
-            except AttributeError:
-                name = None
-            if (name == rule_name):
-                rule_id = rule.attrib['id']
-                for elem in rule.iter('location'):
-                    if elem.attrib is not None:
-                        location_id = elem.attrib['id']
-                        if location_id == dev_id:
-                            schema_ids[rule_id] = location_id
-        if schema_ids != {}:
-            return schema_ids
+        return self._rules['names'].get((rule_name, dev_id))
+
+    def get_rule_ids_from_location(self, dev_id):
+        """Obtains the rule_ids of all rules applying to the location_id."""
+        return self._rules['locations'].get(dev_id, [])
+
+    @classmethod
+    def _build_rule_model(cls, domain_objects):
+        """Builds the rule model in one walk - from DOMAIN_OBJECTS.
+
+           'rules' holds per rule_id the name, template tag and id, active
+           flag, modified_date in seconds since the epoch, the presets (for
+           preset-rules) and the location_ids. 'tags' and 'names' hold
+           {rule_id: location_id} keyed by (template_tag, location_id) and
+           (name, location_id), 'locations' the rule_ids per location_id."""
+        rules = {}
+        tags = {}
+        names = {}
+        locations = {}
+        for rule in domain_objects.iterfind('.//rule'):
+            rule_id = rule.attrib['id']
+            if rule_id in rules:
+                continue
+            template = rule.find('template')
+            tag = None
+            template_id = None
+            if template is not None:
+                tag = template.get('tag')
+                template_id = template.get('id')
+            name = rule.findtext('name')
+            presets = None
+            if tag == PRESET_TEMPLATE or name == PRESET_NAME:
+                presets = cls._preset_dictionary(rule)
+            rule_locations = []
+            for elem in rule.iter('location'):
+                location_id = elem.attrib['id']
+                rule_locations.append(location_id)
+                tags.setdefault((tag, location_id), {})[rule_id] = location_id
+                names.setdefault((name, location_id), {})[rule_id] = location_id
+                location_rules = locations.setdefault(location_id, [])
+                if rule_id not in location_rules:
+                    location_rules.append(rule_id)
+            rules[rule_id] = {
+                'name': name,
+                'tag': tag,
+                'template_id': template_id,
+                'active': rule.findtext('active') == 'true',
+                'modified': cls._seconds_since_epoch(rule.findtext('modified_date')),
+                'presets': presets,
+                'locations': rule_locations,
+            }
+        return {'rules': rules, 'tags': tags, 'names': names, 'locations': locations}
+
+    @staticmethod
+    def _seconds_since_epoch(date):
+        """Converts a modified_date to seconds since the epoch."""
+        if date is None:
+            return None
+        try:
+            date_time = datetime.datetime.fromisoformat(date)
+        except ValueError:
+            date_time = parse(date)
+        return (date_time - EPOCH).total_seconds()
 
     def get_outdoor_temperature(self):
         """Obtains the outdoor_temperature from the thermostat."""
-        locator = (".//logs/point_log[type='outdoor_temperature']/period/measurement")
-        if self._domain_objects.find(locator) is not None:
-            measurement = self._domain_objects.find(locator).text
-            value = float(measurement)
+        value = self._domain_measurements.get((None, 'point_log', 'outdoor_temperature'))
+        if value is not None:
             value = '{:.1f}'.format(round(value, 1))
             return value
 
     def get_illuminance(self):
         """Obtain the illuminance value from the thermostat."""
-        locator = (".//logs/point_log[type='illuminance']/period/measurement")
-        if self._domain_objects.find(locator) is not None:
-            measurement = self._domain_objects.find(locator).text
-            value = float(measurement)
+        value = self._domain_measurements.get((None, 'point_log', 'illuminance'))
+        if value is not None:
             value = '{:.1f}'.format(round(value, 1))
             return value
 
+    def get_energy_logs(self, start, end, appl_ids=None):
+        """Collects the logged energy (the interval_logs of the electricity
+           consumed and produced) of all appliances, or those in appl_ids,
+           between the start and end datetimes with one request.
+
+           Returns the EnergyLogs, see EnergyLogs.rollup() for the totals
+           per hour, day or month."""
+        logs = EnergyLogs(appl_ids)
+        parser = FeedParser(logs.add_appliance)
+        status = self._session.stream(APPLIANCES + energy_range(start, end), parser.feed)
+        if status != requests.codes.ok:
+            raise ConnectionError("Could not get the energy logs.")
+        parser.close()
+        return logs
+
     def get_preset_dictionary(self, rule_id):
         """Obtains the presets from a rule based on rule_id."""
+        return self._preset_dictionary(self._domain_objects.find("rule[@id='" + rule_id + "']"))
+
+    @staticmethod
+    def _preset_dictionary(rule):
+        """Obtains the presets from a rule."""
         preset_dictionary = {}
-        directives = self._domain_objects.find(
-            "rule[@id='" + rule_id + "']/directives"
-        )
+        directives = rule.find('directives')
         for directive in directives:
             preset = directive.find("then").attrib
             keys, values = zip(*preset.items())
@@ -521,14 +1515,25 @@ class Plugwise:
             
     def set_schedule_state(self, loc_id, name, state):
         """Sets the schedule, helper-function."""
+        request = self._schedule_state_request(loc_id, name, state)
+        if request is not None:
+            uri, data = request
+            xml = self._session.request(uri, 'put', data)
+
+            if xml.status_code != requests.codes.ok: # pylint: disable=no-member
+                raise CouldNotSetTemperatureException("Could not set the schema to {}.".format(state) + xml.text)
+            self._write_through(('schedule', loc_id, name, state))
+            return '{} {}'.format(xml.text, data)
+
+    def _schedule_state_request(self, loc_id, name, state):
+        """Determines the uri and data to set the schedule - from DOMAIN_OBJECTS."""
         schema_rule_ids = {}
         schema_rule_ids = self.get_rule_id_and_zone_location_by_name_with_id(str(name), loc_id)
+        if schema_rule_ids is None:
+            return None
         for schema_rule_id,location_id in schema_rule_ids.items():
             if location_id == loc_id:
-                templates = self._domain_objects.findall(".//*[@id='{}']/template".format(schema_rule_id))
-                template_id = None
-                for rule in templates:
-                    template_id = rule.attrib['id']
+                template_id = self._rules['rules'][schema_rule_id]['template_id']
 
                 uri = '{};id={}'.format(RULES, schema_rule_id)
 
@@ -536,82 +1541,66 @@ class Plugwise:
                 data = '<rules><rule id="{}"><name><![CDATA[{}]]></name>' \
                        '<template id="{}" /><active>{}</active></rule>' \
                        '</rules>'.format(schema_rule_id, name, template_id, state)
-
-                xml = requests.put(
-                      self._endpoint + uri,
-                      auth=(self._username, self._password),
-                      data=data,
-                      headers={'Content-Type': 'text/xml'},
-                      timeout=10
-                )
-
-                if xml.status_code != requests.codes.ok: # pylint: disable=no-member
-                    CouldNotSetTemperatureException("Could not set the schema to {}.".format(state) + xml.text)
-                return '{} {}'.format(xml.text, data)
+                return uri, data
 
     def set_preset(self, location_id, loc_type, preset):
         """Sets the preset, helper function."""
-        current_location = self._locations.find("location[@id='" + location_id + "']")
-        location_name = current_location.find('name').text
-        location_type = current_location.find('type').text
-
-        xml = requests.put(
-                self._endpoint
-                + LOCATIONS
-                + ";id="
-                + location_id,
-                auth=(self._username, self._password),
-                data="<locations>"
-                + '<location id="'
-                + location_id
-                + '">'
-                + "<name>"
-                + location_name
-                + "</name>"
-                + "<type>"
-                + location_type
-                + "</type>"
-                + "<preset>"
-                + preset
-                + "</preset>"
-                + "</location>"
-                + "</locations>",
-                headers={"Content-Type": "text/xml"},
-                timeout=10,
-            )
+        uri, data = self._preset_request(location_id, preset)
+        xml = self._session.request(uri, 'put', data)
         if xml.status_code != requests.codes.ok: # pylint: disable=no-member
             raise CouldNotSetPresetException("Could not set the given preset: " + xml.text)
+        self._write_through(('preset', location_id, preset))
         return xml.text
 
+    def _preset_request(self, location_id, preset):
+        """Determines the uri and data to set the preset - from LOCATIONS."""
+        location_name, location_type = self._locations_by_id()[location_id]
+
+        uri = LOCATIONS + ";id=" + location_id
+        data = (
+            "<locations>"
+            + '<location id="'
+            + location_id
+            + '">'
+            + "<name>"
+            + location_name
+            + "</name>"
+            + "<type>"
+            + location_type
+            + "</type>"
+            + "<preset>"
+            + preset
+            + "</preset>"
+            + "</location>"
+            + "</locations>"
+        )
+        return uri, data
+
     def set_temperature(self, loc_id, loc_type, temperature):
         """Sends a temperature-set request, helper function."""
-        uri = self.__get_temperature_uri(loc_id, loc_type)
-        temperature = str(temperature)
+        uri, data = self._temperature_request(loc_id, loc_type, temperature)
+        if uri is None:
+            raise CouldNotSetTemperatureException("Could not obtain the temperature_uri.")
 
-        if uri is not None:
-            xml = requests.put(
-                self._endpoint + uri,
-                auth=(self._username, self._password),
-                data="<thermostat_functionality><setpoint>" + temperature + "</setpoint></thermostat_functionality>",
-                headers={"Content-Type": "text/xml"},
-                timeout=10,
-            )
+        xml = self._session.request(uri, 'put', data)
+        if xml.status_code != requests.codes.ok: # pylint: disable=no-member
+            raise CouldNotSetTemperatureException("Could not set the temperature." + xml.text)
+        self._write_through(('temperature', loc_id, temperature))
+        return xml.text
 
-            if xml.status_code != requests.codes.ok: # pylint: disable=no-member
-                CouldNotSetTemperatureException("Could not set the temperature." + xml.text)
-            return xml.text
-        else:
-            CouldNotSetTemperatureException("Could not obtain the temperature_uri.")
+    def _temperature_request(self, loc_id, loc_type, temperature):
+        """Determines the uri and data to set the temperature."""
+        uri = self.__get_temperature_uri(loc_id, loc_type)
+        temperature = str(temperature)
+        data = "<thermostat_functionality><setpoint>" + temperature + "</setpoint></thermostat_functionality>"
+        return uri, data
 
     def __get_temperature_uri(self, loc_id, loc_type):
         """Determine the location-set_temperature uri - from DOMAIN_OBJECTS."""
-        locator = (
-            "location[@id='"
-            + loc_id
-            + "']/actuator_functionalities/thermostat_functionality"
-        )
-        thermostat_functionality_id = self._domain_objects.find(locator).attrib['id']
-        
+        thermostat_functionality_id = self._actuators()['thermostats'].get(loc_id)
+        if thermostat_functionality_id is None:
+            return None
+
         temperature_uri = (
             LOCATIONS
             + ";id="
@@ -624,8 +1613,22 @@ class Plugwise:
         
     def set_relay_state(self, appl_id, type, state):
         """Switch the Plug to off/on."""
-        locator = ("appliance[type='" + type + "']/actuator_functionalities/relay_functionality")
-        relay_functionality_id = self._domain_objects.find(locator).attrib['id']
+        uri, data = self._relay_request(appl_id, type, state)
+        if uri is None:
+            raise CouldNotSetRelayException("Could not obtain the relay_uri.")
+
+        xml = self._session.request(uri, 'put', data)
+        if xml.status_code != requests.codes.ok: # pylint: disable=no-member
+            raise CouldNotSetRelayException("Could not set the relay state." + xml.text)
+        self._write_through(('relay', appl_id, state))
+        return xml.text
+
+    def _relay_request(self, appl_id, type, state):
+        """Determines the uri and data to switch the Plug - from DOMAIN_OBJECTS,
+           the uri is None for an appliance without a relay."""
+        relay_functionality_id = self._actuators()['relays'].get(appl_id)
+        if relay_functionality_id is None:
+            return None, None
         uri = (
             APPLIANCES
             + ";id="
@@ -635,22 +1638,247 @@ class Plugwise:
         )
 
         state = str(state)
+        data = "<relay_functionality><state>" + state + "</state></relay_functionality>"
+        return uri, data
 
-        if uri is not None:
-            xml = requests.put(
-                self._endpoint + uri,
-                auth=(self._username, self._password),
-                data="<relay_functionality><state>" + state + "</state></relay_functionality>",
-                headers={"Content-Type": "text/xml"},
-                timeout=10,
-            )
+    def _actuators(self):
+        """Obtains the actuator functionality-ids of the locations and appliances
+           in one pass - from DOMAIN_OBJECTS, kept until the next update."""
+        if self._actuator_index is None:
+            thermostats = {}
+            relays = {}
+            for item in self._domain_objects:
+                if item.tag == 'location':
+                    functionality = item.find('actuator_functionalities/thermostat_functionality')
+                    if functionality is not None:
+                        thermostats[item.get('id')] = functionality.get('id')
+                elif item.tag == 'appliance':
+                    functionality = item.find('actuator_functionalities/relay_functionality')
+                    if functionality is not None:
+                        relays[item.get('id')] = functionality.get('id')
+            self._actuator_index = {
+                'thermostats': thermostats,
+                'relays': relays,
+            }
+        return self._actuator_index
 
-            if xml.status_code != requests.codes.ok: # pylint: disable=no-member
-                print("Could not set the relay state." + xml.text)
-            return xml.text
-        else:
-            CouldNotSetTemperatureException("Could not obtain the relay_uri.")
+    def _locations_by_id(self):
+        """Obtains the name and type per location-id - from LOCATIONS, kept
+           until the next update."""
+        if self._location_index is None:
+            self._location_index = {
+                location.get('id'): (location.findtext('name'), location.findtext('type'))
+                for location in self._locations
+            }
+        return self._location_index
 
+    def set_scene(self, commands, limit=None):
+        """Sends a batch of writes, at most limit (default: the pool size)
+           concurrently, see _scene_requests() for the commands.
+
+           Returns a result dict per command, in the order of the commands."""
+        results, groups = self._scene_requests(commands)
+        with ThreadPoolExecutor(limit or self._write_limit) as executor:
+            for group_results in executor.map(self._send_scene_group, groups):
+                for index, result in group_results:
+                    results[index].update(result)
+        self._write_through_scene(results)
+        return results
+
+    def _send_scene_group(self, group):
+        """Sends the requests for one target in order."""
+        group_results = []
+        for index, uri, data in group:
+            xml = self._session.request(uri, 'put', data)
+            group_results.append((index, self._scene_result(xml.status_code, xml.text)))
+        return group_results
+
+    @staticmethod
+    def _scene_result(status, text):
+        """Provides the result of a sent scene-command."""
+        if status != requests.codes.ok: # pylint: disable=no-member
+            return {'status': 'failed', 'response': text}
+        return {'status': 'ok', 'response': text}
+
+    def _scene_requests(self, commands):
+        """Determines the requests of a batch of commands, the commands are:
+
+               ('temperature', loc_id, temperature)
+               ('preset', loc_id, preset)
+               ('schedule', loc_id, schedule_name, state)
+               ('relay', appl_id, state)
+
+           Of the commands for the same target only the last is sent, a preset
+           supersedes an earlier temperature of the same location. The URIs are
+           resolved from the actuator-index. Returns the results (with status
+           'superseded' or 'invalid' for the commands that are not sent) and
+           the requests grouped per target, to be sent in order."""
+        results = [{'command': command, 'status': None, 'response': None}
+                   for command in commands]
+        latest = {}
+        for index, command in enumerate(commands):
+            kind, target = command[0], command[1]
+            key = (kind, target) + tuple(command[2:3]) if kind == 'schedule' else (kind, target)
+            if key in latest:
+                results[latest[key]]['status'] = 'superseded'
+            if kind == 'preset' and ('temperature', target) in latest:
+                results[latest.pop(('temperature', target))]['status'] = 'superseded'
+            latest[key] = index
+
+        groups = {}
+        for key, index in sorted(latest.items(), key=lambda item: item[1]):
+            request = self._scene_request(commands[index])
+            if request is None:
+                results[index]['status'] = 'invalid'
+                continue
+            uri, data = request
+            groups.setdefault(key[1], []).append((index, uri, data))
+        return results, list(groups.values())
+
+    def _write_through_scene(self, results):
+        """Patches the cached data with the successful scene-commands."""
+        with self._update_lock:
+            for result in results:
+                if result['status'] == 'ok':
+                    self._patch(result['command'])
+            self._publish()
+
+    def _scene_request(self, command):
+        """Determines the uri and data of one scene-command, None when the
+           target or the command is unknown."""
+        kind, target = command[0], command[1]
+        try:
+            if kind == 'temperature':
+                uri, data = self._temperature_request(target, None, command[2])
+            elif kind == 'preset':
+                uri, data = self._preset_request(target, command[2])
+            elif kind == 'schedule':
+                uri, data = self._schedule_state_request(target, command[2], command[3])
+            elif kind == 'relay':
+                relay_functionality_id = self._actuators()['relays'][target]
+                uri = '{};id={}/relay;id={}'.format(APPLIANCES, target, relay_functionality_id)
+                data = '<relay_functionality><state>{}</state></relay_functionality>'.format(command[2])
+            else:
+                return None
+        except (KeyError, IndexError, TypeError):
+            return None
+        if uri is None:
+            return None
+        return uri, data
+
+    def _write_through(self, command):
+        """Patches the cached data with a successful write (a scene-command),
+           the patched field is pending until confirmed by the gateway. With
+           double-buffering the patched device-data is published."""
+        with self._update_lock:
+            self._patch(command)
+            self._publish()
+
+    def _patch(self, command):
+        """Patches the cached data with one scene-command."""
+        if self._warm is not None:
+            # Nothing to patch before the first update after a warm start
+            return
+        self._generation += 1
+        kind, target = command[0], command[1]
+        if kind == 'temperature':
+            setpoint = float(command[2])
+            for appliance in self._appliances:
+                location = appliance.find('location')
+                key = (appliance.get('id'), 'point_log', 'thermostat')
+                if (location is not None and location.get('id') == target
+                        and key in self._appliance_measurements):
+                    self._appliance_measurements[key] = setpoint
+            self._pending[(kind, target)] = setpoint
+        elif kind == 'preset':
+            location = self._domain_objects.find("location[@id='" + target + "']")
+            if location is None:
+                return
+            preset = location.find('preset')
+            if preset is None:
+                preset = etree.SubElement(location, 'preset')
+            preset.text = command[2]
+            self._pending[(kind, target)] = command[2]
+        elif kind == 'schedule':
+            active = str(command[3]).lower() == 'true'
+            for rule_id in self._rules['names'].get((command[2], target), {}):
+                self._rules['rules'][rule_id]['active'] = active
+                # The rule model is rebuilt at the next (incremental) update
+                self._domain_versions.pop(('rule', rule_id), None)
+            self._pending[(kind, target, command[2])] = active
+        elif kind == 'relay':
+            state = str(command[2])
+            for measurements in (self._appliance_measurements, self._direct_measurements):
+                if (target, 'point_log', 'relay') in measurements:
+                    measurements[(target, 'point_log', 'relay')] = state
+            self._pending[(kind, target)] = state
+
+    def get_pending(self):
+        """Provides the written fields that are not yet confirmed by the
+           gateway, as {dev_id: {field: value}}. The schedules are given as
+           {'schedules': {name: active}}."""
+        fields = {'temperature': 'setpoint_temp', 'preset': 'active_preset', 'relay': 'relay'}
+        pending = {}
+        for key, value in self._pending.items():
+            dev_pending = pending.setdefault(key[1], {})
+            if key[0] == 'schedule':
+                dev_pending.setdefault('schedules', {})[key[2]] = value
+            else:
+                dev_pending[fields[key[0]]] = value
+        return pending
+
+    def verify_pending(self):
+        """Confirms the pending writes with one small request per written
+           object (instead of a full_update_device), returns the fields
+           that are still pending."""
+        for uri in self._verification_requests():
+            xml = self._session.request(uri)
+            if xml.status_code == requests.codes.ok: # pylint: disable=no-member
+                self._confirm_pending(uri, xml.text)
+        return self.get_pending()
+
+    def _verification_requests(self):
+        """Determines the uri of every written object that is pending."""
+        uris = []
+        for key in self._pending:
+            for uri in self._verification_uris(key):
+                if uri not in uris:
+                    uris.append(uri)
+        return uris
+
+    def _verification_uris(self, key):
+        """Determines the uri(s) of the object written by a pending write."""
+        if key[0] in ('temperature', 'preset'):
+            return ['{};id={}'.format(LOCATIONS, key[1])]
+        if key[0] == 'relay':
+            return ['{};id={}'.format(APPLIANCES, key[1])]
+        return ['{};id={}'.format(RULES, rule_id)
+                for rule_id in self._rules['names'].get((key[2], key[1]), {})]
+
+    def _confirm_pending(self, uri, xml):
+        """Removes the pending writes confirmed by the XML-data of one object."""
+        root = self._parse_xml(xml)
+        for key, value in list(self._pending.items()):
+            if uri not in self._verification_uris(key):
+                continue
+            if key[0] == 'temperature':
+                actual = root.findtext('.//thermostat_functionality/setpoint')
+                if actual is not None:
+                    actual = float(actual)
+            elif key[0] == 'preset':
+                actual = root.findtext('.//location/preset')
+            elif key[0] == 'relay':
+                actual = None
+                appliance = root.find('appliance')
+                if appliance is not None:
+                    for log_kind, log_type, log_value in self._index_item_measurements(appliance):
+                        if (log_kind, log_type) == ('point_log', 'relay'):
+                            actual = log_value
+                            break
+            else:
+                actual = root.findtext('.//rule/active') == 'true'
+            if actual == value:
+                del self._pending[key]
 
 class PlugwiseException(Exception):
     """Define Exceptions."""
@@ -679,4 +1907,10 @@ class CouldNotSetPresetException(PlugwiseException):
 class CouldNotSetTemperatureException(PlugwiseException):
     """Raise an exception for when the temperature could not be set."""
 
+    pass
+
+
+class CouldNotSetRelayException(PlugwiseException):
+    """Raise an exception for when the relay state could not be set."""
+
     pass
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Immutable published device-data.
+
+With double-buffering the collected XML-data is updated off to the side, the
+device-data of the update is then extracted into a new PublishedData object
+that replaces the previous one with a single assignment. A reader holding a
+PublishedData sees one consistent update, also while the next one is running.
+"""
+import time
+from types import MappingProxyType
+
+
+class PublishedData:
+    """Define the device-data of one update, it can not be changed."""
+
+    __slots__ = ('generation', 'created', 'devices', 'records', 'outdoor_temp')
+
+    def __init__(self, generation, devices, records, outdoor_temp, created=None):
+        """Constructor for this class, the records are the typed records of
+           all devices keyed by device-id."""
+        initialize = object.__setattr__
+        initialize(self, 'generation', generation)
+        initialize(self, 'created', time.time() if created is None else created)
+        initialize(self, 'devices',
+                   tuple(MappingProxyType(dict(device)) for device in devices))
+        initialize(self, 'records', MappingProxyType(dict(records)))
+        initialize(self, 'outdoor_temp', outdoor_temp)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The published data can not be changed.")
+
+    def __delattr__(self, name):
+        raise AttributeError("The published data can not be changed.")
+
+    def age(self):
+        """Provides the seconds since the data was published."""
+        return max(0.0, time.time() - self.created)
+
+    def get_devices(self):
+        """Provides the devices-names and application- or location-ids."""
+        return [dict(device) for device in self.devices]
+
+    def get_all_device_data(self, typed=False):
+        """Provides the device-data of all devices, keyed by device-id, the
+           typed records with typed=True."""
+        if typed:
+            return dict(self.records)
+        return {
+            dev_id: record.as_dict() if record is not None else None
+            for dev_id, record in self.records.items()
+        }
+
+    def __repr__(self):
+        return '{}(generation={}, devices={})'.format(
+            type(self).__name__, self.generation, len(self.devices))
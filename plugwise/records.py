@@ -0,0 +1,214 @@
+"""
+Compact typed device-data records.
+
+The records hold native floats and bools, the values are only formatted
+(like get_device_data() does) when a record is used as a dict. A record is
+a read-only Mapping, so it can be passed to callers expecting the dict.
+The fields of a record are set once, by its constructor.
+"""
+from collections.abc import Mapping
+
+
+def _format(value, digits=1):
+    """Formats a float like the device-data dicts do, None stays None."""
+    if value is None:
+        return None
+    return '{:.{}f}'.format(round(value, digits), digits)
+
+
+def _relay(value):
+    """Renders a relay state as the text found in the XML-data."""
+    if value is None:
+        return None
+    return 'on' if value else 'off'
+
+
+def _presets(presets):
+    """Provides a copy of the presets, the setpoints are lists."""
+    if presets is None:
+        return None
+    return {name: list(setpoints) for name, setpoints in presets.items()}
+
+
+def _copy(value):
+    """Provides a copy of a dict or list field, other values as they are."""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+class _Record(Mapping):
+    """Define the dict-view of a record, the formatted fields are built
+       once per record."""
+
+    __slots__ = ('_fields',)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("The fields of a record can not be changed.")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError("The fields of a record can not be changed.")
+
+    def as_dict(self):
+        """Provides the formatted device-data dict."""
+        raise NotImplementedError
+
+    def _formatted(self):
+        """Provides the formatted fields, built on first use."""
+        try:
+            return self._fields
+        except AttributeError:
+            object.__setattr__(self, '_fields', self.as_dict())
+            return self._fields
+
+    def __getitem__(self, key):
+        return _copy(self._formatted()[key])
+
+    def __iter__(self):
+        return iter(self._formatted())
+
+    def __len__(self):
+        return len(self._formatted())
+
+    def __repr__(self):
+        values = ', '.join(
+            '{}={!r}'.format(slot, getattr(self, slot)) for slot in self.__slots__
+        )
+        return '{}({})'.format(type(self).__name__, values)
+
+
+class ThermostaticRecord(_Record):
+    """Define the data of a zone_thermostat, thermostat or TRV."""
+
+    __slots__ = ('type', 'battery', 'setpoint_temp', 'current_temp')
+
+    def __init__(self, type, battery, setpoint_temp, current_temp):
+        self.type = type
+        self.battery = battery
+        self.setpoint_temp = setpoint_temp
+        self.current_temp = current_temp
+
+    def as_dict(self):
+        return {
+            'type': self.type,
+            'battery': _format(self.battery, 2),
+            'setpoint_temp': self.setpoint_temp,
+            'current_temp': self.current_temp,
+        }
+
+
+class HeaterCentralRecord(_Record):
+    """Define the data of the heater_central (the Controlled Device)."""
+
+    __slots__ = ('type', 'boiler_temp', 'water_pressure', 'outdoor_temp',
+                 'boiler_state', 'central_heating_state', 'cooling_state',
+                 'dhw_state')
+
+    def __init__(self, type, boiler_temp, water_pressure, outdoor_temp,
+                 boiler_state, central_heating_state, cooling_state, dhw_state):
+        self.type = type
+        self.boiler_temp = boiler_temp
+        self.water_pressure = water_pressure
+        self.outdoor_temp = outdoor_temp
+        self.boiler_state = boiler_state
+        self.central_heating_state = central_heating_state
+        self.cooling_state = cooling_state
+        self.dhw_state = dhw_state
+
+    def as_dict(self):
+        data = {'type': self.type, 'boiler_temp': _format(self.boiler_temp)}
+        if self.water_pressure is not None:
+            data['water_pressure'] = _format(self.water_pressure)
+        data['outdoor_temp'] = _format(self.outdoor_temp)
+        data['boiler_state'] = self.boiler_state
+        data['central_heating_state'] = self.central_heating_state
+        data['cooling_state'] = self.cooling_state
+        data['dhw_state'] = self.dhw_state
+        return data
+
+
+class ZoneRecord(_Record):
+    """Define the data of a thermostat-location, the TRVs are only merged
+       in when the main appliance is a zone_thermostat."""
+
+    __slots__ = ('appliance', 'trvs', 'active_preset', 'presets',
+                 'available_schedules', 'selected_schedule', 'last_used',
+                 'heater_central')
+
+    def __init__(self, appliance, trvs, active_preset, presets,
+                 available_schedules, selected_schedule, last_used,
+                 heater_central):
+        self.appliance = appliance
+        self.trvs = trvs
+        self.active_preset = active_preset
+        self.presets = presets
+        self.available_schedules = available_schedules
+        self.selected_schedule = selected_schedule
+        self.last_used = last_used
+        self.heater_central = heater_central
+
+    @property
+    def type(self):
+        """Provides the type of the main appliance."""
+        return self.appliance.type
+
+    @property
+    def current_temp(self):
+        """Provides the current temperature of the main appliance."""
+        return self.appliance.current_temp
+
+    @property
+    def setpoint_temp(self):
+        """Provides the setpoint of the main appliance."""
+        return self.appliance.setpoint_temp
+
+    def as_dict(self):
+        data = self.appliance.as_dict()
+        for count, trv in enumerate(self.trvs, 1):
+            data['trv_{}_battery'.format(count)] = _format(trv.battery, 2)
+            data['trv_{}_current_temp'.format(count)] = trv.current_temp
+        data['active_preset'] = self.active_preset
+        data['presets'] = _presets(self.presets)
+        data['available_schedules'] = list(self.available_schedules)
+        data['selected_schedule'] = self.selected_schedule
+        data['last_used'] = self.last_used
+        if self.heater_central is not None:
+            data['boiler_state'] = self.heater_central.boiler_state
+            data['central_heating_state'] = self.heater_central.central_heating_state
+            data['cooling_state'] = self.heater_central.cooling_state
+            data['dhw_state'] = self.heater_central.dhw_state
+        return data
+
+
+class PlugRecord(_Record):
+    """Define the data of a plug."""
+
+    __slots__ = ('type', 'name', 'electricity_consumed',
+                 'electricity_consumed_interval', 'electricity_produced',
+                 'electricity_produced_interval', 'relay')
+
+    def __init__(self, type, name, electricity_consumed,
+                 electricity_consumed_interval, electricity_produced,
+                 electricity_produced_interval, relay):
+        self.type = type
+        self.name = name
+        self.electricity_consumed = electricity_consumed
+        self.electricity_consumed_interval = electricity_consumed_interval
+        self.electricity_produced = electricity_produced
+        self.electricity_produced_interval = electricity_produced_interval
+        self.relay = relay
+
+    def as_dict(self):
+        return {
+            'type': self.type,
+            'name': self.name,
+            'electricity_consumed': _format(self.electricity_consumed),
+            'electricity_consumed_interval': _format(self.electricity_consumed_interval),
+            'electricity_produced': _format(self.electricity_produced),
+            'electricity_produced_interval': _format(self.electricity_produced_interval),
+            'relay': _relay(self.relay),
+        }
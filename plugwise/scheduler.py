@@ -0,0 +1,123 @@
+"""
+Adaptive polling of the gateway endpoints.
+
+Each endpoint is refreshed on its own interval. The interval shrinks when
+the XML-data of the endpoint changed since the previous refresh and grows
+when it did not, within the bounds given per endpoint. After a write to the
+gateway the endpoints holding the written state are refreshed at once.
+"""
+import asyncio
+import threading
+import time
+
+from .plugwise import APPLIANCES, DIRECT_OBJECTS, DOMAIN_OBJECTS, LOCATIONS
+
+# The (start, minimum, maximum) refresh-interval per endpoint, in seconds.
+# The appliances hold the temperatures, setpoints, power and relays, the
+# domain_objects the presets, schedules and outdoor temperature and the
+# direct_objects only the boiler states.
+DEFAULT_INTERVALS = {
+    APPLIANCES: (60, 15, 300),
+    DOMAIN_OBJECTS: (120, 30, 600),
+    DIRECT_OBJECTS: (120, 30, 600),
+    LOCATIONS: (3600, 300, 86400),
+}
+# The endpoints holding the state that is changed by a write: the setpoints
+# and relays (appliances), the presets and schedules (domain_objects)
+WRITE_ENDPOINTS = (APPLIANCES, DOMAIN_OBJECTS)
+SHRINK_FACTOR = 0.5
+GROW_FACTOR = 1.25
+
+
+class PollingScheduler:
+    """Define the adaptive polling of a Plugwise object."""
+
+    def __init__(self, api, intervals=None, clock=time.monotonic):
+        """Constructor for this class
+
+           The intervals are a dict of endpoint: (start, minimum, maximum)
+           seconds, overriding DEFAULT_INTERVALS."""
+        self._api = api
+        self._clock = clock
+        self._bounds = dict(DEFAULT_INTERVALS)
+        self._bounds.update(intervals or {})
+        self._intervals = {endpoint: bounds[0] for endpoint, bounds in self._bounds.items()}
+        # All endpoints are due at the first poll
+        self._due = dict.fromkeys(self._bounds, 0)
+        self._writes = self._api.get_write_count()
+        self._stop = threading.Event()
+
+    def intervals(self):
+        """Provides the current refresh-interval per endpoint."""
+        return dict(self._intervals)
+
+    def next_poll(self):
+        """Provides the seconds until the next endpoint is due."""
+        return max(0, min(self._due.values()) - self._clock())
+
+    def force_refresh(self, *endpoints):
+        """Refreshes the given (default: all) endpoints at the next poll,
+           with their minimum interval."""
+        for endpoint in endpoints or tuple(self._bounds):
+            self._due[endpoint] = 0
+            self._intervals[endpoint] = self._bounds[endpoint][1]
+
+    def _due_endpoints(self):
+        """Determines the endpoints to refresh, a write since the previous
+           poll forces a refresh of the WRITE_ENDPOINTS."""
+        writes = self._api.get_write_count()
+        if writes != self._writes:
+            self._writes = writes
+            self.force_refresh(*WRITE_ENDPOINTS)
+        now = self._clock()
+        return [endpoint for endpoint, due in self._due.items() if due <= now]
+
+    def _refreshed(self, changes):
+        """Adapts the interval of the refreshed endpoints and schedules
+           their next refresh, changes holds per endpoint whether its
+           XML-data changed."""
+        now = self._clock()
+        for endpoint, changed in changes.items():
+            _, minimum, maximum = self._bounds[endpoint]
+            interval = self._intervals[endpoint]
+            if changed:
+                interval = max(minimum, interval * SHRINK_FACTOR)
+            else:
+                interval = min(maximum, interval * GROW_FACTOR)
+            self._intervals[endpoint] = interval
+            self._due[endpoint] = now + interval
+
+    def poll(self):
+        """Refreshes the endpoints that are due, returns them."""
+        endpoints = self._due_endpoints()
+        self._refreshed(self._api.update_endpoints(endpoints))
+        return endpoints
+
+    def run(self):
+        """Polls until stop() is called."""
+        self._stop.clear()
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.next_poll())
+
+    def stop(self):
+        """Ends run()."""
+        self._stop.set()
+
+
+class AsyncPollingScheduler(PollingScheduler):
+    """Define the adaptive polling of an AsyncPlugwise object, the due
+       endpoints are collected concurrently."""
+
+    async def poll(self):
+        """Refreshes the endpoints that are due, returns them."""
+        endpoints = self._due_endpoints()
+        self._refreshed(await self._api.update_endpoints(endpoints))
+        return endpoints
+
+    async def run(self):
+        """Polls until stop() is called."""
+        self._stop.clear()
+        while not self._stop.is_set():
+            await self.poll()
+            await asyncio.sleep(self.next_poll())
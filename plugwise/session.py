@@ -0,0 +1,201 @@
+"""
+Pooled keep-alive HTTP sessions for the communication with a gateway.
+
+Each Plugwise or Legacy_Anna object owns one session, so the TCP connection
+is reused between the requests and the XML-data is transferred compressed.
+"""
+import zlib
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from .feed import CHUNK_SIZE, StreamDecompressor
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 10
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class _TransferStatistics:
+    """Define the counting of the transferred data."""
+
+    def _reset_statistics(self):
+        """Resets the transfer counters."""
+        self.requests = 0
+        self.bytes_on_wire = 0
+        self.bytes_decompressed = 0
+        self.writes = 0
+
+    def _count_transfer(self, on_wire, decompressed, method='get'):
+        """Adds one response to the transfer counters."""
+        self.requests += 1
+        if method != 'get':
+            self.writes += 1
+        self.bytes_on_wire += on_wire
+        self.bytes_decompressed += decompressed
+
+    def statistics(self):
+        """Provides the number of requests and the transferred bytes."""
+        return {
+            'requests': self.requests,
+            'bytes_on_wire': self.bytes_on_wire,
+            'bytes_decompressed': self.bytes_decompressed,
+            'writes': self.writes,
+        }
+
+
+class GatewaySession(_TransferStatistics):
+    """Define a pooled keep-alive session towards one gateway."""
+
+    def __init__(self, endpoint, username, password,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        """Constructor for this class"""
+        self._endpoint = endpoint
+        self._timeout = timeout
+        self._session = requests.Session()
+        self._session.auth = (username, password)
+        self._session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._reset_statistics()
+
+    def request(self, command, method='get', data=None):
+        """Sends a request to the gateway, returns the response."""
+        headers = None
+        if data is not None:
+            headers = {'Content-Type': 'text/xml'}
+        xml = self._session.request(
+            method,
+            self._endpoint + command,
+            data=data,
+            headers=headers,
+            timeout=self._timeout,
+        )
+        # The raw (urllib3) response counts the compressed bytes it has read
+        self._count_transfer(xml.raw.tell(), len(xml.content), method)
+        return xml
+
+    def stream(self, command, feed, chunk_size=CHUNK_SIZE):
+        """Sends a GET-request to the gateway and passes the (decompressed)
+           body chunk by chunk to feed(chunk) while it is downloaded, returns
+           the status. The body of a failed request is not fed."""
+        with self._session.get(
+                self._endpoint + command,
+                timeout=self._timeout,
+                stream=True,
+        ) as xml:
+            size = 0
+            if xml.status_code == requests.codes.ok:  # pylint: disable=no-member
+                for chunk in xml.iter_content(chunk_size):
+                    size += len(chunk)
+                    feed(chunk)
+            else:
+                size = len(xml.content)
+            self._count_transfer(xml.raw.tell(), size)
+            return xml.status_code
+
+    def close(self):
+        """Closes the pooled connections."""
+        self._session.close()
+
+
+def _basic_auth(username, password):
+    """Provides the value of the Authorization-header, aiohttp 3.13 and up
+       deprecate BasicAuth."""
+    encode_basic_auth = getattr(aiohttp, 'encode_basic_auth', None)
+    if encode_basic_auth is not None:
+        return encode_basic_auth(username, password)
+    return aiohttp.BasicAuth(username, password).encode()
+
+
+class AsyncGatewaySession(_TransferStatistics):
+    """Define a pooled keep-alive aiohttp-session towards one gateway."""
+
+    def __init__(self, endpoint, username, password, websession=None,
+                 pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        """Constructor for this class, an existing websession can be shared."""
+        self._endpoint = endpoint
+        self._auth_headers = {'Authorization': _basic_auth(username, password)}
+        self._websession = websession
+        self._own_websession = websession is None
+        self._pool_size = pool_size
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._reset_statistics()
+
+    def _get_websession(self):
+        """Provides the websession, creates one when none was provided."""
+        if self._websession is None:
+            self._websession = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+            )
+        return self._websession
+
+    async def request(self, command, method='get', data=None, decode=True):
+        """Sends a request to the gateway, returns the status and the text
+           (or the bytes with decode=False)."""
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        headers.update(self._auth_headers)
+        if data is not None:
+            headers['Content-Type'] = 'text/xml'
+        async with self._get_websession().request(
+                method,
+                self._endpoint + command,
+                data=data,
+                headers=headers,
+                timeout=self._timeout,
+                auto_decompress=False,
+        ) as resp:
+            body = await resp.read()
+            content = decompress(body, resp.headers.get('Content-Encoding'))
+            self._count_transfer(len(body), len(content), method)
+            if not decode:
+                return resp.status, content
+            return resp.status, content.decode(resp.charset or 'utf-8')
+
+    async def stream(self, command, feed, chunk_size=CHUNK_SIZE):
+        """Sends a GET-request to the gateway and passes the (decompressed)
+           body chunk by chunk to feed(chunk) while it is downloaded, returns
+           the status. The body of a failed request is not fed."""
+        async with self._get_websession().get(
+                self._endpoint + command,
+                headers=dict(self._auth_headers, **{'Accept-Encoding': ACCEPT_ENCODING}),
+                timeout=self._timeout,
+                auto_decompress=False,
+        ) as resp:
+            decompressor = StreamDecompressor(resp.headers.get('Content-Encoding'))
+            on_wire = 0
+            size = 0
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                on_wire += len(chunk)
+                if resp.status == 200:
+                    data = decompressor.decompress(chunk)
+                    size += len(data)
+                    feed(data)
+            if resp.status == 200:
+                data = decompressor.flush()
+                size += len(data)
+                if data:
+                    feed(data)
+            self._count_transfer(on_wire, size)
+            return resp.status
+
+    async def close(self):
+        """Closes the websession, when it was created by this object."""
+        if self._own_websession and self._websession is not None:
+            await self._websession.close()
+            self._websession = None
+
+
+def decompress(body, content_encoding):
+    """Decompresses a gzip- or deflate-encoded response body."""
+    if content_encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if content_encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send a raw deflate-stream without zlib-header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
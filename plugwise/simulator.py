@@ -0,0 +1,561 @@
+"""
+Simulated Smile/Adam (and legacy Anna) gateway for load- and latency-tests.
+
+The SimulatedGateway generates a synthetic installation of a configurable
+size and serves it like a gateway does: /ping, /core/appliances,
+/core/locations, /core/domain_objects, /core/direct_objects and /core/rules,
+gzip-compressed when requested, with @from and @to the appliances hold the
+hourly energy logs of that period, ;type= selects the appliances by type. The PUTs sent by the library are
+recorded and applied to the installation. The measurements change every
+update_interval seconds, optionally the responses are delayed and contain
+illegal &-characters, like the XML-data of some gateways.
+
+Run a simulated gateway with: python -m plugwise.simulator --zones 50
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import re
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+PRESETS = {'home': (20.0, None), 'away': (15.0, None), 'asleep': (17.0, 25.0),
+           'vacation': (12.0, None), 'no_frost': (10.0, None)}
+PRESET_TEMPLATE = 'zone_setpoint_and_state_based_on_preset'
+SCHEDULE_TEMPLATE = 'zone_preset_based_on_time_and_presence_with_override'
+ILLEGAL_VENDOR = 'Plugwise & Partners'
+
+
+class SimulatedGateway:
+    """Define a simulated gateway serving a synthetic installation."""
+
+    def __init__(self, zones=3, trvs=2, plugs=2, legacy=False, latency=0.0,
+                 jitter=0.0, illegal_ampersands=True, update_interval=60,
+                 seed=0, clock=time.time):
+        """Constructor for this class
+
+           With legacy=True the XML-data of a legacy Anna (one thermostat)
+           is served, the plugs are added as extra appliances. Every
+           response is delayed by latency plus up to jitter seconds."""
+        self.legacy = legacy
+        self.latency = latency
+        self.jitter = jitter
+        self.illegal_ampersands = illegal_ampersands
+        self.update_interval = update_interval
+        self.writes = []
+        self._random = random.Random(seed)
+        self._clock = clock
+        self._start = clock()
+        self._tick = 0
+        self._ids = 0
+        self._runner = None
+        self._loop = None
+        self._appliances = []
+        self._locations = []
+        self._rules = []
+        self._modules = []
+        if legacy:
+            self._build_legacy(plugs)
+        else:
+            self._build(zones, trvs, plugs)
+        self._by_id = {item['id']: item for item in self._appliances + self._locations + self._rules}
+
+    def _new_id(self, prefix):
+        """Provides a new unique 32-character id."""
+        self._ids += 1
+        return '{}{:0>28x}'.format(prefix[:4].ljust(4, '0'), self._ids)
+
+    def _item(self, tag, name, item_type, **kwargs):
+        """Provides a new appliance or location."""
+        item = {'tag': tag, 'id': self._new_id(tag), 'name': name,
+                'type': item_type, 'logs': [], 'functionality': None,
+                'location': None, 'members': [], 'preset': None,
+                'modified': self._date(self._start)}
+        item.update(kwargs)
+        return item
+
+    def _log(self, item, log_type, value, kind='point_log', unit='C', step=0.0,
+             low=None, high=None):
+        """Adds a measurement to an appliance or location, numeric values
+           make a random walk of at most step per update."""
+        item['logs'].append({'kind': kind, 'id': self._new_id(kind), 'type': log_type,
+                             'value': value, 'unit': unit, 'step': step,
+                             'low': low, 'high': high, 'date': self._date(self._start)})
+
+    def _build(self, zones, trvs, plugs):
+        """Generates the installation of an Adam or Smile."""
+        gateway = self._item('appliance', 'Gateway', 'gateway',
+                             description='Container for variables')
+        self._log(gateway, 'outdoor_temperature', 7.5, step=0.2, low=-20, high=35)
+        heater = self._item('appliance', 'OpenTherm', 'heater_central',
+                            description='boiler')
+        self._log(heater, 'boiler_temperature', 48.0, step=1.0, low=20, high=80)
+        self._log(heater, 'central_heater_water_pressure', 1.7, unit='bar',
+                  step=0.05, low=1.0, high=2.5)
+        for log_type in ('boiler_state', 'central_heating_state',
+                         'domestic_hot_water_state', 'cooling_state'):
+            self._log(heater, log_type, 'off', unit='')
+        self._appliances += [gateway, heater]
+        self._locations.append(self._item('location', 'Home', 'building'))
+
+        for zone in range(zones):
+            location = self._item('location', 'Zone {}'.format(zone), 'area',
+                                  preset='home', setpoint=20.0)
+            location['functionality'] = ('thermostat_functionality', self._new_id('lt'))
+            devices = [('Lisa {}'.format(zone), 'zone_thermostat', 'Zone thermostat')]
+            devices += [('Tom {}.{}'.format(zone, trv), 'thermostatic_radiator_valve',
+                         'Thermostatic radiator valve') for trv in range(trvs)]
+            for name, appliance_type, description in devices:
+                appliance = self._item('appliance', name, appliance_type,
+                                       description=description, location=location)
+                appliance['functionality'] = ('thermostat_functionality', self._new_id('tf'))
+                self._log(appliance, 'battery', self._random.uniform(0.2, 1.0),
+                          unit='', step=0.001, low=0.0, high=1.0)
+                self._log(appliance, 'thermostat', 20.0)
+                self._log(appliance, 'temperature', round(self._random.uniform(15, 22), 2),
+                          step=0.1, low=10, high=30)
+                location['members'].append(appliance)
+                self._appliances.append(appliance)
+            self._locations.append(location)
+
+            presets = self._item('rule', 'Thermostat presets', None, template=PRESET_TEMPLATE,
+                                 active=True, location=location)
+            self._rules.append(presets)
+            for schedule in range(2):
+                self._rules.append(self._item(
+                    'rule', 'Schedule {}.{}'.format(zone, schedule), None,
+                    template=SCHEDULE_TEMPLATE, active=schedule == 0, location=location,
+                ))
+
+        if plugs:
+            location = self._item('location', 'Plugs', 'area')
+            for plug in range(plugs):
+                appliance = self._item('appliance', 'Plug {}'.format(plug), 'zz_misc',
+                                       description='Smart plug', location=location)
+                appliance['functionality'] = ('relay_functionality', self._new_id('rf'))
+                for kind in ('point_log', 'interval_log'):
+                    self._log(appliance, 'electricity_consumed',
+                              self._random.uniform(0, 100), kind, 'W', step=5.0, low=0, high=3600)
+                    self._log(appliance, 'electricity_produced', 0.0, kind, 'W')
+                self._log(appliance, 'relay', 'on', unit='')
+                location['members'].append(appliance)
+                self._appliances.append(appliance)
+            self._locations.append(location)
+
+        self._modules.append({'id': self._new_id('module'), 'services': []})
+
+    def _build_legacy(self, plugs):
+        """Generates the installation of a legacy Anna."""
+        location = self._item('location', 'Living room', 'building', preset='home')
+        thermostat = self._item('appliance', 'Anna', 'thermostat',
+                                description='Anna thermostat', location=location)
+        self._log(thermostat, 'temperature', 20.5, step=0.1, low=10, high=30)
+        self._log(thermostat, 'target_temperature', 20.0)
+        self._log(thermostat, 'thermostat', 20.0)
+        self._log(thermostat, 'schedule_temperature', 20.0)
+        self._log(thermostat, 'illuminance', 150.0, unit='lx', step=20.0, low=0, high=1000)
+        self._log(thermostat, 'schedule_state', 'on', unit='')
+        heater = self._item('appliance', 'OpenTherm', 'heater_central',
+                            description='boiler', location=location)
+        self._log(heater, 'boiler_temperature', 48.0, step=1.0, low=20, high=80)
+        self._log(heater, 'central_heater_water_pressure', 1.7, unit='bar',
+                  step=0.05, low=1.0, high=2.5)
+        self._log(heater, 'outdoor_temperature', 7.5, step=0.2, low=-20, high=35)
+        for log_type in ('boiler_state', 'central_heating_state', 'cooling_state'):
+            self._log(heater, log_type, 'off', unit='')
+        self._appliances += [thermostat, heater]
+        for plug in range(plugs):
+            appliance = self._item('appliance', 'Plug {}'.format(plug), 'zz_misc',
+                                   description='Smart plug', location=location)
+            self._log(appliance, 'electricity_consumed', self._random.uniform(0, 100),
+                      unit='W', step=5.0, low=0, high=3600)
+            self._appliances.append(appliance)
+        self._locations.append(location)
+
+        presets = self._item('rule', 'Thermostat presets', None, active=True)
+        schedule = self._item('rule', 'Thermostat schedule', None, active=True)
+        self._rules += [presets, schedule]
+        # The legacy Anna refers to the measurements by the services of its module
+        self._modules.append({'id': self._new_id('module'), 'services': [
+            (log['type'], log['id']) for log in thermostat['logs'] + heater['logs']
+        ]})
+
+    @staticmethod
+    def _date(seconds):
+        """Provides the log- or modified-date for a time in seconds."""
+        date = datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+        return date.isoformat(timespec='milliseconds')
+
+    @staticmethod
+    def _seconds(date):
+        """Provides the time in seconds of a @from- or @to-date."""
+        date = datetime.datetime.fromisoformat(date.replace('Z', '+00:00'))
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        return date.timestamp()
+
+    def _update(self):
+        """Changes the measurements, once per passed update_interval."""
+        if not self.update_interval:
+            return
+        tick = int((self._clock() - self._start) // self.update_interval)
+        while self._tick < tick:
+            self._tick += 1
+            date = self._date(self._start + self._tick * self.update_interval)
+            for item in self._appliances:
+                changed = False
+                for log in item['logs']:
+                    if log['step']:
+                        value = log['value'] + self._random.uniform(-log['step'], log['step'])
+                        log['value'] = min(log['high'], max(log['low'], value))
+                        log['date'] = date
+                        changed = True
+                if changed:
+                    item['modified'] = date
+
+    def _set_log(self, item, log_type, value, date):
+        """Sets the value of the measurements of a type."""
+        for log in item['logs']:
+            if log['type'] == log_type:
+                log['value'] = value
+                log['date'] = date
+        item['modified'] = date
+
+    def apply(self, path, data):
+        """Applies a PUT of the library to the installation, returns
+           whether the object was found."""
+        self.writes.append((path, data))
+        date = self._date(self._clock())
+        ids = re.findall(r';id=(\w+)', path)
+        item = self._by_id.get(ids[0]) if ids else None
+        if path.startswith('/core/rules'):
+            rule_id = ids[0] if ids else self._find(r'<rule id="(\w+)"', data)
+            rule = self._by_id.get(rule_id)
+            if rule is None:
+                return False
+            active = self._find(r'<active>(\w+)</active>', data)
+            rule['active'] = active == 'true'
+            rule['modified'] = date
+            if self.legacy and rule['name'] != 'Thermostat schedule':
+                return True
+            # Only one schedule per location is active
+            if rule['active'] and rule.get('template') == SCHEDULE_TEMPLATE:
+                for other in self._rules:
+                    if (other is not rule and other.get('template') == SCHEDULE_TEMPLATE
+                            and other['location'] is rule['location']):
+                        other['active'] = False
+                        other['modified'] = date
+            return True
+        if item is None:
+            return False
+        setpoint = self._find(r'<setpoint>([\d.]+)</setpoint>', data)
+        if setpoint is not None:
+            for target in [item] + item['members']:
+                target['setpoint'] = float(setpoint)
+                self._set_log(target, 'thermostat', float(setpoint), date)
+                self._set_log(target, 'target_temperature', float(setpoint), date)
+        preset = self._find(r'<preset>(\w+)</preset>', data)
+        if preset is not None:
+            item['preset'] = preset
+            item['modified'] = date
+        state = self._find(r'<state>(\w+)</state>', data)
+        if state is not None:
+            # The relay functionality must be the one of the appliance
+            functionality = item.get('functionality')
+            if functionality is None or functionality[1] not in ids[1:]:
+                return False
+            self._set_log(item, 'relay', state, date)
+        return True
+
+    @staticmethod
+    def _find(pattern, data):
+        """Provides the first group matching in the data."""
+        match = re.search(pattern, data or '')
+        return match.group(1) if match else None
+
+    # Rendering of the XML-data
+
+    @staticmethod
+    def _value(value):
+        """Renders a measurement value."""
+        if isinstance(value, float):
+            return '{:.2f}'.format(value)
+        return str(value)
+
+    def _render_logs(self, item, period=None):
+        """Renders the logs of an appliance or location, with a period the
+           interval_logs hold a measurement for every hour in it."""
+        logs = []
+        for log in item['logs']:
+            if period is not None and log['kind'] == 'interval_log':
+                logs.append(self._render_interval_log(log, period))
+                continue
+            logs.append(
+                '<{kind} id="{id}"><type>{type}</type><unit>{unit}</unit>'
+                '<updated_date>{date}</updated_date>'
+                '<period start_date="{date}" end_date="{date}">'
+                '<measurement log_date="{date}">{value}</measurement>'
+                '</period></{kind}>'.format(
+                    kind=log['kind'], id=log['id'], type=log['type'], unit=log['unit'],
+                    date=log['date'], value=self._value(log['value']))
+            )
+        return '<logs>{}</logs>'.format(''.join(logs))
+
+    def _render_interval_log(self, log, period):
+        """Renders an interval_log with the (generated) hourly measurements
+           between the (start, end) seconds of the period."""
+        start, end = period
+        hours = range(int(-(-start // 3600)), int(-(-end // 3600)))
+        measurements = ''.join(
+            '<measurement log_date="{}">{}</measurement>'.format(
+                self._date(hour * 3600), self._value(self._logged_value(log, hour)))
+            for hour in hours
+        )
+        return (
+            '<interval_log id="{id}"><type>{type}</type><unit>{unit}</unit>'
+            '<interval>PT1H</interval><period start_date="{start}" end_date="{end}"'
+            ' interval="PT1H">{measurements}</period></interval_log>'.format(
+                id=log['id'], type=log['type'], unit=log['unit'], start=self._date(start),
+                end=self._date(end), measurements=measurements)
+        )
+
+    @staticmethod
+    def _logged_value(log, hour):
+        """Provides the (reproducible) logged value of an hour."""
+        if not isinstance(log['value'], float):
+            return log['value']
+        return abs(log['value']) * (0.5 + (hour * 2654435761 % 1000) / 1000)
+
+    @staticmethod
+    def _render_functionality(item):
+        """Renders the actuator functionality of an appliance or location."""
+        if item['functionality'] is None:
+            return ''
+        tag, functionality_id = item['functionality']
+        if tag == 'relay_functionality':
+            state = 'on'
+            for log in item['logs']:
+                if log['type'] == 'relay':
+                    state = log['value']
+            content = '<state>{}</state>'.format(state)
+        else:
+            content = '<setpoint>{}</setpoint>'.format(item.get('setpoint', 20.0))
+        return '<actuator_functionalities><{0} id="{1}">{2}</{0}></actuator_functionalities>'.format(
+            tag, functionality_id, content)
+
+    def _render_appliance(self, item, period=None):
+        """Renders an appliance."""
+        location = ''
+        if item['location'] is not None:
+            location = '<location id="{}"/>'.format(item['location']['id'])
+        return (
+            '<appliance id="{id}"><name>{name}</name><description>{description}'
+            '</description><type>{type}</type><modified_date>{modified}</modified_date>'
+            '{location}{logs}{functionality}</appliance>'.format_map(dict(
+                item, location=location, logs=self._render_logs(item, period),
+                functionality=self._render_functionality(item)))
+        )
+
+    def _render_location(self, item):
+        """Renders a location."""
+        preset = '<preset>{}</preset>'.format(item['preset']) if item['preset'] else ''
+        members = ''.join('<appliance id="{}"/>'.format(member['id'])
+                          for member in item['members'])
+        if self.legacy:
+            members = ''.join('<appliance id="{}"/>'.format(appliance['id'])
+                              for appliance in self._appliances)
+        return (
+            '<location id="{id}"><name>{name}</name><type>{type}</type>'
+            '<modified_date>{modified}</modified_date>{preset}'
+            '<appliances>{members}</appliances>{logs}{functionality}</location>'.format_map(dict(
+                item, preset=preset, members=members, logs=self._render_logs(item),
+                functionality=self._render_functionality(item)))
+        )
+
+    def _render_rule(self, item):
+        """Renders a rule with its template, directives and contexts."""
+        if self.legacy:
+            return self._render_legacy_rule(item)
+        if item['template'] == PRESET_TEMPLATE:
+            directives = []
+            for preset, (heating, cooling) in PRESETS.items():
+                if cooling is None:
+                    then = '<then setpoint="{}"/>'.format(heating)
+                else:
+                    then = '<then heating_setpoint="{}" cooling_setpoint="{}"/>'.format(
+                        heating, cooling)
+                directives.append('<when preset="{}">{}</when>'.format(preset, then))
+        else:
+            directives = ['<when time="[mo 07:00,mo 22:00)"><then preset="home"/></when>']
+        return (
+            '<rule id="{id}"><name>{name}</name><template id="{template_id}" tag="{template}"/>'
+            '<active>{active}</active><modified_date>{modified}</modified_date>'
+            '<directives>{directives}</directives><contexts><context><zone>'
+            '<location id="{location_id}"/></zone></context></contexts></rule>'.format_map(dict(
+                item, template_id=self._template_id(item), active=str(item['active']).lower(),
+                directives=''.join(directives), location_id=item['location']['id']))
+        )
+
+    def _render_legacy_rule(self, item):
+        """Renders a rule of a legacy Anna."""
+        if item['name'] == 'Thermostat presets':
+            directives = ''.join(
+                '<when><then icon="{}" temperature="{}"/></when>'.format(preset, heating)
+                for preset, (heating, _) in PRESETS.items()
+            )
+        else:
+            directives = '<when time="[mo 07:00,mo 22:00)"><then temperature="20.0"/></when>'
+        return (
+            '<rule id="{id}"><name>{name}</name><template id="{template_id}"/>'
+            '<active>{active}</active><modified_date>{modified}</modified_date>'
+            '<directives>{directives}</directives></rule>'.format_map(dict(
+                item, template_id=self._template_id(item), active=str(item['active']).lower(),
+                directives=directives))
+        )
+
+    @staticmethod
+    def _template_id(item):
+        """Provides the (stable) template-id of a rule."""
+        return 'temp' + item['id'][4:]
+
+    def _render_modules(self):
+        """Renders the modules, their vendor_name contains an illegal
+           &-character when illegal_ampersands is set."""
+        vendor = ILLEGAL_VENDOR if self.illegal_ampersands else escape(ILLEGAL_VENDOR)
+        modules = []
+        for module in self._modules:
+            services = ''.join(
+                '<{0} id="{1}" log_type="{0}"><functionalities><point_log id="{1}"/>'
+                '</functionalities></{0}>'.format(log_type, log_id)
+                for log_type, log_id in module['services']
+            )
+            modules.append('<module id="{}"><vendor_name>{}</vendor_name>'
+                           '<services>{}</services></module>'.format(module['id'], vendor, services))
+        return ''.join(modules)
+
+    def render(self, path, object_id=None, period=None, types=None):
+        """Renders the XML-data of an endpoint, or of one object of the
+           appliances, locations or rules. None for an unknown path.
+
+           With a (start, end) period in seconds the interval_logs of the
+           appliances hold the hourly measurements in it, like @from/@to.
+           With types only the appliances of these types are rendered."""
+        self._update()
+        if path == '/core/appliances':
+            return '<appliances>{}</appliances>'.format(''.join(
+                self._render_appliance(item, period)
+                for item in self._select(self._appliances, object_id)
+                if types is None or item['type'] in types))
+        if path == '/core/locations':
+            return '<locations>{}</locations>'.format(''.join(
+                self._render_location(item) for item in self._select(self._locations, object_id)))
+        if path == '/core/rules':
+            return '<rules>{}</rules>'.format(''.join(
+                self._render_rule(item) for item in self._select(self._rules, object_id)))
+        if path == '/core/direct_objects':
+            return '<direct_objects>{}{}</direct_objects>'.format(
+                ''.join(self._render_appliance(item) for item in self._appliances),
+                self._render_modules() if self.legacy else '')
+        if path == '/core/domain_objects':
+            return '<domain_objects>{}{}{}{}</domain_objects>'.format(
+                ''.join(self._render_location(item) for item in self._locations),
+                ''.join(self._render_appliance(item) for item in self._appliances),
+                ''.join(self._render_rule(item) for item in self._rules),
+                self._render_modules())
+        return None
+
+    @staticmethod
+    def _select(items, object_id):
+        """Provides all items, or the one with the object_id."""
+        if object_id is None:
+            return items
+        return [item for item in items if item['id'] == object_id]
+
+    # The HTTP-server
+
+    async def _handle(self, request):
+        """Handles a request like a gateway does."""
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if request.path == '/ping':
+            return web.Response(status=404)
+        path = request.path.split(';')[0]
+        if request.method == 'PUT':
+            found = self.apply(request.path, await request.text())
+            return web.Response(status=200 if found else 404, content_type='text/xml')
+        object_id = self._find(r'^/core/\w+;id=(\w+)', request.path)
+        period = None
+        start = self._find(r';@from=([^;]+)', request.path)
+        end = self._find(r';@to=([^;]+)', request.path)
+        if start is not None and end is not None:
+            period = (self._seconds(start), self._seconds(end))
+        types = re.findall(r';type=(\w+)', request.path) or None
+        xml = self.render(path, object_id, period, types)
+        if xml is None:
+            return web.Response(status=404)
+        response = web.Response(text=xml, content_type='text/xml')
+        response.enable_compression()
+        return response
+
+    def application(self):
+        """Provides the aiohttp application serving this gateway."""
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self._handle)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Starts serving, returns the port (a free port when 0)."""
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        return self._runner.addresses[0][1]
+
+    async def stop(self):
+        """Stops serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """Starts serving from an event loop in a daemon thread, for the
+           synchronous objects. Returns the port."""
+        self._loop = asyncio.new_event_loop()
+        port = self._loop.run_until_complete(self.start(host, port))
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return port
+
+    def stop_thread(self):
+        """Stops serving from the daemon thread."""
+        future = asyncio.run_coroutine_threadsafe(self.stop(), self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def main():
+    """Serves a simulated gateway until interrupted."""
+    parser = argparse.ArgumentParser(description='Simulated Plugwise gateway')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--zones', type=int, default=3)
+    parser.add_argument('--trvs', type=int, default=2)
+    parser.add_argument('--plugs', type=int, default=2)
+    parser.add_argument('--legacy', action='store_true')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--update-interval', type=float, default=60)
+    parser.add_argument('--no-illegal-ampersands', action='store_true')
+    args = parser.parse_args()
+    gateway = SimulatedGateway(
+        args.zones, args.trvs, args.plugs, args.legacy, args.latency, args.jitter,
+        not args.no_illegal_ampersands, args.update_interval,
+    )
+    web.run_app(gateway.application(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Lazy device-data views.
+
+A view is a read-only Mapping like the device-data dict, its fields are
+computed in groups on first access and kept until the collected data of the
+object changes. A consumer reading only current_temp does not pay for the
+presets, schedules or boiler states.
+"""
+from collections.abc import Mapping
+
+
+class DeviceDataView(Mapping):
+    """Define the lazy view of the device-data of one device.
+
+       The groups are (fields, compute) in the order of the device-data dict,
+       compute() provides the dict of (some of) the fields. A group with the
+       fields None provides fields that are not known in advance. A later
+       group overrides the fields of an earlier one, like dict.update()."""
+
+    __slots__ = ('_api', '_groups', '_values', '_merged', '_generation')
+
+    def __init__(self, api, groups, values=None):
+        """Constructor for this class, values holds the already computed
+           groups by index."""
+        self._api = api
+        self._groups = groups
+        self._values = dict(values or {})
+        self._merged = None
+        self._generation = api._generation
+
+    def _check_generation(self):
+        """Forgets the computed fields when the collected data has changed."""
+        if self._generation != self._api._generation:
+            self._values = {}
+            self._merged = None
+            self._generation = self._api._generation
+
+    def _group(self, index):
+        """Provides the fields of a group, computed on first use."""
+        if index not in self._values:
+            self._values[index] = self._groups[index][1]()
+        return self._values[index]
+
+    def __getitem__(self, key):
+        self._check_generation()
+        if self._merged is not None:
+            return self._merged[key]
+        # The last group providing the field wins
+        for index in reversed(range(len(self._groups))):
+            fields = self._groups[index][0]
+            if fields is not None and key not in fields:
+                continue
+            values = self._group(index)
+            if key in values:
+                return values[key]
+        raise KeyError(key)
+
+    def as_dict(self):
+        """Provides the device-data dict, computing all fields."""
+        self._check_generation()
+        if self._merged is None:
+            merged = {}
+            for index in range(len(self._groups)):
+                merged.update(self._group(index))
+            self._merged = merged
+        return dict(self._merged)
+
+    def __iter__(self):
+        return iter(self.as_dict())
+
+    def __len__(self):
+        return len(self.as_dict())
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.as_dict())
@@ -0,0 +1,49 @@
+"""
+Precompiled XPath expressions of the XML-data.
+
+The expressions of the Legacy_Anna object selecting by an id, a type or a
+name are compiled once, at import. The values are passed as XPath variables,
+so an id containing quotes does not change the expression, and the
+expression is not compiled again for every id:
+
+    first(RULE, domain_objects, id=rule_id)
+
+benchmarks/xpath.py compares these with the find() locators. On the large
+domain_objects of an Adam find() is faster for a plain lookup by id (it
+stops at the first match), so Plugwise keeps using find() for those.
+"""
+from lxml import etree
+
+REGISTRY = {}
+
+
+def _register(name, path):
+    """Compiles an expression and adds it to the registry."""
+    REGISTRY[name] = etree.XPath(path)
+    return REGISTRY[name]
+
+
+RULE = _register('rule', "rule[@id=$id]")
+APPLIANCE_MEASUREMENT = _register(
+    'appliance_measurement',
+    "appliance[type=$appliance_type]/logs/point_log[type=$log_type]/period/measurement",
+)
+SERVICE_POINT_LOG = _register(
+    'service_point_log',
+    "module/services/*[@log_type=$log_type]/functionalities/point_log",
+)
+POINT_LOG_MEASUREMENT = _register(
+    'point_log_measurement',
+    "*/logs/point_log[@id=$id]/period/measurement",
+)
+PRESET_RULE = _register('preset_rule', "rule[directives/when/then/@icon=$preset]")
+RULE_TEMPLATE = _register('rule_template', ".//*[@id=$id]/template")
+
+
+def first(query, root, **variables):
+    """Provides the first element matched by a precompiled expression, None
+       when nothing matches."""
+    result = query(root, **variables)
+    if result:
+        return result[0]
+    return None
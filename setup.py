@@ -15,6 +15,6 @@ setup(
     author_email='bouwe.s.westerdijk@gmail.com',
     license='MIT',
     packages=['plugwise'],
-    install_requires=['requests','datetime','pytz','python-dateutil'],
+    install_requires=['requests','aiohttp>=3.9','lxml','datetime','pytz','python-dateutil'],
     zip_safe=False
 )
@@ -0,0 +1,93 @@
+"""
+Change detection and the subscribers, against a simulated gateway.
+"""
+import pytest
+
+from plugwise import Plugwise
+from plugwise.simulator import SimulatedGateway
+
+START = 1e9
+
+
+@pytest.fixture
+def clock():
+    """Provides a clock that is moved by the tests."""
+    return [START]
+
+
+@pytest.fixture
+def port(clock):
+    """Serves a simulated Adam, the measurements change every minute."""
+    gateway = SimulatedGateway(zones=2, trvs=1, plugs=2, clock=lambda: clock[0])
+    port = gateway.start_in_thread()
+    yield port
+    gateway.stop_thread()
+
+
+def differences(old, new):
+    """Determines the changed fields of two get_all_device_data() results."""
+    changes = {}
+    for dev_id, data in new.items():
+        fields = {
+            field: (old[dev_id].get(field), value)
+            for field, value in data.items() if old[dev_id].get(field) != value
+        }
+        if fields:
+            changes[dev_id] = fields
+    return changes
+
+
+def test_first_update_reports_all_fields(port):
+    api = Plugwise('smile', 'x', '127.0.0.1', port, track_changes=True)
+    api.full_update_device()
+    data = api.get_all_device_data()
+    assert api.get_changes() == {
+        dev_id: {field: (None, value) for field, value in fields.items()}
+        for dev_id, fields in data.items()
+    }
+
+
+def test_only_changed_fields(port, clock):
+    api = Plugwise('smile', 'x', '127.0.0.1', port, track_changes=True)
+    api.full_update_device()
+    api.full_update_device()
+    assert api.get_changes() == {}
+
+    old = api.get_all_device_data()
+    clock[0] += 60
+    api.full_update_device()
+    changes = api.get_changes()
+    assert changes
+    assert changes == differences(old, api.get_all_device_data())
+
+
+def test_subscribers(port, clock):
+    api = Plugwise('smile', 'x', '127.0.0.1', port)
+    api.full_update_device()
+    zone = next(device['id'] for device in api.get_devices() if device['type'] == 'thermostat')
+    by_field, by_device = [], []
+    unsubscribe = api.subscribe(lambda *change: by_field.append(change), field='current_temp')
+    api.subscribe(lambda *change: by_device.append(change), dev_id=zone)
+
+    # Subscribing enables the change tracking, from the next update
+    api.full_update_device()
+    assert {change[1] for change in by_field} == {'current_temp'}
+    assert {change[0] for change in by_device} == {zone}
+    assert len(by_device) == len(api.get_all_device_data()[zone])
+
+    by_field.clear()
+    by_device.clear()
+    clock[0] += 60
+    api.full_update_device()
+    changes = api.get_changes()
+    assert by_field == [
+        (dev_id, 'current_temp') + fields['current_temp']
+        for dev_id, fields in changes.items() if 'current_temp' in fields
+    ]
+    assert by_device == [(zone, field) + change for field, change in changes[zone].items()]
+
+    unsubscribe()
+    by_field.clear()
+    clock[0] += 60
+    api.full_update_device()
+    assert by_field == []
@@ -0,0 +1,166 @@
+"""
+Equivalence of the device-data read paths, against a simulated gateway.
+
+Every way of collecting and reading the device-data (per device, all at
+once, typed, lazy, streaming, chunked, published, warm-started, async and
+partially refreshed) must provide the same device-data.
+"""
+import asyncio
+
+import pytest
+
+from plugwise import AsyncPlugwise, Plugwise, PollingScheduler
+from plugwise.simulator import SimulatedGateway
+from plugwise.views import DeviceDataView
+
+# A fixed clock, so every client sees the same measurements
+CLOCK = 1e9
+
+
+@pytest.fixture(scope='module')
+def port():
+    """Serves a simulated Adam with zones, radiator valves and plugs."""
+    gateway = SimulatedGateway(zones=4, trvs=2, plugs=3, clock=lambda: CLOCK)
+    port = gateway.start_in_thread()
+    yield port
+    gateway.stop_thread()
+
+
+def client(port, **kwargs):
+    """Provides an updated Plugwise object."""
+    api = Plugwise('smile', 'x', '127.0.0.1', port, **kwargs)
+    api.full_update_device()
+    return api
+
+
+def per_device(api, devices):
+    """Collects the device-data with get_device_data(), like
+       get_all_device_data() does per kind of device."""
+    ctrl_id = [device['id'] for device in devices if device['type'] == 'heater_central'][0]
+    data = {}
+    for device in devices:
+        if device['type'] == 'thermostat':
+            data[device['id']] = api.get_device_data(device['id'], ctrl_id, None)
+        elif device['type'] == 'plug':
+            data[device['id']] = api.get_device_data(None, None, device['id'])
+        else:
+            data[device['id']] = api.get_device_data(None, device['id'], None)
+    return data
+
+
+@pytest.fixture(scope='module')
+def expected(port):
+    """Provides the devices and the device-data read from the XML-data."""
+    api = client(port)
+    devices = api.get_devices()
+    return devices, per_device(api, devices)
+
+
+def test_all_device_data(port, expected):
+    devices, data = expected
+    assert client(port).get_all_device_data() == data
+    assert len(devices) == 4 + 3 + 1
+
+
+def test_typed_records(port, expected):
+    _, data = expected
+    records = client(port).get_all_device_data(typed=True)
+    assert {dev_id: dict(record) for dev_id, record in records.items()} == data
+
+
+def test_lazy_views(port, expected):
+    devices, data = expected
+    api = client(port)
+    ctrl_id = devices[0]['id']
+    for device in devices:
+        if device['type'] == 'thermostat':
+            view = api.get_device_data(device['id'], ctrl_id, None, lazy=True)
+            assert view['current_temp'] == data[device['id']]['current_temp']
+            assert list(dict(view).items()) == list(data[device['id']].items())
+
+
+def test_lazy_views_of_published_data(port, expected):
+    devices, data = expected
+    api = client(port, double_buffered=True)
+    ctrl_id = devices[0]['id']
+    for device in devices:
+        if device['type'] == 'thermostat':
+            view = api.get_device_data(device['id'], ctrl_id, None, lazy=True)
+            assert isinstance(view, DeviceDataView)
+            assert dict(view) == data[device['id']]
+    assert api.get_device_data('unknown', ctrl_id, None, lazy=True) is None
+
+
+@pytest.mark.parametrize('options', [
+    {'streaming': True},
+    {'chunked': True},
+    {'streaming': True, 'chunked': True},
+    {'double_buffered': True},
+])
+def test_collection_modes(port, expected, options):
+    devices, data = expected
+    api = client(port, **options)
+    assert api.get_devices() == devices
+    assert per_device(api, devices) == data
+    assert api.get_all_device_data() == data
+
+
+def test_published_data(port, expected):
+    devices, data = expected
+    published = client(port, double_buffered=True).get_published()
+    assert published.get_devices() == devices
+    assert published.get_all_device_data() == data
+    record = next(record for record in published.records.values() if record is not None)
+    with pytest.raises(AttributeError):
+        record.type = 'changed'
+
+
+def test_records_paths_match_live(port, expected, tmp_path):
+    devices, _ = expected
+    live = client(port)
+    path = str(tmp_path / 'snapshot')
+    live.save_snapshot(path)
+    published = client(port, double_buffered=True)
+    warm = Plugwise('smile', 'x', '127.0.0.1', port, snapshot=path)
+    assert warm.is_stale()
+    ctrl_id = devices[0]['id']
+    calls = [('unknown', ctrl_id, None), (None, ctrl_id, None)]
+    for device in devices:
+        if device['type'] == 'thermostat':
+            calls += [(device['id'], ctrl_id, None), (device['id'], None, None)]
+        elif device['type'] == 'plug':
+            calls += [(None, ctrl_id, device['id']), (None, None, device['id'])]
+    for call in calls:
+        assert published.get_device_data(*call) == live.get_device_data(*call)
+        assert warm.get_device_data(*call) == live.get_device_data(*call)
+
+
+def test_async_client(port, expected):
+    _, data = expected
+
+    async def collect():
+        api = AsyncPlugwise('smile', 'x', '127.0.0.1', port)
+        try:
+            await api.full_update_device()
+            return api.get_all_device_data()
+        finally:
+            await api.close()
+
+    assert asyncio.run(collect()) == data
+
+
+def test_partial_refresh(port, expected):
+    _, data = expected
+    api = client(port)
+    assert api.refresh(kinds=['plug']) == ['/core/appliances;type=zz_misc']
+    assert api.get_all_device_data() == data
+
+
+def test_scheduler_after_warm_start(port, expected, tmp_path):
+    _, data = expected
+    path = str(tmp_path / 'snapshot')
+    client(port).save_snapshot(path)
+    api = Plugwise('smile', 'x', '127.0.0.1', port, snapshot=path, history_size=4)
+    PollingScheduler(api).poll()
+    assert not api.is_stale()
+    assert api.get_all_device_data() == data
@@ -0,0 +1,82 @@
+"""
+The energy logs of a simulated gateway and their rollups.
+"""
+import datetime
+
+import pytest
+import pytz
+
+from plugwise import Plugwise
+from plugwise.simulator import SimulatedGateway
+
+# A fixed clock, so every client sees the same measurements
+CLOCK = 1e9
+# Over the start of the summer time in Europe/Amsterdam, a day of 23 hours
+START = datetime.datetime(2024, 3, 29, 12)
+END = datetime.datetime(2024, 4, 2)
+
+
+@pytest.fixture(scope='module')
+def api():
+    """Provides an updated Plugwise object of a simulated Adam with two plugs."""
+    gateway = SimulatedGateway(zones=1, trvs=0, plugs=2, clock=lambda: CLOCK)
+    port = gateway.start_in_thread()
+    api = Plugwise('smile', 'x', '127.0.0.1', port)
+    api.full_update_device()
+    yield api
+    gateway.stop_thread()
+
+
+@pytest.fixture(scope='module')
+def logs(api):
+    """Provides the energy logs of all appliances."""
+    return api.get_energy_logs(START, END)
+
+
+def totals(times, values, period, tz):
+    """Sums the values per local hour, day or month, one sample at a time."""
+    formats = {'hour': '%Y-%m-%d %H %Z', 'day': '%Y-%m-%d', 'month': '%Y-%m'}
+    result = {}
+    for timestamp, value in zip(times, values):
+        key = datetime.datetime.fromtimestamp(timestamp, tz).strftime(formats[period])
+        result[key] = result.get(key, 0) + value
+    return list(result.values())
+
+
+def test_appliances(api, logs):
+    plugs = [device['id'] for device in api.get_devices() if device['type'] == 'plug']
+    assert sorted(logs.appliances()) == sorted(plugs)
+    times, values = logs.get_samples(plugs[0], 'electricity_consumed')
+    assert len(times) == len(values) == (END - START).days * 24 + 12
+    assert list(times) == sorted(times)
+    only = api.get_energy_logs(START, END, appl_ids=[plugs[0]])
+    assert list(only.appliances()) == [plugs[0]]
+    assert only.get_samples(plugs[0], 'electricity_consumed') == (times, values)
+
+
+@pytest.mark.parametrize('period', ['hour', 'day', 'month'])
+@pytest.mark.parametrize('tz', ['UTC', 'Europe/Amsterdam'])
+def test_rollups(logs, period, tz):
+    for appl_id, log_types in logs.appliances().items():
+        for log_type in log_types:
+            times, values = logs.get_samples(appl_id, log_type)
+            rollup = logs.rollup(appl_id, log_type, period, tz)
+            assert [total for _, total in rollup] == pytest.approx(
+                totals(times, values, period, pytz.timezone(tz)))
+            assert rollup == logs.rollups(period, tz)[appl_id][log_type]
+
+
+def test_local_days(logs):
+    appl_id = sorted(logs.appliances())[0]
+    starts = [start for start, _ in logs.rollup(appl_id, 'electricity_consumed', 'day',
+                                                'Europe/Amsterdam')]
+    tz = pytz.timezone('Europe/Amsterdam')
+    assert [datetime.datetime.fromtimestamp(start, tz).hour for start in starts] == [0] * 5
+    assert [end - start for start, end in zip(starts, starts[1:])] == [
+        24 * 3600, 24 * 3600, 23 * 3600, 24 * 3600]
+
+
+def test_unknown_period(logs):
+    appl_id = sorted(logs.appliances())[0]
+    with pytest.raises(ValueError):
+        logs.rollup(appl_id, 'electricity_consumed', 'week')
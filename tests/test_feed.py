@@ -0,0 +1,57 @@
+"""
+Parsing the XML-data chunk by chunk, with illegal &-characters split over
+the chunks.
+"""
+import random
+
+import pytest
+from lxml import etree
+
+from plugwise.feed import AmpersandEscaper, FeedParser
+from plugwise.plugwise import Plugwise
+from plugwise.simulator import SimulatedGateway
+
+
+def escape_in_chunks(data, sizes):
+    """Escapes the data fed in chunks of the given sizes."""
+    escaper = AmpersandEscaper()
+    escaped = b''
+    start = 0
+    for size in sizes:
+        escaped += escaper.escape(data[start:start + size])
+        start += size
+    escaped += escaper.escape(data[start:])
+    return escaped + escaper.flush()
+
+
+@pytest.mark.parametrize('data, sizes', [
+    (b'a & b', [3]),                # the & ends the first chunk
+    (b'a &amp; b', [3]),            # a legal & ends the first chunk
+    (b'a &&& b', [3, 1]),           # more &-characters over the chunks
+    (b'a &#38; b', [3]),
+    (b'a &', [3]),                  # the & ends the data
+    (b'&', [0, 1]),
+])
+def test_escaper_chunk_boundaries(data, sizes):
+    assert escape_in_chunks(data, sizes) == Plugwise.escape_illegal_xml_bytes(data)
+
+
+def test_escaper_random_chunks():
+    generator = random.Random(3)
+    for _ in range(2000):
+        data = bytes(generator.choice(b'&a#; x') for _ in range(generator.randint(0, 30)))
+        sizes = [generator.randint(1, 4) for _ in range(len(data))]
+        assert escape_in_chunks(data, sizes) == Plugwise.escape_illegal_xml_bytes(data)
+
+
+@pytest.mark.parametrize('size', [1, 7, 4096])
+def test_feed_parser(size):
+    gateway = SimulatedGateway(zones=2, trvs=1, plugs=2, clock=lambda: 1e9)
+    data = gateway.render('/core/domain_objects').encode()
+    assert b'& ' in data
+    parser = FeedParser()
+    for start in range(0, len(data), size):
+        parser.feed(data[start:start + size])
+    root = parser.close()
+    expected = etree.XML(Plugwise.escape_illegal_xml_bytes(data))
+    assert etree.tostring(root) == etree.tostring(expected)
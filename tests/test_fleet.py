@@ -0,0 +1,87 @@
+"""
+Polling a fleet of gateways: the backoff of a failing gateway and the metrics.
+"""
+import asyncio
+import socket
+
+import pytest
+
+from plugwise import AsyncPlugwise, Fleet, Plugwise
+from plugwise.simulator import SimulatedGateway
+
+# A fixed clock, so every client sees the same measurements
+CLOCK = 1e9
+
+
+@pytest.fixture(scope='module')
+def port():
+    """Serves a simulated Adam."""
+    gateway = SimulatedGateway(zones=2, trvs=1, plugs=2, clock=lambda: CLOCK)
+    port = gateway.start_in_thread()
+    yield port
+    gateway.stop_thread()
+
+
+@pytest.fixture
+def closed_port():
+    """Provides a port nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_backoff_and_metrics(port, closed_port):
+    now = [0.0]
+    expected = Plugwise('smile', 'x', '127.0.0.1', port)
+    expected.full_update_device()
+
+    async def poll():
+        fleet = Fleet(interval=60, max_backoff=200, clock=lambda: now[0])
+        fleet.add('up', AsyncPlugwise('smile', 'x', '127.0.0.1', port), interval=1000)
+        fleet.add('down', AsyncPlugwise('smile', 'x', '127.0.0.1', closed_port))
+        try:
+            assert sorted(await fleet.poll()) == ['down', 'up']
+            results = fleet.results()
+            assert results['up']['devices'] == expected.get_all_device_data()
+            assert results['up']['error'] is None
+            assert results['down']['devices'] is None
+            assert results['down']['error'] is not None
+            assert results['down']['failures'] == 1
+            # Retried after twice the interval
+            assert fleet.next_poll() == 120
+
+            now[0] = 119
+            assert await fleet.poll() == []
+            now[0] = 120
+            assert await fleet.poll() == ['down']
+            assert fleet.results()['down']['failures'] == 2
+            # Four times the interval, limited to the max_backoff
+            assert fleet.next_poll() == 200
+            return fleet.metrics()
+        finally:
+            await fleet.close()
+
+    metrics = asyncio.run(poll())
+    assert metrics['gateways'] == 2
+    assert metrics['refreshes'] == 1
+    assert metrics['failures'] == 2
+
+
+def test_throughput(port):
+
+    async def poll():
+        fleet = Fleet(concurrency=2)
+        for gateway in range(4):
+            fleet.add(gateway, AsyncPlugwise('smile', 'x', '127.0.0.1', port))
+        try:
+            assert sorted(await fleet.poll()) == [0, 1, 2, 3]
+            assert await fleet.poll() == []
+            return fleet.metrics()
+        finally:
+            await fleet.close()
+
+    metrics = asyncio.run(poll())
+    assert metrics['refreshes'] == 4
+    assert metrics['failures'] == 0
+    assert 0 < metrics['latency_p50'] <= metrics['latency_p99']
+    assert metrics['gateways_per_second'] > 0
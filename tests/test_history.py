@@ -0,0 +1,81 @@
+"""
+The measurement history: ring buffers, statistics and the samples of the
+updates of a simulated gateway.
+"""
+import pytest
+
+from plugwise import MeasurementHistory, Plugwise
+from plugwise.history import NO_STATISTICS, RingBuffer
+from plugwise.simulator import SimulatedGateway
+
+START = 1e9
+
+
+def test_ring_buffer_overwrites_the_oldest():
+    buffer = RingBuffer(3)
+    for sample in range(5):
+        buffer.append(sample, sample * 10)
+    assert len(buffer) == buffer.capacity == 3
+    times, values = buffer.samples()
+    assert list(times) == [2, 3, 4]
+    assert list(values) == [20, 30, 40]
+    assert list(buffer.samples(since=3)[1]) == [30, 40]
+    assert list(buffer.samples(last=1)[1]) == [40]
+    assert list(buffer.samples(since=2, last=2)[1]) == [30, 40]
+
+
+def test_statistics():
+    now = [100.0]
+    history = MeasurementHistory(capacity=4, clock=lambda: now[0])
+    for timestamp, value in [(10, 1.0), (20, None), (40, 4.0), (70, 2.0), (100, 8.0)]:
+        history.record('dev', 'current_temp', value, timestamp)
+    assert history.get_samples('dev', 'current_temp') == [
+        (10, 1.0), (40, 4.0), (70, 2.0), (100, 8.0)]
+    assert history.get_statistics('dev', 'current_temp') == {
+        'count': 4, 'min': 1.0, 'max': 8.0, 'mean': 3.75, 'last': 8.0, 'rate': 7.0 / 90}
+    assert history.get_statistics('dev', 'current_temp', window=60) == {
+        'count': 3, 'min': 2.0, 'max': 8.0, 'mean': 14.0 / 3, 'last': 8.0, 'rate': 4.0 / 60}
+    assert history.get_statistics('dev', 'current_temp', last=1)['rate'] is None
+    assert history.get_statistics('dev', 'unknown') == NO_STATISTICS
+    assert history.memory() == 4 * 2 * 8
+
+
+@pytest.fixture
+def gateway_clock():
+    """Provides the clock of the gateway, moved by the tests."""
+    return [START]
+
+
+@pytest.fixture
+def port(gateway_clock):
+    """Serves a simulated Adam, the measurements change every minute."""
+    gateway = SimulatedGateway(zones=2, trvs=1, plugs=2, clock=lambda: gateway_clock[0])
+    port = gateway.start_in_thread()
+    yield port
+    gateway.stop_thread()
+
+
+def test_samples_of_the_updates(port, gateway_clock):
+    api = Plugwise('smile', 'x', '127.0.0.1', port, history_size=3)
+    zone = None
+    temperatures = []
+    for _ in range(4):
+        api.full_update_device()
+        zone = zone or next(
+            device['id'] for device in api.get_devices() if device['type'] == 'thermostat')
+        temperatures.append(api.get_device_data(zone, None, None)['current_temp'])
+        gateway_clock[0] += 60
+    assert [value for _, value in api.get_history(zone, 'current_temp')] == temperatures[1:]
+    statistics = api.get_history_statistics(zone, 'current_temp')
+    assert statistics['count'] == 3
+    assert statistics['min'] == min(temperatures[1:])
+    assert statistics['last'] == temperatures[-1]
+
+
+def test_without_history(port):
+    api = Plugwise('smile', 'x', '127.0.0.1', port)
+    api.full_update_device()
+    assert api.get_history('unknown', 'current_temp') == []
+    assert api.get_history_statistics('unknown', 'current_temp') == NO_STATISTICS
+    with pytest.raises(ValueError):
+        Plugwise('smile', 'x', '127.0.0.1', port, history_size=-1)
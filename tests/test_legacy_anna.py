@@ -0,0 +1,99 @@
+"""
+The Legacy_Anna object against a simulated legacy Anna, and the precompiled
+XPath expressions it uses.
+"""
+import pytest
+from lxml import etree
+
+from plugwise.legacy_anna import Legacy_Anna
+from plugwise.simulator import SimulatedGateway
+from plugwise.xpath import POINT_LOG_MEASUREMENT, RULE, first
+
+# A fixed clock, so every request sees the same measurements
+CLOCK = 1e9
+# The getter providing each value of get_thermostat_state()
+GETTERS = {
+    'presets': 'get_presets',
+    'schema_names': 'get_schema_names',
+    'active_schema_name': 'get_active_schema_name',
+    'schema_state': 'get_schema_state',
+    'boiler_status': 'get_boiler_status',
+    'heating_status': 'get_heating_status',
+    'cooling_status': 'get_cooling_status',
+    'current_preset': 'get_current_preset',
+    'schedule_temperature': 'get_schedule_temperature',
+    'current_temperature': 'get_current_temperature',
+    'target_temperature': 'get_target_temperature',
+    'thermostat_temperature': 'get_thermostat_temperature',
+    'outdoor_temperature': 'get_outdoor_temperature',
+    'illuminance': 'get_illuminance',
+    'boiler_temperature': 'get_boiler_temperature',
+    'water_pressure': 'get_water_pressure',
+}
+# Ids that break an expression built by concatenation
+QUOTED_IDS = ["it's", 'say "hi"', "x' or '1'='1", """both ' and \""""]
+
+
+@pytest.fixture(params=[0, 3])
+def anna(request):
+    """Provides a Legacy_Anna object of a simulated legacy Anna, with and
+       without plugs."""
+    gateway = SimulatedGateway(legacy=True, plugs=request.param, clock=lambda: CLOCK)
+    port = gateway.start_in_thread()
+    yield Legacy_Anna('smile', 'x', '127.0.0.1', port)
+    gateway.stop_thread()
+
+
+def getter_state(anna, root):
+    """Collects the thermostat state with the getters."""
+    return {key: getattr(anna, getter)(root) for key, getter in GETTERS.items()}
+
+
+def test_thermostat_state_matches_getters(anna):
+    root = anna.get_domain_objects()
+    state = anna.get_thermostat_state(root)
+    assert state == getter_state(anna, root)
+    assert state['current_preset'] == 'home'
+    assert state['current_temperature'] == 20.5
+
+
+def test_thermostat_state_after_writes(anna):
+    root = anna.get_domain_objects()
+    anna.set_preset(root, 'away')
+    anna.set_schema_state(root, 'Thermostat schedule', 'false')
+    anna.set_temperature(root, 18)
+    root = anna.get_domain_objects()
+    state = anna.get_thermostat_state(root)
+    assert state == getter_state(anna, root)
+    assert state['target_temperature'] == 18.0
+
+
+def quoted_domain_objects():
+    """Provides domain_objects with rules and point_logs of quoted ids."""
+    root = etree.Element('domain_objects')
+    for number, item_id in enumerate(QUOTED_IDS):
+        rule = etree.SubElement(root, 'rule', id=item_id)
+        etree.SubElement(rule, 'active').text = 'true' if number == 1 else 'false'
+        directives = etree.SubElement(rule, 'directives')
+        directive = etree.SubElement(directives, 'directive', preset='preset_' + str(number))
+        etree.SubElement(directive, 'then', setpoint=str(number))
+        appliance = etree.SubElement(root, 'appliance')
+        point_log = etree.SubElement(etree.SubElement(appliance, 'logs'), 'point_log', id=item_id)
+        measurement = etree.SubElement(etree.SubElement(point_log, 'period'), 'measurement')
+        measurement.text = str(number)
+    # Parsed again, like the XML-data of a gateway
+    return etree.fromstring(etree.tostring(root))
+
+
+def test_quoted_ids():
+    root = quoted_domain_objects()
+    for number, item_id in enumerate(QUOTED_IDS):
+        assert first(RULE, root, id=item_id).get('id') == item_id
+        assert len(RULE(root, id=item_id)) == 1
+        assert first(POINT_LOG_MEASUREMENT, root, id=item_id).text == str(number)
+        assert Legacy_Anna.get_measurement_from_point_log(root, item_id) == str(number)
+        assert Legacy_Anna.get_preset_dictionary(root, item_id) == {
+            'preset_' + str(number): float(number)}
+    assert first(RULE, root, id="x' or '1'='2") is None
+    assert Legacy_Anna.get_active_mode(root, QUOTED_IDS)
+    assert not Legacy_Anna.get_active_mode(root, QUOTED_IDS[2:])
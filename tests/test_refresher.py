@@ -0,0 +1,95 @@
+"""
+Reading the device-data while the background refresher starts and runs.
+"""
+import threading
+import time
+
+import pytest
+
+from plugwise import Plugwise
+from plugwise.simulator import SimulatedGateway
+
+# A fixed clock, so every client sees the same measurements
+CLOCK = 1e9
+
+
+@pytest.fixture(scope='module')
+def port():
+    """Serves a simulated Adam answering after 20 ms."""
+    gateway = SimulatedGateway(zones=3, trvs=1, plugs=2, latency=0.02, clock=lambda: CLOCK)
+    port = gateway.start_in_thread()
+    yield port
+    gateway.stop_thread()
+
+
+@pytest.fixture(scope='module')
+def expected(port):
+    """Provides the devices and the device-data of an updated object."""
+    api = Plugwise('smile', 'x', '127.0.0.1', port)
+    api.full_update_device()
+    return api.get_devices(), api.get_all_device_data()
+
+
+def wait_for_published(api, timeout=10):
+    """Waits until the first update has been published."""
+    deadline = time.monotonic() + timeout
+    while api.get_published() is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reads_during_start_up(port, expected):
+    devices, data = expected
+    api = Plugwise('smile', 'x', '127.0.0.1', port)
+    reads = []
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        """Reads the devices and their device-data until stopped."""
+        while not stop.is_set():
+            try:
+                read_devices = api.get_devices()
+                read_data = api.get_all_device_data()
+                read_device = api.get_device_data(devices[1]['id'], None, None)
+                reads.append((read_devices, read_data, read_device))
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    api.start_refresher(60)
+    try:
+        assert api.get_devices() == []
+        assert api.get_all_device_data() == {}
+        assert api.get_device_data(devices[1]['id'], None, None) is None
+        for thread in readers:
+            thread.start()
+        wait_for_published(api)
+        time.sleep(0.05)
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+        api.stop_refresher()
+
+    assert errors == []
+    # Nothing or one whole update, never the partly collected data
+    complete = (devices, data, api.get_device_data(devices[1]['id'], None, None))
+    for read in reads:
+        for value, empty, published in zip(read, ([], {}, None), complete):
+            assert value in (empty, published)
+    assert reads[-1] == complete
+    assert api.get_refresh_error() is None
+
+
+def test_collected_data_published_at_start(port, expected):
+    devices, data = expected
+    api = Plugwise('smile', 'x', '127.0.0.1', port)
+    api.full_update_device()
+    api.start_refresher(60)
+    try:
+        assert api.get_published() is not None
+        assert api.get_devices() == devices
+        assert api.get_all_device_data() == data
+    finally:
+        api.stop_refresher()
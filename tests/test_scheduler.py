@@ -0,0 +1,82 @@
+"""
+Adaptive polling of the endpoints of a simulated gateway.
+"""
+import pytest
+
+from plugwise import Plugwise, PollingScheduler
+from plugwise.plugwise import APPLIANCES, DIRECT_OBJECTS, DOMAIN_OBJECTS, ENDPOINTS, LOCATIONS
+from plugwise.scheduler import DEFAULT_INTERVALS, GROW_FACTOR, SHRINK_FACTOR
+from plugwise.simulator import SimulatedGateway
+
+START = 1e9
+
+
+@pytest.fixture
+def gateway_clock():
+    """Provides the clock of the gateway, moved by the tests."""
+    return [START]
+
+
+@pytest.fixture
+def api(gateway_clock):
+    """Provides a Plugwise object of a simulated Adam, the measurements
+       change every minute of the gateway clock."""
+    gateway = SimulatedGateway(zones=2, trvs=1, plugs=2, clock=lambda: gateway_clock[0])
+    port = gateway.start_in_thread()
+    yield Plugwise('smile', 'x', '127.0.0.1', port)
+    gateway.stop_thread()
+
+
+def test_intervals_adapt_to_changes(api, gateway_clock):
+    now = [0.0]
+    scheduler = PollingScheduler(api, clock=lambda: now[0])
+    assert scheduler.poll() == list(ENDPOINTS)
+    # Nothing changed since the first collection
+    intervals = scheduler.intervals()
+    for endpoint, (start, _, _) in DEFAULT_INTERVALS.items():
+        assert intervals[endpoint] == start * GROW_FACTOR
+    assert scheduler.next_poll() == intervals[APPLIANCES]
+
+    now[0] = intervals[APPLIANCES] - 1
+    assert scheduler.poll() == []
+
+    now[0] = intervals[DOMAIN_OBJECTS]
+    gateway_clock[0] += 60
+    assert scheduler.poll() == [APPLIANCES, DOMAIN_OBJECTS, DIRECT_OBJECTS]
+    changed = scheduler.intervals()
+    for endpoint in (APPLIANCES, DOMAIN_OBJECTS, DIRECT_OBJECTS):
+        assert changed[endpoint] == intervals[endpoint] * SHRINK_FACTOR
+    assert changed[LOCATIONS] == intervals[LOCATIONS]
+
+
+def test_intervals_stay_within_bounds(api, gateway_clock):
+    now = [0.0]
+    scheduler = PollingScheduler(api, intervals={APPLIANCES: (10, 5, 20)},
+                                 clock=lambda: now[0])
+    for _ in range(5):
+        scheduler.poll()
+        now[0] += scheduler.next_poll()
+    assert scheduler.intervals()[APPLIANCES] == 20
+
+    for _ in range(5):
+        gateway_clock[0] += 60
+        now[0] += scheduler.intervals()[APPLIANCES]
+        assert APPLIANCES in scheduler.poll()
+    assert scheduler.intervals()[APPLIANCES] == 5
+
+
+def test_write_forces_a_refresh(api):
+    now = [0.0]
+    scheduler = PollingScheduler(api, clock=lambda: now[0])
+    scheduler.poll()
+    now[0] = 1
+    assert scheduler.poll() == []
+
+    zone = next(device['id'] for device in api.get_devices() if device['type'] == 'thermostat')
+    api.set_temperature(zone, 'thermostat', 19)
+    assert scheduler.poll() == [APPLIANCES, DOMAIN_OBJECTS]
+    assert api.get_device_data(zone, None, None)['setpoint_temp'] == 19
+    # The written state changed, the minimum intervals are kept
+    intervals = scheduler.intervals()
+    assert intervals[APPLIANCES] == DEFAULT_INTERVALS[APPLIANCES][1]
+    assert intervals[DOMAIN_OBJECTS] == DEFAULT_INTERVALS[DOMAIN_OBJECTS][1]
@@ -0,0 +1,136 @@
+"""
+Writes to a simulated gateway: the requests sent and the patched data.
+"""
+import pytest
+
+from plugwise import Plugwise
+from plugwise.plugwise import CouldNotSetRelayException, CouldNotSetTemperatureException
+from plugwise.simulator import SimulatedGateway
+
+# A fixed clock, so every client sees the same measurements
+CLOCK = 1e9
+
+
+@pytest.fixture
+def gateway():
+    """Serves a simulated Adam with two zones and two plugs."""
+    gateway = SimulatedGateway(zones=2, trvs=1, plugs=2, clock=lambda: CLOCK)
+    gateway.port = gateway.start_in_thread()
+    yield gateway
+    gateway.stop_thread()
+
+
+@pytest.fixture
+def api(gateway):
+    """Provides an updated Plugwise object."""
+    api = Plugwise('smile', 'x', '127.0.0.1', gateway.port)
+    api.full_update_device()
+    return api
+
+
+def devices_of_type(api, device_type):
+    """Provides the ids of the devices of a type."""
+    return [device['id'] for device in api.get_devices() if device['type'] == device_type]
+
+
+def test_relay_of_each_plug(gateway, api):
+    first, second = devices_of_type(api, 'plug')
+    relays = api._actuators()['relays']
+    assert relays[first] != relays[second]
+
+    api.set_relay_state(second, 'zz_misc', 'off')
+    path, _ = gateway.writes[-1]
+    assert path == '/core/appliances;id={}/relay;id={}'.format(second, relays[second])
+    assert api.get_device_data(None, None, second)['relay'] == 'off'
+    assert api.get_device_data(None, None, first)['relay'] == 'on'
+
+    api.full_update_device()
+    assert api.get_device_data(None, None, second)['relay'] == 'off'
+    assert api.get_device_data(None, None, first)['relay'] == 'on'
+
+
+def test_failed_writes_raise(gateway, api):
+    plug = devices_of_type(api, 'plug')[0]
+    with pytest.raises(CouldNotSetTemperatureException):
+        api.set_temperature('unknown', 'thermostat', 20)
+    with pytest.raises(CouldNotSetRelayException):
+        api.set_relay_state('unknown', 'zz_misc', 'off')
+    # The gateway rejects the relay functionality of another appliance
+    api._actuators()['relays'][plug] = 'unknown'
+    with pytest.raises(CouldNotSetRelayException):
+        api.set_relay_state(plug, 'zz_misc', 'off')
+    assert api.get_pending() == {}
+
+
+def test_scene_coalescing(gateway, api):
+    first_zone, second_zone = devices_of_type(api, 'thermostat')
+    plug = devices_of_type(api, 'plug')[0]
+    results = api.set_scene([
+        ('temperature', first_zone, 18),
+        ('relay', plug, 'on'),
+        ('preset', first_zone, 'away'),
+        ('temperature', second_zone, 18.5),
+        ('schedule', first_zone, 'Schedule 0.1', 'true'),
+        ('relay', plug, 'off'),
+        ('relay', 'unknown', 'off'),
+    ])
+    assert [result['status'] for result in results] == [
+        'superseded', 'superseded', 'ok', 'ok', 'ok', 'ok', 'invalid']
+    assert len(gateway.writes) == 4
+
+    assert api.get_device_data(first_zone, None, None)['active_preset'] == 'away'
+    assert api.get_device_data(first_zone, None, None)['selected_schedule'] == 'Schedule 0.1'
+    assert api.get_device_data(second_zone, None, None)['setpoint_temp'] == 18.5
+    assert api.get_device_data(None, None, plug)['relay'] == 'off'
+
+
+def test_scene_relay_of_each_plug(gateway, api):
+    first, second = devices_of_type(api, 'plug')
+    relays = api._actuators()['relays']
+    results = api.set_scene([('relay', first, 'off'), ('relay', second, 'off')])
+    assert [result['status'] for result in results] == ['ok', 'ok']
+    assert sorted(path for path, _ in gateway.writes) == sorted(
+        '/core/appliances;id={}/relay;id={}'.format(plug, relays[plug])
+        for plug in (first, second)
+    )
+
+
+def test_pending_until_verified(gateway, api):
+    zone = devices_of_type(api, 'thermostat')[0]
+    plug = devices_of_type(api, 'plug')[0]
+    api.set_preset(zone, 'thermostat', 'away')
+    api.set_temperature(zone, 'thermostat', 19)
+    api.set_schedule_state(zone, 'Schedule 0.1', 'true')
+    api.set_relay_state(plug, 'zz_misc', 'off')
+    pending = {
+        zone: {'active_preset': 'away', 'setpoint_temp': 19.0,
+               'schedules': {'Schedule 0.1': True}},
+        plug: {'relay': 'off'},
+    }
+    assert api.get_pending() == pending
+    data = api.get_device_data(zone, None, None)
+    assert (data['active_preset'], data['setpoint_temp'], data['selected_schedule']) == (
+        'away', 19.0, 'Schedule 0.1')
+
+    # The locations do not hold the written state
+    api.update_endpoints(['/core/locations'])
+    assert api.get_pending() == pending
+
+    requests = api.get_transfer_statistics()['requests']
+    assert api.verify_pending() == {}
+    # The location, the appliance and the rule of the schedule
+    assert api.get_transfer_statistics()['requests'] == requests + 3
+
+
+def test_pending_not_confirmed(gateway, api):
+    plug = devices_of_type(api, 'plug')[0]
+    api.set_relay_state(plug, 'zz_misc', 'off')
+    path, _ = gateway.writes[-1]
+    # Switched back by someone else
+    gateway.apply(path, '<relay_functionality><state>on</state></relay_functionality>')
+    assert api.verify_pending() == {plug: {'relay': 'off'}}
+    assert api.get_device_data(None, None, plug)['relay'] == 'off'
+
+    api.full_update_device()
+    assert api.get_pending() == {}
+    assert api.get_device_data(None, None, plug)['relay'] == 'on'